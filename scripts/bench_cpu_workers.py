@@ -0,0 +1,78 @@
+"""
+Measure how a folder run scales with the number of CPU worker processes.
+
+The model is replaced by a fake that waits `latency` seconds and echoes the chunk, so the
+run only measures the local work: reading, parsing, chunking, counting tokens and
+validating pages, and how much of it keeps the event loop busy.
+
+    python scripts/bench_cpu_workers.py --input_folder docs --workers 0 1 2 4 8
+"""
+import os
+import time
+import asyncio
+import tempfile
+from dataclasses import dataclass, field
+from unittest.mock import patch
+
+import simple_parsing
+
+from gpt_translate.translate import TranslationResult, _translate_files
+from gpt_translate.utils import count_tokens, iter_files
+
+
+@dataclass
+class Args:
+    input_folder: str = "./docs"
+    config_folder: str = "./configs"
+    language: str = "ja"
+    workers: list[int] = field(default_factory=lambda: [0, 1, 2, 4, os.cpu_count() or 1])  # CPU workers to try
+    latency: float = 0.2  # Seconds the fake model takes per call
+    max_concurrent_calls: int = 50
+    chunk_tokens: int = 2000
+    cpu_batch_size: int = 16
+    limit: int = None  # Only use the first pages of the folder
+
+
+async def fake_translate_content(md_content, prompt, **model_args) -> TranslationResult:
+    await asyncio.sleep(args.latency)
+    return TranslationResult(content=md_content, tokens=count_tokens(md_content))
+
+
+def run(files: list, cpu_workers: int) -> dict:
+    with tempfile.TemporaryDirectory() as out_folder:
+        start = time.perf_counter()
+        report = asyncio.run(
+            _translate_files(
+                input_files=files,
+                input_folder=args.input_folder,
+                out_folder=out_folder,
+                replace=True,
+                language=args.language,
+                config_folder=args.config_folder,
+                max_concurrent_calls=args.max_concurrent_calls,
+                chunk_tokens=args.chunk_tokens,
+                cpu_workers=cpu_workers,
+                cpu_batch_size=args.cpu_batch_size,
+            )
+        )
+    return {"seconds": time.perf_counter() - start, "report": report}
+
+
+if __name__ == "__main__":
+    args: Args = simple_parsing.parse(Args)
+
+    files = list(iter_files(args.input_folder))[: args.limit]
+    print(f"{len(files)} pages, {args.latency}s per model call, {args.max_concurrent_calls} concurrent calls")
+    results = {}
+    with patch("gpt_translate.translate.translate_content", side_effect=fake_translate_content):
+        for cpu_workers in args.workers:
+            results[cpu_workers] = run(files, cpu_workers)
+
+    baseline = results[args.workers[0]]["seconds"]
+    print(f"{'cpu_workers':>11} {'seconds':>8} {'pages/s':>8} {'speedup':>8} {'max loop lag':>13}")
+    for cpu_workers, result in results.items():
+        report = result["report"]
+        print(
+            f"{cpu_workers:>11} {result['seconds']:>8.2f} {report.translated / result['seconds']:>8.1f} "
+            f"{baseline / result['seconds']:>7.2f}x {report.max_loop_lag * 1000:>10.1f} ms"
+        )
@@ -0,0 +1,81 @@
+import json
+import time
+import hashlib
+import sqlite3
+from pathlib import Path
+from typing import Any, Optional
+
+from gpt_translate.utils import logger
+
+DEFAULT_CACHE_PATH = "~/.cache/gpt_translate/judge_verdicts.sqlite"
+SECTION_CACHE_PATH = "~/.cache/gpt_translate/sections.sqlite"  # translated sections, see `Translator.translate_page`
+
+
+def cache_key(*parts: Any) -> str:
+    "Stable hash of JSON serializable parts"
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SqliteLRUCache:
+    """
+    Size-bounded key/value store on disk, backed by sqlite.
+
+    Entries are strings (typically JSON). Once the stored entries exceed `max_size`
+    bytes, the least recently used ones are evicted. Stores the judge verdicts and the
+    translated sections.
+    """
+
+    def __init__(self, path: Path | str = DEFAULT_CACHE_PATH, max_size: int = 256 * 2**20):
+        self.path = Path(path).expanduser()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+        self._db.commit()
+        self.size = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def __len__(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def get(self, key: str) -> Optional[str]:
+        row = self._db.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        # committed with the next put or on close, reads stay cheap
+        self._db.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+        return row[0]
+
+    def put(self, key: str, value: str) -> None:
+        size = len(key) + len(value.encode("utf-8"))
+        old = self._db.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+        self._db.execute(
+            "INSERT OR REPLACE INTO entries (key, value, size, last_used) VALUES (?, ?, ?, ?)",
+            (key, value, size, time.time()),
+        )
+        self.size += size - (old[0] if old else 0)
+        if self.size > self.max_size:
+            self._evict()
+        self._db.commit()
+
+    def _evict(self) -> None:
+        "Drop the least recently used entries until the cache fits in `max_size`"
+        evicted = []
+        for key, size in self._db.execute("SELECT key, size FROM entries ORDER BY last_used"):
+            if self.size <= self.max_size:
+                break
+            evicted.append((key,))
+            self.size -= size
+        self._db.executemany("DELETE FROM entries WHERE key = ?", evicted)
+        logger.debug(f"Evicted {len(evicted)} entries from {self.path}")
+
+    def close(self) -> None:
+        self._db.commit()
+        self._db.close()
+
+
+VerdictCache = SqliteLRUCache  # the judge verdicts store, kept under its original name
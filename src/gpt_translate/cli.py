@@ -1,16 +1,43 @@
+import json
 import weave
 import asyncio
 import logging
+from itertools import islice
 from pathlib import Path
 
 from rich.logging import RichHandler
 import simple_parsing
 from dataclasses import dataclass
 
-from gpt_translate.translate import _translate_file, _translate_files
-from gpt_translate.utils import get_md_files, _copy_images, get_modified_files, console, logger
-from gpt_translate.configs import EvalConfig, setup_parsing, DEFAULT_EVAL_CONFIG_PATH, CopyImagesArgs, NewFilesArgs
+from gpt_translate.translate import Translator, _translate_file, _translate_files
+from gpt_translate.utils import (
+    MD_EXTENSIONS,
+    iter_files,
+    read_file_list,
+    _copy_images,
+    iter_modified_files,
+    iter_file_changes,
+    git_head,
+    console,
+    logger,
+)
+from gpt_translate.sync import sync_state_path, read_last_sync, write_last_sync, apply_changes
+from gpt_translate.configs import (
+    EvalConfig,
+    ServeConfig,
+    setup_parsing,
+    DEFAULT_EVAL_CONFIG_PATH,
+    CopyImagesArgs,
+    NewFilesArgs,
+    CheckLinksArgs,
+    MergeShardsArgs,
+)
 from gpt_translate.evaluate import Evaluator
+from gpt_translate.links import build_link_graph, changed_links
+from gpt_translate.serve import TranslationService, serve as _serve
+from gpt_translate.watch import watch_folder
+from gpt_translate.cache import SqliteLRUCache
+from gpt_translate.shard import select_shard, manifest_path, write_manifest, read_manifest, merge_manifests
 
 
 
@@ -55,6 +82,9 @@ def translate_file(args=None):
             config_folder=config.config_folder,
             remove_comments=config.remove_comments,
             do_translate_header_description=config.do_translate_header_description,
+            skip_unchanged=config.skip_unchanged,
+            chunk_tokens=config.chunk_tokens,
+            validation_retries=config.validation_retries,
             model_args={
                 "model": config.model,
                 "temperature": config.temperature,
@@ -64,6 +94,15 @@ def translate_file(args=None):
     )
 
 
+def _write_shard_manifest(config, report, sync_commit=None):
+    path = manifest_path(config.out_folder, config.shard_index, config.num_shards, config.shard_manifest)
+    write_manifest(path, report, config.shard_index, config.num_shards, config.language, sync_commit)
+    logger.info(
+        f"Shard {config.shard_index + 1}/{config.num_shards} manifest saved to {path}, "
+        "combine the shards with gpt_translate.merge_shards"
+    )
+
+
 def translate_files(args=None):
     config = setup_parsing(args=args)
     setup_logging(
@@ -72,9 +111,16 @@ def translate_files(args=None):
         weave_project=config.weave_project,
     )
     logger.info(f"{config.dumps_yaml()}")
-    asyncio.run(
+    if str(config.input_file).endswith(".txt"):
+        input_files = read_file_list(config.input_file)
+    else:
+        input_files = [config.input_file]
+    input_files = select_shard(
+        input_files, config.input_folder, config.shard_index, config.num_shards, config.shard_by
+    )
+    report = asyncio.run(
         _translate_files(
-            input_files=config.input_file,
+            input_files=input_files,
             input_folder=config.input_folder,
             out_folder=config.out_folder,
             replace=config.replace,
@@ -83,6 +129,15 @@ def translate_files(args=None):
             remove_comments=config.remove_comments,
             do_translate_header_description=config.do_translate_header_description,
             max_concurrent_calls=config.max_concurrent_calls,
+            schedule=config.schedule,
+            short_job_slots=config.short_job_slots,
+            skip_unchanged=config.skip_unchanged,
+            changed_files=config.changed_files,
+            chunk_tokens=config.chunk_tokens,
+            validation_retries=config.validation_retries,
+            record_outputs=config.num_shards > 1,
+            cpu_workers=config.cpu_workers,
+            cpu_batch_size=config.cpu_batch_size,
             model_args={
                 "model": config.model,
                 "temperature": config.temperature,
@@ -90,6 +145,8 @@ def translate_files(args=None):
             },
         )
     )
+    if config.num_shards > 1:
+        _write_shard_manifest(config, report)
 
 
 def translate_folder(args=None):
@@ -100,10 +157,29 @@ def translate_folder(args=None):
         weave_project=config.weave_project,
     )
     logger.info(f"{config.dumps_yaml()}")
-    input_files = get_md_files(config.input_folder)[: config.limit]
-    asyncio.run(
+    if config.watch:
+        return _watch_folder(config)
+    input_files = iter_files(config.input_folder, exclude=config.exclude)
+    if config.since_last_sync:
+        state_file = sync_state_path(config.out_folder, config.sync_state_file)
+        head, repo_root = git_head(config.input_folder)
+        last_sync = read_last_sync(state_file, config.language)
+        if last_sync is None:
+            logger.info(f"No previous sync for {config.language}, translating the whole folder")
+        else:
+            logger.info(f"Translating the changes from {last_sync[:8]} to {head[:8]}")
+            changes = iter_file_changes(
+                config.input_folder, base=last_sync, head=head, extension=MD_EXTENSIONS
+            )
+            input_files = apply_changes(
+                changes, repo_root, config.input_folder, config.out_folder, exclude=config.exclude
+            )
+    input_files = select_shard(
+        input_files, config.input_folder, config.shard_index, config.num_shards, config.shard_by
+    )
+    report = asyncio.run(
         _translate_files(
-            input_files=input_files,
+            input_files=islice(input_files, config.limit),
             input_folder=config.input_folder,
             out_folder=config.out_folder,
             replace=config.replace,
@@ -112,6 +188,15 @@ def translate_folder(args=None):
             remove_comments=config.remove_comments,
             do_translate_header_description=config.do_translate_header_description,
             max_concurrent_calls=config.max_concurrent_calls,
+            schedule=config.schedule,
+            short_job_slots=config.short_job_slots,
+            skip_unchanged=config.skip_unchanged,
+            changed_files=config.changed_files,
+            chunk_tokens=config.chunk_tokens,
+            validation_retries=config.validation_retries,
+            record_outputs=config.num_shards > 1,
+            cpu_workers=config.cpu_workers,
+            cpu_batch_size=config.cpu_batch_size,
             model_args={
                 "model": config.model,
                 "temperature": config.temperature,
@@ -119,6 +204,92 @@ def translate_folder(args=None):
             },
         )
     )
+    if config.num_shards > 1:
+        complete_sync = config.since_last_sync and config.limit is None
+        _write_shard_manifest(config, report, sync_commit=head if complete_sync else None)
+    if config.since_last_sync:
+        if config.num_shards > 1:
+            logger.info("Sharded run, the sync state is recorded by gpt_translate.merge_shards --sync_state_file")
+        elif report.failed or config.limit is not None:
+            logger.warning(f"Run was incomplete, {config.language} stays synchronized to {last_sync}")
+        else:
+            write_last_sync(state_file, config.language, head)
+            logger.info(f"{config.language} is now synchronized to {head[:8]}")
+
+
+def _watch_folder(config):
+    translator = Translator(
+        config_folder=config.config_folder,
+        language=config.language,
+        do_translate_header_description=config.do_translate_header_description,
+        do_translate_header_title=config.do_translate_header_title,
+        model_args={
+            "model": config.model,
+            "temperature": config.temperature,
+            "max_tokens": config.max_tokens,
+        },
+        chunk_tokens=config.chunk_tokens,
+        validation_retries=config.validation_retries,
+    )
+    cache = SqliteLRUCache(config.section_cache) if config.section_cache else None
+    try:
+        asyncio.run(
+            watch_folder(
+                config.input_folder,
+                config.out_folder,
+                translator,
+                cache=cache,
+                exclude=config.exclude,
+                debounce=config.debounce,
+                poll=config.poll,
+                remove_comments=config.remove_comments,
+                max_concurrent_calls=config.max_concurrent_calls,
+            )
+        )
+    except KeyboardInterrupt:
+        logger.info("Stopped watching")
+    finally:
+        if cache is not None:
+            cache.close()
+
+
+def serve(args=None):
+    config = setup_parsing(args=args, config_class=ServeConfig)
+    setup_logging(
+        config.debug,
+        silence_openai=config.silence_openai,
+        weave_project=config.weave_project,
+    )
+    logger.info(f"{config.dumps_yaml()}")
+    cache = SqliteLRUCache(config.section_cache) if config.cache_sections and config.section_cache else None
+    service = TranslationService(
+        config_folder=config.config_folder,
+        language=config.language,
+        model_args={
+            "model": config.model,
+            "temperature": config.temperature,
+            "max_tokens": config.max_tokens,
+        },
+        num_workers=config.max_concurrent_calls,
+        replace=config.replace,
+        remove_comments=config.remove_comments,
+        do_translate_header_description=config.do_translate_header_description,
+        do_translate_header_title=config.do_translate_header_title,
+        skip_unchanged=config.skip_unchanged,
+        chunk_tokens=config.chunk_tokens,
+        validation_retries=config.validation_retries,
+        keep_jobs=config.keep_jobs,
+        input_folder=config.input_folder,
+        out_folder=config.out_folder,
+        cache=cache,
+    )
+    try:
+        asyncio.run(_serve(service, host=config.host, port=config.port, socket=config.socket))
+    except KeyboardInterrupt:
+        logger.info("Translation service stopped")
+    finally:
+        if cache is not None:
+            cache.close()
 
 
 def eval(args=None):
@@ -137,17 +308,90 @@ def eval(args=None):
 def copy_images(args=None):
     args = simple_parsing.parse(args=args, config_class=CopyImagesArgs)
     print(args)
-    _copy_images(args.src_path, args.dst_path)
+    setup_logging(debug=False)
+    _copy_images(
+        args.src_path,
+        args.dst_path,
+        compare=args.compare,
+        link=args.link,
+        max_workers=args.max_workers,
+        dedup_store=args.dedup_store,
+        dedup_link=args.dedup_link,
+    )
 
 
 def new_files(args=None):
     args = simple_parsing.parse(args=args, config_class=NewFilesArgs)
     print(args)
     setup_logging(debug=False)
-    modified_files = get_modified_files(
-        repo_path=args.repo, extension=args.extension, since_days=args.since_days
+    changes = iter_modified_files(
+        repo_path=args.repo,
+        extension=args.extension,
+        since_days=args.since_days,
+        detect_renames=args.detect_renames,
     )
     with open(args.out_file, "w") as f:
-        for file in modified_files:
-            f.write(str(file) + "\n")
-            print(file)
+        for change in changes:
+            if args.with_status:
+                f.write(str(change) + "\n")
+                print(change)
+            elif change.status != "D":
+                f.write(str(change.path) + "\n")
+                print(change.path)
+
+
+def merge_shards(args=None):
+    args = simple_parsing.parse(args=args, config_class=MergeShardsArgs)
+    setup_logging(debug=False)
+    merged = merge_manifests(read_manifest(path) for path in args.manifests)
+    report = merged["report"]
+    logger.info(
+        f"Merged {len(merged['shards'])}/{merged['num_shards']} shards: {report['translated']} files translated "
+        f"({report['changed']} changed), {len(report['failed'])} failed, slowest shard {report['duration']:.2f} s"
+    )
+    if args.out_file is not None:
+        Path(args.out_file).write_text(json.dumps(merged, indent=2, ensure_ascii=False) + "\n")
+    if args.changed_files is not None:
+        Path(args.changed_files).write_text(
+            "".join(f"{o['output_file']}\n" for o in report["outputs"] if o["changed"])
+        )
+    for chunk in report["failed_chunks"]:
+        console.print(f"{chunk['chunk']}: {'; '.join(chunk['problems'])}", markup=False)
+    for result in report["failed"]:
+        console.print(f"Error translating {result['input_file']}: {result['error']}", markup=False)
+    if merged["missing_shards"]:
+        logger.warning(f"No manifest for shards {merged['missing_shards']}")
+    complete = not merged["missing_shards"] and not report["failed"]
+    if args.sync_state_file is not None and merged["sync_commit"]:
+        if complete:
+            write_last_sync(args.sync_state_file, merged["language"], merged["sync_commit"])
+            logger.info(f"{merged['language']} is now synchronized to {merged['sync_commit'][:8]}")
+        else:
+            logger.warning(f"Run was incomplete, the sync state of {merged['language']} is left as is")
+    if not complete:
+        raise SystemExit(1)
+
+
+def check_links(args=None):
+    args = simple_parsing.parse(args=args, config_class=CheckLinksArgs)
+    setup_logging(debug=False)
+    graph = build_link_graph(args.folder, exclude=args.exclude, max_workers=args.max_workers)
+    broken = graph.broken()
+    lines = [str(link) for link in broken]
+    logger.info(f"Indexed {len(graph.pages)} pages, {len(broken)} broken links")
+    if args.source_folder is not None:
+        source = build_link_graph(args.source_folder, exclude=args.exclude, max_workers=args.max_workers)
+        changed = changed_links(source, graph)
+        logger.info(f"{len(changed)} pages have different links than in {args.source_folder}")
+        for path, diff in changed.items():
+            lines.append(f"{path}: missing {diff['missing']}, extra {diff['extra']}  (changed links)")
+    if args.orphans:
+        orphans = graph.orphans()
+        logger.info(f"{len(orphans)} orphaned pages")
+        lines += [f"{path}  (orphan)" for path in orphans]
+    for line in lines:
+        console.print(line, markup=False, highlight=False)
+    if args.out_file is not None:
+        Path(args.out_file).write_text("".join(f"{line}\n" for line in lines))
+    if broken:
+        raise SystemExit(1)
@@ -1,10 +1,12 @@
 # This file is in sync with the config.yaml file
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
 import simple_parsing
 from simple_parsing.helpers import Serializable
 
+from gpt_translate.cache import SECTION_CACHE_PATH
+
 DEFAULT_CONFIG_PATH = "./configs/config.yaml"
 DEFAULT_EVAL_CONFIG_PATH = "./configs/eval_config.yaml"
 
@@ -32,6 +34,33 @@ class TranslateConfig(Serializable):
     input_folder: str = "./docs/"  # Folder to translate
     out_folder: str = "./docs_translated/"  # Folder to save the translated files to
     limit: int = None  # Limit number of files to translate
+    exclude: list[str] = field(default_factory=lambda: [".git/", "node_modules/"])  # Gitignore-style patterns to skip when walking input_folder
+    schedule: str = "discovery"  # Order of the work: "discovery" or "longest_first" (largest files first)
+    short_job_slots: int = 1  # Workers kept for the smallest files when schedule is "longest_first"
+    since_last_sync: bool = False  # Only translate the files changed since the last synchronized source commit
+    sync_state_file: str = None  # Where the last synchronized commit of each language is stored, defaults to <out_folder>/.gpt_translate_sync.json
+    skip_unchanged: bool = False  # Leave translated files identical to the new translation untouched (keeps their mtime)
+    changed_files: str = None  # Write the translated files that really changed to this file, one per line
+    chunk_tokens: int = 0  # Translate pages in chunks of whole sections up to this many tokens, 0 for one call per page
+    validation_retries: int = 1  # Translate a chunk again when it drops links, code blocks or shortcodes, up to this many times, only with chunk_tokens
+    watch: bool = False  # Keep running and translate the files of input_folder again when they are saved
+    debounce: float = 1.0  # Watch mode: seconds without changes before a batch of saves is translated
+    poll: bool = False  # Watch mode: poll input_folder for changes even if watchfiles is installed
+    section_cache: str = SECTION_CACHE_PATH  # Watch mode (and the service with cache_sections): translated sections, only edited sections are translated again. Empty to disable
+    shard_index: int = 0  # Only translate the files of this shard, from 0 to num_shards - 1
+    num_shards: int = 1  # Split the files in this many shards, e.g. one per CI runner
+    shard_by: str = "hash"  # Assign files to shards by "hash" of their path, or balance the "tokens" of every shard
+    shard_manifest: str = None  # Where a shard writes its manifest, defaults to <out_folder>/.gpt_translate_shard_<index>_of_<num_shards>.json
+    cpu_workers: int = 0  # Processes parsing, chunking, counting tokens and validating pages, 0 to do it all in the main process
+    cpu_batch_size: int = 16  # Pages sent to a CPU worker at once
+
+@dataclass
+class ServeConfig(TranslateConfig):
+    host: str = "127.0.0.1"  # Address the translation service listens on
+    port: int = 8765  # Port the translation service listens on
+    socket: str = None  # Listen on this Unix socket instead of host:port
+    keep_jobs: int = 1000  # Finished jobs kept for status requests
+    cache_sections: bool = False  # Reuse the translated sections of section_cache across jobs, jobs then only match a folder run for new pages
 
 @dataclass
 class EvalConfig(Serializable):
@@ -47,12 +76,34 @@ class EvalConfig(Serializable):
     config_folder: str  # Config folder
     max_concurrent_calls: int  # Max number of concurrent calls to OpenAI
 
-    eval_dataset: str = "Translation-ja:latest"  # the Weave dataset name to evaluate
+    eval_dataset: str = "Translation-ja:latest"  # the Weave dataset name to evaluate, or a local .jsonl/.parquet file
+    limit: int = None  # Only evaluate this many rows
+    sample: float = None  # Evaluate a random fraction of the rows, e.g. 0.1
+    seed: int = 0  # Seed of the sampling, the same seed picks the same rows
+    input_folder: str = None  # Evaluate the files of this folder against their translation in out_folder, instead of eval_dataset
+    out_folder: str = None  # Folder with the translated files, paired with input_folder by relative path
+    exclude: list[str] = field(default_factory=lambda: [".git/", "node_modules/"])  # Gitignore-style patterns to skip in input_folder
+    parse_workers: int = None  # Processes parsing the folder pages, defaults to the number of CPUs
+    use_judge: bool = True  # Call the LLM judge, set to false for the deterministic scorers only
+    report_file: str = None  # Save the per-file scores and the aggregate to this JSON file
+    stratify: list[str] = field(default_factory=list)  # Evaluate a sample stratified by "size", "section" and/or "changed" (since the last report_file)
+    margin: float = 0.05  # Stratified sampling: half width of the confidence interval to reach on pass rates
+    confidence: float = 0.95  # Stratified sampling: confidence level of the interval
+    requests_per_minute: int = None  # Cap on the judge calls started per minute, no cap by default
+    judge_cache: str = "~/.cache/gpt_translate/judge_verdicts.sqlite"  # Where judge verdicts are cached, empty to disable the cache
+    judge_cache_size: int = 256  # Maximum size of the judge cache in MB, least recently used verdicts are evicted
+    refresh: bool = False  # Call the judge again for cached verdicts and update the cache
+    use_weave_evaluation: bool = True  # Track the run with weave.Evaluation when weave_project is set, not with report_file or stratify
 
 @dataclass
 class CopyImagesArgs:
     src_path: Path
     dst_path: Path
+    compare: str = "mtime"  # How to detect up to date images: "mtime" (size and mtime) or "hash" (size and content)
+    link: bool = False  # Hard-link images instead of copying them, falls back to a copy across devices
+    max_workers: int = 8  # Number of threads copying images
+    dedup_store: Path = None  # Keep one copy of each image in this content-addressed folder and link to it
+    dedup_link: str = "hardlink"  # How locale trees point to the dedup store: "hardlink" or "symlink"
 
 @dataclass
 class NewFilesArgs:
@@ -60,6 +111,24 @@ class NewFilesArgs:
     extension: str = ".md"
     since_days: int = 14
     out_file: Path = "./changed_files.txt"
+    detect_renames: bool = True  # Report moved files as renames instead of a deletion plus an addition
+    with_status: bool = False  # Write git-style "status<TAB>path" lines, including deletions and renames
+
+@dataclass
+class MergeShardsArgs:
+    manifests: list[Path]  # Manifests written by the shards of a run
+    out_file: Path = None  # Write the merged manifest to this file
+    changed_files: Path = None  # Write the translated files that really changed in any shard to this file, one per line
+    sync_state_file: Path = None  # Record the synchronized source commit here once every shard succeeded, with since_last_sync
+
+@dataclass
+class CheckLinksArgs:
+    folder: Path  # Folder of markdown pages to check, e.g. a translated tree
+    source_folder: Path = None  # Original folder, to report pages whose links changed in translation
+    exclude: list[str] = field(default_factory=lambda: [".git/", "node_modules/"])  # Gitignore-style patterns to skip
+    orphans: bool = False  # Also report pages no other page links to
+    max_workers: int = None  # Processes indexing pages, defaults to the number of CPUs, 0 to index them in this process
+    out_file: Path = None  # Also write the report to this file
 
 
 def setup_parsing(args=None, config_class=TranslateConfig, config_path=DEFAULT_CONFIG_PATH):
@@ -0,0 +1,192 @@
+import os
+import json
+import asyncio
+import random
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+from typing import Any, AsyncIterator, Iterable, Iterator, Optional
+
+import weave
+
+from gpt_translate.loader import Page
+from gpt_translate.utils import DEFAULT_EXCLUDE, iter_files, read_text, logger
+
+LOCAL_SUFFIXES = (".jsonl", ".parquet")
+
+
+def iter_jsonl(path: Path | str) -> Iterator[dict]:
+    "Rows of a JSON lines file, one at a time"
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def iter_parquet(path: Path | str, batch_size: int = 256) -> Iterator[dict]:
+    "Rows of a Parquet file, read `batch_size` rows at a time"
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("Reading Parquet datasets needs pyarrow: `pip install pyarrow`") from e
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size):
+        yield from batch.to_pylist()
+
+
+def _to_page(value: Any, filename: str) -> Page:
+    "A serialized MDPage (dict or JSON string) or the raw markdown of a page"
+    if isinstance(value, str) and value.lstrip().startswith("{"):
+        try:
+            value = json.loads(value)
+        except json.JSONDecodeError:
+            pass
+    if isinstance(value, dict):
+        return Page.from_dict(value)
+    return Page.from_raw_content(filename, value)
+
+
+def row_to_pages(row: dict, index: int = 0) -> dict:
+    """
+    Original and translated pages of a dataset row.
+
+    Rows either hold serialized pages (`original_page`/`translated_page`) or the markdown
+    of both files (`original_doc`/`translated_doc`, as written by `to_weave_dataset`).
+    """
+    original = row.get("original_page", row.get("original_doc"))
+    translated = row.get("translated_page", row.get("translated_doc"))
+    if original is None or translated is None:
+        raise ValueError(f"Row {index} has no original_page/translated_page or original_doc/translated_doc")
+    filename = row.get("input_file") or f"row-{index}"
+    return {
+        "original_page": _to_page(original, filename),
+        "translated_page": _to_page(translated, row.get("output_file") or filename),
+    }
+
+
+def sample_rows(
+    rows: Iterable[dict],
+    limit: Optional[int] = None,  # stop after this many rows
+    sample: Optional[float] = None,  # keep each row with this probability
+    seed: int = 0,
+) -> Iterator[dict]:
+    "Subsample a stream of rows without reading it upfront, the same `seed` keeps the same rows"
+    if sample is not None:
+        if not 0 < sample <= 1:
+            raise ValueError(f"sample must be in (0, 1], got {sample}")
+        rng = random.Random(seed)
+        rows = (row for row in rows if rng.random() < sample)
+    return islice(rows, limit)
+
+
+def iter_dataset_rows(source: str) -> Iterator[dict]:
+    "Raw rows of a local .jsonl/.parquet file or of a Weave dataset ref"
+    if Path(source).suffix in LOCAL_SUFFIXES:
+        if not Path(source).is_file():
+            raise FileNotFoundError(f"Dataset {source} not found")
+        yield from iter_jsonl(source) if source.endswith(".jsonl") else iter_parquet(source)
+    else:
+        yield from weave.ref(source).get().rows
+
+
+def load_dataset(
+    source: str,  # local .jsonl/.parquet file or Weave dataset name
+    limit: Optional[int] = None,
+    sample: Optional[float] = None,
+    seed: int = 0,
+) -> Iterator[dict]:
+    """
+    Stream the rows of an eval dataset as `{"original_page": Page, "translated_page": Page}`.
+
+    Rows are read and parsed one at a time as the evaluation pulls them, so scoring
+    starts right away and memory stays flat.
+    """
+    logger.info(f"Getting dataset: {source}")
+    rows = sample_rows(iter_dataset_rows(source), limit=limit, sample=sample, seed=seed)
+    for index, row in enumerate(rows):
+        yield row_to_pages(row, index)
+
+
+def parse_pair(pair: tuple[str, str, str]) -> dict:
+    """
+    Parse an original file and its translation, `pair` is (relative path, original, translation).
+
+    Header and links are parsed here, so that in a process pool the work happens in the
+    worker and the parent only receives ready pages.
+    """
+    rel_path, original_file, translated_file = pair
+    row = {
+        "original_page": Page.from_raw_content(rel_path, read_text(original_file)),
+        "translated_page": Page.from_raw_content(rel_path, read_text(translated_file)),
+    }
+    for page in row.values():
+        page.header, page.links
+    return row
+
+
+def iter_folder_pairs(
+    input_folder: Path | str,
+    out_folder: Path | str,
+    exclude: Iterable[str] = DEFAULT_EXCLUDE,
+    missing: Optional[list[str]] = None,  # collects the files that have no translation
+) -> Iterator[tuple[str, str, str]]:
+    "Pair every markdown file of `input_folder` with the file at the same relative path in `out_folder`"
+    input_folder, out_folder = Path(input_folder), Path(out_folder)
+    for md_file in iter_files(input_folder, exclude=exclude):
+        rel_path = md_file.path.relative_to(input_folder)
+        translated_file = out_folder / rel_path
+        if translated_file.is_file():
+            yield rel_path.as_posix(), str(md_file.path), str(translated_file)
+        elif missing is not None:
+            missing.append(rel_path.as_posix())
+
+
+async def parse_pairs(pairs: Iterable[tuple[str, str, str]], max_workers: Optional[int] = None) -> AsyncIterator[dict]:
+    """
+    Parse pairs with `parse_pair` in a pool of `max_workers` processes (0 to parse in this
+    process). Pairs are submitted a bounded window at a time and rows come out in order.
+    Rows are awaited, so the event loop keeps serving the judge while a worker parses.
+    Workers are spawned, forking a process that already runs threads can deadlock.
+    """
+    if max_workers == 0:
+        for pair in pairs:
+            yield parse_pair(pair)
+        return
+    pool = ProcessPoolExecutor(max_workers, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        window = 4 * (max_workers or os.cpu_count() or 1)
+        pending = deque()
+        for pair in pairs:
+            if len(pending) >= window:
+                yield await asyncio.wrap_future(pending.popleft())
+            pending.append(pool.submit(parse_pair, pair))
+        while pending:
+            yield await asyncio.wrap_future(pending.popleft())
+    finally:
+        # do not block the loop joining the workers, they exit once their queue is empty
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def load_folder_dataset(
+    input_folder: Path | str,
+    out_folder: Path | str,
+    exclude: Iterable[str] = DEFAULT_EXCLUDE,
+    limit: Optional[int] = None,
+    sample: Optional[float] = None,
+    seed: int = 0,
+    max_workers: Optional[int] = None,  # parsing processes, 0 to parse in this process
+    missing: Optional[list[str]] = None,
+) -> AsyncIterator[dict]:
+    """
+    Stream `{"original_page": Page, "translated_page": Page}` rows for a source folder and
+    its translation, parsed in a pool of processes.
+
+    Rows come out in discovery order while later files are still being parsed, so the
+    evaluation starts right away. The rows are iterated with `async for`, see `parse_pairs`.
+    """
+    logger.info(f"Pairing {input_folder} with {out_folder}")
+    pairs = sample_rows(
+        iter_folder_pairs(input_folder, out_folder, exclude, missing), limit=limit, sample=sample, seed=seed
+    )
+    return parse_pairs(pairs, max_workers)
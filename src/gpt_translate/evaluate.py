@@ -1,16 +1,39 @@
+import os
 import asyncio
 import re
 import json
 import yaml
+import inspect
+from collections import Counter
+from contextlib import nullcontext
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Callable
+from typing import Any, AsyncIterable, Awaitable, Callable, Iterable, Optional
 import weave
 from gpt_translate.configs import EvalConfig
-from gpt_translate.loader import MDPage
+from gpt_translate.loader import MDPage, Page
+from gpt_translate.validation import structure_elements, structure_errors, structure_differences
 from gpt_translate.prompts import PromptTemplate
-from gpt_translate.utils import logger
+from gpt_translate.cache import VerdictCache, cache_key
+from gpt_translate.dataset import (
+    load_dataset,
+    load_folder_dataset,
+    iter_folder_pairs,
+    iter_dataset_rows,
+    parse_pairs,
+    row_to_pages,
+)
+from gpt_translate.sampling import (
+    STRATIFY_BY,
+    size_stratum,
+    section_stratum,
+    changed_since,
+    stratified_sample,
+    stratified_means,
+)
+from gpt_translate.utils import run_workers, RateLimiter, count_tokens, console, logger
 from litellm import acompletion
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 
 
 @weave.op
@@ -18,33 +41,34 @@ def validate_links(original_page: MDPage, translated_page: MDPage, model_output:
     """
     Validate that the links in the original page are the same as the links in the translated page.
     """
-    original_links = original_page.links
-    translated_links = translated_page.links
+    original_links = Counter(link.key for link in original_page.links)
+    translated_links = Counter(link.key for link in translated_page.links)
 
-    missing_links = [link for link in original_links if link not in translated_links]
-    extra_links = [link for link in translated_links if link not in original_links]
+    missing_links = original_links - translated_links
+    extra_links = translated_links - original_links
     return dict(
-        links_match=len(missing_links) == 0 and len(extra_links) == 0,
-        missing_links=[l.target for l in missing_links],
-        extra_links=[l.target for l in extra_links],
-        total_links=len(original_links),
+        links_match=not missing_links and not extra_links,
+        missing_links=[target for _, target in missing_links.elements()],
+        extra_links=[target for _, target in extra_links.elements()],
+        total_links=len(original_page.links),
     )
 
 
 @weave.op
 def validate_headers(original_page: MDPage, translated_page: MDPage, model_output: Any) -> dict:
     """
-    Validate that the headers in the original page are the same as the headers in the translated page.
+    Validate that the header of the translated page keeps the structure of the original one:
+    title and description present on both sides, untranslated metadata and imports unchanged.
     """
     original_header = original_page.header
     translated_header = translated_page.header
-    title_match = original_header.metadata["title"] == translated_header.metadata["title"]
-    description_match = original_header.metadata["description"] == translated_header.metadata["description"]
-    slug_match = original_header.slug == translated_header.slug
+    title_match = bool(original_header.title) == bool(translated_header.title)
+    description_match = bool(original_header.description) == bool(translated_header.description)
+    slug_match = original_header.metadata.get("slug") == translated_header.metadata.get("slug")
     displayed_sidebar_match = (
-        original_header.displayed_sidebar == translated_header.displayed_sidebar
+        original_header.metadata.get("displayed_sidebar") == translated_header.metadata.get("displayed_sidebar")
     )
-    imports_match = original_header.imports == translated_header.imports
+    imports_match = original_header.body == translated_header.body
     return dict(
         title_match=title_match,
         description_match=description_match,
@@ -55,52 +79,99 @@ def validate_headers(original_page: MDPage, translated_page: MDPage, model_outpu
 
 
 @weave.op
-def validate_tabs(translated_page: MDPage, model_output: Any) -> bool:
+def validate_tabs(translated_page: MDPage, model_output: Any, original_page: Optional[MDPage] = None) -> dict:
     """
-    Validate the Tabs in the docosaurus format
+    Validate that Docusaurus Tabs/TabItem and Hugo shortcodes are balanced in the
+    translation and, given the original page, that they match the original ones.
     """
-    tab_pattern = re.compile(
-        r"""
-        <Tabs\s*[^>]*>\s*
-        (?:<TabItem\s*[^>]*>\s*.*?\s*</TabItem>\s*)+
-        </Tabs>
-        """,
-        re.DOTALL | re.VERBOSE,
-    )
+    original = structure_elements(original_page.content) if original_page is not None else []
+    translated = structure_elements(translated_page.content, paired={e.name for e in original})
+    errors = structure_errors(translated)
+    result = {"tabs_format_valid": not errors, "errors": errors}
+    if original_page is not None:
+        differences = structure_differences(original, translated)
+        result.update(structure_match=not differences, differences=differences)
+    return result
+
+
+_ASCII_WORD = re.compile(r"[A-Za-z0-9_]")
+
+
+class TermCounter:
+    """
+    Count the occurrences of many terms in a single pass over a text.
+
+    All the terms are compiled into one alternation, longest first, so a term inside a
+    longer one ("W&B" in "W&B Weave") is only counted once, as the longer term. Terms
+    starting or ending with an ASCII letter or digit must not be glued to another one
+    on that side, other edges (e.g. Japanese) match anywhere.
+    """
+
+    def __init__(self, terms: Iterable[str]):
+        terms = sorted({str(t) for t in terms if t}, key=len, reverse=True)
+        self.regex = re.compile("|".join(self._pattern(t) for t in terms)) if terms else None
+
+    @staticmethod
+    def _pattern(term: str) -> str:
+        pattern = re.escape(term)
+        if _ASCII_WORD.match(term[0]):
+            pattern = r"(?<![A-Za-z0-9_])" + pattern
+        if _ASCII_WORD.match(term[-1]):
+            pattern += r"(?![A-Za-z0-9_])"
+        return pattern
 
-    results = bool(tab_pattern.search(translated_page.content))
+    def count(self, text: str) -> Counter:
+        if self.regex is None:
+            return Counter()
+        return Counter(match.group(0) for match in self.regex.finditer(text))
 
-    return {"tabs_format_valid": results}
+
+class TechnicalWords:
+    "A dictionary of source terms and their translations, compiled once"
+
+    def __init__(self, dictionary: dict):
+        self.dictionary = {str(k): str(v) for k, v in (dictionary or {}).items()}
+        self.source = TermCounter(self.dictionary.keys())
+        self.target = TermCounter(self.dictionary.values())
+
+    def validate(self, original_content: str, translated_content: str) -> dict:
+        """
+        Check that every dictionary term appears as many times in the translation (as its
+        translation) as in the original.
+        """
+        if not self.dictionary:
+            return {"tech_words_percentage": 1.0, "mismatched": [], "term_counts": {}}
+        original_counts = self.source.count(original_content)
+        translated_counts = self.target.count(translated_content)
+        original_word_count = translated_word_count = 0
+        mismatched, term_counts = [], {}
+        for k, v in self.dictionary.items():
+            original_count, translated_count = original_counts[k], translated_counts[v]
+            original_word_count += original_count
+            translated_word_count += translated_count
+            if original_count != translated_count:
+                mismatched.append((k, v))
+            if original_count or translated_count:
+                term_counts[k] = {"translation": v, "original": original_count, "translated": translated_count}
+
+        tech_words_percentage = translated_word_count / original_word_count if original_word_count > 0 else 1.0
+        return {
+            "tech_words_percentage": tech_words_percentage,
+            "mismatched": mismatched,
+            "term_counts": term_counts,
+        }
 
 
 def _validate_technical_words(original_page: MDPage, translated_page: MDPage, dictionary: dict) -> dict:
     """Validate that technical words are translated correctly and maintain their frequency."""
-    if not dictionary:
-        return {"tech_words_percentage": 1.0, "mismatched": []}
-    
-    original_word_count = sum(original_page.content.count(re.escape(k)) for k in dictionary)
-    translated_word_count = 0
-    mismatched = []
-
-    for k, v in dictionary.items():
-        original_count = original_page.content.count(re.escape(k))
-        translated_count = translated_page.content.count(re.escape(v))
-        translated_word_count += translated_count
-
-        if original_count != translated_count:
-            mismatched.append((k, v))
-    
-    tech_words_percentage = translated_word_count / original_word_count if original_word_count > 0 else 1.0
-    
-    return {
-        "tech_words_percentage": tech_words_percentage,
-        "mismatched": mismatched
-    }
+    return TechnicalWords(dictionary).validate(original_page.content, translated_page.content)
 
 def validate_technical_words(dictionary: dict) -> Callable:
+    technical_words = TechnicalWords(dictionary)
+
     @weave.op(name="validate_technical_words")
     def _inner(original_page: MDPage, translated_page: MDPage, model_output: Any) -> dict:
-        return _validate_technical_words(original_page, translated_page, dictionary)
+        return technical_words.validate(original_page.content, translated_page.content)
     return _inner
 
 ALL_SCORERS = [
@@ -118,14 +189,59 @@ class EvaluationResult(BaseModel):
     links: bool = Field(description="A boolean indicating if the links are translated correctly")
 
 
+async def judge_verdict(
+    call: Callable[[], Awaitable[Any]],  # runs the judge and returns its analysis
+    key: Optional[str] = None,  # cache key of the verdict, None to skip the cache
+    limiter: Optional[RateLimiter] = None,
+    cache: Optional[VerdictCache] = None,
+    refresh: bool = False,  # call the judge even if the verdict is cached, and update the cache
+) -> tuple[Any, bool]:
+    "The analysis of a page pair, read from `cache` or asked to the judge under `limiter`, and whether it was cached"
+    if cache is not None and key is not None and not refresh and (verdict := cache.get(key)) is not None:
+        return json.loads(verdict), True
+    async with limiter or nullcontext():
+        analysis = await call()
+    if cache is not None and key is not None:
+        verdict = analysis.model_dump_json() if isinstance(analysis, BaseModel) else json.dumps(analysis)
+        cache.put(key, verdict)
+    return analysis, False
+
+
 class LLMJudge(weave.Model):
     system_prompt: str
     evaluation_prompt: str
     model_args: dict
+    _limiter: Optional[RateLimiter] = PrivateAttr(default=None)
+    _cache: Optional[VerdictCache] = PrivateAttr(default=None)
+    _refresh: bool = PrivateAttr(default=False)
+
+    def throttle(
+        self,
+        requests_per_minute: Optional[int] = None,
+        cache: Optional[VerdictCache] = None,
+        refresh: bool = False,
+    ) -> "LLMJudge":
+        """
+        Rate limit and cache the calls made by `predict`, for runs driven by
+        `weave.Evaluation` that call the judge directly.
+        """
+        self._limiter = RateLimiter(requests_per_minute) if requests_per_minute else None
+        self._cache = cache
+        self._refresh = refresh
+        return self
 
     @weave.op
     async def predict(self, original_page: MDPage, translated_page: MDPage):
-        """Evaluate the translation"""
+        """Evaluate the translation, see `throttle` for the rate limit and the cache"""
+        key = self.cache_key(original_page, translated_page) if self._cache is not None else None
+        analysis, cached = await judge_verdict(
+            lambda: self._complete(original_page, translated_page), key, self._limiter, self._cache, self._refresh
+        )
+        if cached:
+            analysis = EvaluationResult.model_validate(analysis)
+        return {"analysis": analysis, "translated_page": translated_page, "cached": cached}
+
+    async def _complete(self, original_page: MDPage, translated_page: MDPage) -> "EvaluationResult":
         messages = [
             {"role": "system", "content": self.system_prompt},
             {
@@ -143,14 +259,205 @@ class LLMJudge(weave.Model):
             response_format=EvaluationResult,
         )
         extracted = res.choices[0].message.content
-        analysis = EvaluationResult.model_validate_json(extracted)
-        return {"analysis": analysis, "translated_page": translated_page}
+        return EvaluationResult.model_validate_json(extracted)
+
+    def cache_key(self, original_page: MDPage, translated_page: MDPage) -> str:
+        "Everything the verdict depends on, hashed"
+        return cache_key(
+            original_page.content,
+            translated_page.content,
+            self.system_prompt,
+            self.evaluation_prompt,
+            self.model_args,
+        )
+
+
+
+def _scorer_name(scorer: Callable) -> str:
+    return getattr(scorer, "name", None) or scorer.__name__
+
+
+def _call_scorer(scorer: Callable, **inputs) -> Any:
+    "Call `scorer` with the inputs it declares, like weave.Evaluation does"
+    params = inspect.signature(scorer).parameters
+    return scorer(**{k: v for k, v in inputs.items() if k in params})
+
+
+def _flatten_scores(name: str, output: Any) -> dict[str, float]:
+    "Numeric and boolean fields of a scorer or judge output, keyed `name.field`"
+    if isinstance(output, BaseModel):
+        output = output.model_dump()
+    if isinstance(output, (bool, int, float)):
+        return {name: float(output)}
+    if not isinstance(output, dict):
+        return {}
+    return {
+        f"{name}.{k}": float(v) for k, v in output.items() if isinstance(v, (bool, int, float))
+    }
+
+
+def _as_mdpage(page: MDPage | Page) -> MDPage:
+    return page if isinstance(page, MDPage) else page.to_mdpage()
+
+
+def _as_mdpage_row(row: dict) -> dict:
+    "`row` with its lazy `Page`s converted to the `MDPage`s the judge and the scorers expect"
+    return {
+        **row,
+        "original_page": _as_mdpage(row["original_page"]),
+        "translated_page": _as_mdpage(row["translated_page"]),
+    }
+
+
+@dataclass
+class EvaluationReport:
+    "Summary of an evaluation run, fed one row result at a time"
+    evaluated: int = 0
+    failed: list[dict] = field(default_factory=list)
+    rows: list[dict] = field(default_factory=list)  # filename and flattened scores of every row
+    totals: dict[str, float] = field(default_factory=dict)
+    counts: dict[str, int] = field(default_factory=dict)
+    duration: float = 0.0  # seconds
+    cached: int = 0  # judge verdicts read from the cache
+    estimates: dict[str, tuple[float, float]] = field(default_factory=dict)  # stratified sampling: mean and CI half width
+
+    @property
+    def total(self) -> int:
+        return self.evaluated + len(self.failed)
+
+    @property
+    def throughput(self) -> float:
+        "Rows evaluated per second"
+        return self.total / self.duration if self.duration else 0.0
+
+    @property
+    def means(self) -> dict[str, float]:
+        return {k: self.totals[k] / self.counts[k] for k in sorted(self.totals)}
+
+    def add(self, result: dict) -> None:
+        "Record a row result from `run_evaluation`, keeping only the scores"
+        if result.get("error") is not None:
+            self.failed.append({"filename": result.get("filename"), "error": result["error"]})
+            return
+        self.evaluated += 1
+        self.cached += result.get("cached", False)
+        self.rows.append({"filename": result["filename"], **result["scores"]})
+        for k, v in result["scores"].items():
+            self.totals[k] = self.totals.get(k, 0.0) + v
+            self.counts[k] = self.counts.get(k, 0) + 1
+
+
+async def run_evaluation(
+    rows: Iterable[dict] | AsyncIterable[dict],  # rows with an "original_page" and a "translated_page", consumed lazily
+    judge: Optional[LLMJudge],  # None to only run the scorers
+    scorers: list[Callable],
+    max_concurrent_calls: int = 7,  # judge calls in flight at once
+    requests_per_minute: Optional[int] = None,  # cap on the judge calls started per minute
+    cache: Optional[VerdictCache] = None,  # reuse the judge verdicts of previous runs
+    refresh: bool = False,  # call the judge even for cached verdicts, and update the cache
+) -> EvaluationReport:
+    """
+    Score every row with the scorers and the LLM judge through a bounded pool of workers.
 
+    The scorers run in a worker thread while the judge call of the same row is in flight,
+    so they are called with `model_output=None`. Pages are converted to `MDPage` per row,
+    right before being handed to the traced judge and scorers. With a `cache`, the judge
+    is only called for page pairs, prompts and model args it has not seen yet.
+    """
+    limiter = RateLimiter(requests_per_minute) if requests_per_minute else None
+
+    def _score(original_page: MDPage, translated_page: MDPage) -> dict[str, float]:
+        scores = {}
+        for scorer in scorers:
+            try:
+                output = _call_scorer(
+                    scorer, original_page=original_page, translated_page=translated_page, model_output=None
+                )
+            except Exception as e:  # a broken scorer should not hide the other scores
+                logger.warning(f"Scorer {_scorer_name(scorer)} failed on {original_page.filename}: {e}")
+                continue
+            scores.update(_flatten_scores(_scorer_name(scorer), output))
+        return scores
+
+    async def _predict(original_page: MDPage, translated_page: MDPage) -> Any:
+        return (await judge.predict(original_page, translated_page))["analysis"]
+
+    async def _judge(original_page: MDPage, translated_page: MDPage) -> tuple[dict[str, float], bool]:
+        if judge is None:
+            return {}, False
+        key = judge.cache_key(original_page, translated_page) if cache is not None else None
+        analysis, cached = await judge_verdict(
+            lambda: _predict(original_page, translated_page), key, limiter, cache, refresh
+        )
+        return _flatten_scores("judge", analysis), cached
+
+    async def _evaluate_row(row: dict) -> dict:
+        row = _as_mdpage_row(row)
+        original_page, translated_page = row["original_page"], row["translated_page"]
+        try:
+            scores, (judge_scores, cached) = await asyncio.gather(
+                asyncio.to_thread(_score, original_page, translated_page),
+                _judge(original_page, translated_page),
+            )
+        except Exception as e:
+            logger.error(f"❌ Failed evaluating {original_page.filename}: {e}")
+            return {"filename": original_page.filename, "error": str(e)}
+        return {"filename": original_page.filename, "scores": {**scores, **judge_scores}, "cached": cached}
+
+    report = EvaluationReport()
+    stats = await run_workers(
+        rows,
+        _evaluate_row,
+        sink=report.add,
+        num_workers=max_concurrent_calls,
+        description="Evaluating pages",
+    )
+    report.duration = stats["duration"]
+    return report
+
+
+def print_evaluation_report(report: EvaluationReport) -> None:
+    console.rule(
+        f"Evaluated {report.total} pages in {report.duration:.2f} s "
+        f"({report.throughput:.2f} pages/s)"
+    )
+    if report.cached:
+        console.print(f"{report.cached} judge verdicts read from the cache")
+    if report.estimates:
+        for name, (mean, half_width) in report.estimates.items():
+            console.print(f"{name:<45} {mean:.3f} ± {half_width:.3f}")
+    else:
+        for name, mean in report.means.items():
+            console.print(f"{name:<45} {mean:.3f}")
+    if report.failed:
+        console.rule(f"Failed to evaluate {len(report.failed)} pages")
+        for result in report.failed:
+            console.print(f"Error evaluating {result['filename']}: {result['error']}")
+
+
+def write_evaluation_report(report: EvaluationReport, path: Path | str) -> None:
+    "Per-file scores and aggregate means as JSON"
+    Path(path).write_text(
+        json.dumps(
+            {
+                "aggregate": report.means,
+                "estimates": {k: {"mean": m, "ci": hw} for k, (m, hw) in report.estimates.items()},
+                "evaluated": report.evaluated,
+                "failed": report.failed,
+                "duration": report.duration,
+                "rows": report.rows,
+            },
+            indent=2,
+            ensure_ascii=False,
+        )
+    )
 
 
 class Evaluator:
     def __init__(self, config: EvalConfig, scorers: list[Callable] = ALL_SCORERS):
         self.config = config
+        self.missing = []  # files of input_folder without translation, in folder mode
+        self.sample = None  # set when the pages are sampled by strata
         self.dataset = self.get_dataset()
         self.prompt_template = self._load_prompts()
         self.scorers = self.setup_scorers(scorers)
@@ -159,7 +466,9 @@ class Evaluator:
             "temperature": config.temperature,
             "max_tokens": config.max_tokens,
         }
-        self.setup_judge()
+        self.judge = None
+        if config.use_judge:
+            self.setup_judge()
 
     def setup_scorers(self, scorers: list[Callable]):
         dictionary = yaml.safe_load(self.prompt_template.dictionary)
@@ -177,27 +486,151 @@ class Evaluator:
             model_args=self.model_args,
         )
 
-    def get_dataset(self):
-        logger.info(f"Getting dataset: {self.config.eval_dataset}")
-        dataset = weave.ref(self.config.eval_dataset).get()
+    def _stratum(self, filename: str, tokens: int, mtime: Optional[float], since: Optional[float]) -> str:
+        parts = []
+        for by in self.config.stratify:
+            if by == "size":
+                parts.append(size_stratum(tokens))
+            elif by == "section":
+                parts.append(section_stratum(filename))
+            else:
+                parts.append(changed_since(mtime, since))
+        return " / ".join(parts)
 
-        def deserialize(md_page):
-            """md_page is a string of a dictionary"""
-            return MDPage.model_validate(json.loads(md_page))
+    def get_stratified_dataset(self):
+        """
+        Draw a stratified sample sized for the requested `margin` at `confidence`.
 
-        ds = [
-            {
-                "original_page": deserialize(row["original_page"]),
-                "translated_page": deserialize(row["translated_page"]),
-            }
-            for row in dataset.rows
-        ]
-        logger.info(f"Running eval on {len(ds)} pages")
-        return ds
+        In folder mode only the sampled pairs are parsed, page sizes are estimated from the
+        file sizes and "changed" pages are the translations modified after the last report.
+        """
+        config = self.config
+        unknown = set(config.stratify) - set(STRATIFY_BY)
+        if unknown:
+            raise ValueError(f"Unknown strata {sorted(unknown)}, expected some of {STRATIFY_BY}")
+        if config.input_folder and config.out_folder:
+            report_file = Path(config.report_file) if config.report_file else None
+            since = report_file.stat().st_mtime if report_file and report_file.exists() else None
 
-    def evaluate(self):
-        evaluation = weave.Evaluation(
-            dataset=self.dataset,
-            scorers=self.scorers,
+            def _pair_stratum(pair):
+                rel_path, original_file, translated_file = pair
+                return self._stratum(
+                    rel_path,
+                    Path(original_file).stat().st_size // 4,
+                    Path(translated_file).stat().st_mtime,
+                    since,
+                )
+
+            pairs = iter_folder_pairs(config.input_folder, config.out_folder, config.exclude, self.missing)
+            self.sample = stratified_sample(
+                pairs, _pair_stratum, key=lambda pair: pair[0],
+                margin=config.margin, confidence=config.confidence, seed=config.seed,
+            )
+            rows = parse_pairs(self.sample.items, config.parse_workers)
+        else:
+            if "changed" in config.stratify:
+                raise ValueError("Stratifying on changed pages needs input_folder and out_folder")
+            pages = (row_to_pages(row, i) for i, row in enumerate(iter_dataset_rows(config.eval_dataset)))
+            self.sample = stratified_sample(
+                pages,
+                lambda row: self._stratum(row["original_page"].filename, count_tokens(row["original_page"].content), None, None),
+                key=lambda row: row["original_page"].filename,
+                margin=config.margin, confidence=config.confidence, seed=config.seed,
+            )
+            rows = iter(self.sample.items)
+        population = sum(self.sample.population.values())
+        logger.info(
+            f"Sampled {self.sample.size} of {population} pages in {len(self.sample.population)} strata "
+            f"(±{config.margin:.0%} at {config.confidence:.0%} confidence)"
         )
-        asyncio.run(evaluation.evaluate(self.judge))
+        return rows
+
+    def get_dataset(self):
+        "Rows are streamed lazily, the evaluation starts while later rows are still loading"
+        if self.config.stratify:
+            return self.get_stratified_dataset()
+        if self.config.input_folder and self.config.out_folder:
+            return load_folder_dataset(
+                self.config.input_folder,
+                self.config.out_folder,
+                exclude=self.config.exclude,
+                limit=self.config.limit,
+                sample=self.config.sample,
+                seed=self.config.seed,
+                max_workers=self.config.parse_workers,
+                missing=self.missing,
+            )
+        return load_dataset(
+            self.config.eval_dataset,
+            limit=self.config.limit,
+            sample=self.config.sample,
+            seed=self.config.seed,
+        )
+
+    def use_weave_evaluation(self) -> bool:
+        "Whether the run is tracked by `weave.Evaluation`, the local loop is needed for reports and strata"
+        config = self.config
+        if not config.use_weave_evaluation or self.judge is None or not config.weave_project:
+            return False
+        if config.report_file or config.stratify:
+            logger.info("report_file and stratify need the local evaluation loop, not using weave.Evaluation")
+            return False
+        return True
+
+    def weave_evaluate(self, cache: Optional[VerdictCache] = None) -> dict:
+        """
+        Evaluate the judge with `weave.Evaluation`, the rate limit and the cache are applied
+        inside `LLMJudge.predict` and the concurrency is set through WEAVE_PARALLELISM.
+        weave.Evaluation needs its rows upfront, so the streamed rows are converted to
+        `MDPage`s and collected, use the local loop to evaluate datasets that do not fit in memory.
+        """
+        os.environ["WEAVE_PARALLELISM"] = str(self.config.max_concurrent_calls)
+        self.judge.throttle(self.config.requests_per_minute, cache, self.config.refresh)
+
+        async def _evaluate():
+            if isinstance(self.dataset, AsyncIterable):
+                rows = [_as_mdpage_row(row) async for row in self.dataset]
+            else:
+                rows = [_as_mdpage_row(row) for row in self.dataset]
+            evaluation = weave.Evaluation(dataset=rows, scorers=self.scorers)
+            return await evaluation.evaluate(self.judge)
+
+        summary = asyncio.run(_evaluate())
+        for rel_path in self.missing:
+            console.print(f"[red]No translation for {rel_path}[/red]")
+        return summary
+
+    def evaluate(self) -> EvaluationReport | dict:
+        cache = None
+        if self.config.judge_cache:
+            cache = VerdictCache(self.config.judge_cache, max_size=self.config.judge_cache_size * 2**20)
+        if self.use_weave_evaluation():
+            try:
+                return self.weave_evaluate(cache)
+            finally:
+                if cache is not None:
+                    cache.close()
+        try:
+            report = asyncio.run(
+                run_evaluation(
+                    self.dataset,
+                    self.judge,
+                    self.scorers,
+                    max_concurrent_calls=self.config.max_concurrent_calls,
+                    requests_per_minute=self.config.requests_per_minute,
+                    cache=cache,
+                    refresh=self.config.refresh,
+                )
+            )
+        finally:
+            if cache is not None:
+                cache.close()
+        for rel_path in self.missing:
+            report.failed.append({"filename": rel_path, "error": "no translation"})
+        if self.sample is not None:
+            report.estimates = stratified_means(report.rows, self.sample, self.config.confidence)
+        print_evaluation_report(report)
+        if self.config.report_file:
+            write_evaluation_report(report, self.config.report_file)
+            logger.info(f"Report saved to {self.config.report_file}")
+        return report
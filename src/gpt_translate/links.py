@@ -0,0 +1,191 @@
+import os
+import re
+import multiprocessing
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
+from itertools import islice
+from pathlib import Path, PurePosixPath
+from typing import Iterable, NamedTuple, Optional
+from urllib.parse import unquote
+
+from gpt_translate.loader import MDLink, parse_markdown
+from gpt_translate.utils import DEFAULT_EXCLUDE, MD_EXTENSIONS, DiscoveredFile, iter_files, read_text
+
+INDEX_PAGES = ("index.md", "index.mdx", "_index.md", "_index.mdx", "README.md")
+CHECKED_KINDS = ("inline", "image", "definition")  # reference links point to a definition
+
+_EXTERNAL = re.compile(r"^(?:[a-zA-Z][a-zA-Z0-9+.-]*:|//)")  # http:, mailto:, //cdn...
+_CUSTOM_ID = re.compile(r"\s*\{#([^}]+)\}\s*$")  # ## Title {#custom-id}
+_HTML_ID = re.compile(r"""<a\s[^>]*?\b(?:id|name)=["']([^"']+)["']""")
+_MARKUP = re.compile(r"<[^>]+>|`|\*|(?<!\w)_|_(?!\w)")
+_INLINE_LINK = re.compile(r"!?\[([^\]]*)\]\([^)]*\)")
+
+
+def heading_anchor(title: str) -> str:
+    "Anchor of a heading the way GitHub, Docusaurus and Hugo build them"
+    match = _CUSTOM_ID.search(title)
+    if match:
+        return match.group(1)
+    title = _MARKUP.sub("", _INLINE_LINK.sub(r"\1", title))
+    return re.sub(r"[^\w\- ]", "", title.strip().lower()).replace(" ", "-")
+
+
+class PageIndex(NamedTuple):
+    path: str  # posix path relative to the indexed folder
+    anchors: frozenset[str]
+    links: tuple[MDLink, ...]
+
+
+class BrokenLink(NamedTuple):
+    link: MDLink  # its filename is the path of the page relative to the indexed folder
+    reason: str
+
+    def __str__(self):
+        return f"{self.link}  ({self.reason})"
+
+
+def index_page(root: Path, md_file: DiscoveredFile | Path) -> PageIndex:
+    "Anchors and outgoing links of one page"
+    path = md_file.path if isinstance(md_file, DiscoveredFile) else Path(md_file)
+    rel_path = path.relative_to(root).as_posix()
+    document = parse_markdown(read_text(path))
+    anchors, seen = set(), Counter()
+    for heading in document.find("heading"):
+        anchor = heading_anchor(heading.groups[1])
+        # repeated headings get -1, -2, ... suffixes
+        anchors.add(f"{anchor}-{seen[anchor]}" if seen[anchor] else anchor)
+        seen[anchor] += 1
+    anchors.update(_HTML_ID.findall(document.text))
+    links = tuple(link for link in document.links(rel_path) if link.kind in CHECKED_KINDS)
+    return PageIndex(rel_path, frozenset(anchors), links)
+
+
+@dataclass
+class LinkGraph:
+    "Outgoing links and anchors of every page of a folder, see `build_link_graph`"
+    root: Path
+    pages: dict[str, PageIndex] = field(default_factory=dict)
+
+    def _candidates(self, path: PurePosixPath) -> Iterable[str]:
+        # `guide`, `guide.md`, `guide/`, `guide/index.md` ... can all point to the same page
+        yield path.as_posix()
+        for ext in MD_EXTENSIONS:
+            yield f"{path.as_posix()}{ext}"
+        for index in INDEX_PAGES:
+            yield (path / index).as_posix()
+
+    def resolve(self, page: str, target: str) -> tuple[Optional[str], str]:
+        """
+        Resolve a link `target` found in `page`.
+
+        Returns the path of the target relative to the root (None if nothing matches) and
+        the anchor of the link. Absolute targets start at the root, relative ones at the
+        folder of the page or, for sites with pretty URLs, at the page itself.
+        """
+        target, _, anchor = target.partition("#")
+        target = unquote(target.split("?", 1)[0])
+        if not target:
+            return page, anchor
+        page_path = PurePosixPath(page)
+        if target.startswith("/"):
+            bases = [PurePosixPath(".")]
+            target = target.lstrip("/")
+        else:
+            bases = [page_path.parent, page_path.with_suffix("")]
+        for base in bases:
+            path = PurePosixPath(os.path.normpath(base / target))
+            if path.parts and path.parts[0] == "..":
+                continue
+            for candidate in self._candidates(path):
+                if candidate in self.pages:
+                    return candidate, anchor
+            if (self.root / path).is_file():
+                return path.as_posix(), anchor
+        return None, anchor
+
+    def broken(self) -> list[BrokenLink]:
+        "Links to a file or an anchor that does not exist"
+        broken = []
+        for page in self.pages.values():
+            for link in page.links:
+                if _EXTERNAL.match(link.target) or "{{" in link.target:
+                    continue
+                resolved, anchor = self.resolve(page.path, link.target)
+                if resolved is None:
+                    broken.append(BrokenLink(link, "missing target"))
+                elif anchor and resolved in self.pages and anchor not in self.pages[resolved].anchors:
+                    broken.append(BrokenLink(link, f"missing anchor in {resolved}"))
+        return broken
+
+    def incoming(self) -> dict[str, set[str]]:
+        "Pages linking to each page"
+        incoming = defaultdict(set)
+        for page in self.pages.values():
+            for link in page.links:
+                if _EXTERNAL.match(link.target):
+                    continue
+                resolved, _ = self.resolve(page.path, link.target)
+                if resolved in self.pages and resolved != page.path:
+                    incoming[resolved].add(page.path)
+        return incoming
+
+    def orphans(self) -> list[str]:
+        "Pages no other page links to, index pages excluded"
+        incoming = self.incoming()
+        return sorted(
+            path for path in self.pages
+            if path not in incoming and PurePosixPath(path).name not in INDEX_PAGES
+        )
+
+
+def index_pages(root: Path, files: list[Path]) -> list[PageIndex]:
+    "Index a batch of pages, one call per batch keeps the overhead of a process pool low"
+    return [index_page(root, f) for f in files]
+
+
+def build_link_graph(
+    folder: Path | str,
+    exclude: Iterable[str] = DEFAULT_EXCLUDE,
+    max_workers: Optional[int] = None,  # processes, defaults to the number of CPUs, 0 to index in this process
+    batch_size: int = 64,
+) -> LinkGraph:
+    """
+    Index every markdown page of `folder`.
+
+    Parsing is CPU-bound, so pages are indexed in a pool of `max_workers` processes by
+    batches of `batch_size` pages.
+    """
+    root = Path(folder)
+    graph = LinkGraph(root)
+    files = (f.path for f in iter_files(root, exclude=exclude))
+    if max_workers == 0:
+        pages = (index_page(root, f) for f in files)
+    else:
+        batches = iter(lambda: list(islice(files, batch_size)), [])
+        # spawn: forking a process that runs weave or litellm threads can deadlock the children
+        with ProcessPoolExecutor(max_workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            pages = [page for batch in pool.map(partial(index_pages, root), batches) for page in batch]
+    for page in pages:
+        graph.pages[page.path] = page
+    return graph
+
+
+def changed_links(source: LinkGraph, translated: LinkGraph) -> dict[str, dict[str, list[str]]]:
+    """
+    Pages present in both graphs whose links differ, with the "missing" and "extra"
+    targets of the translated page.
+    """
+    changed = {}
+    for path, page in source.pages.items():
+        if path not in translated.pages:
+            continue
+        original = Counter(link.key for link in page.links)
+        new = Counter(link.key for link in translated.pages[path].links)
+        if original != new:
+            changed[path] = {
+                "missing": [target for _, target in (original - new).elements()],
+                "extra": [target for _, target in (new - original).elements()],
+            }
+    return changed
@@ -1,51 +1,238 @@
 import re
 import yaml
-from typing import Optional, Any
+from typing import Optional, Any, NamedTuple
 from dataclasses import dataclass, field
 
 import weave
 from pydantic import model_validator, Field
-from gpt_translate.utils import logger
+from gpt_translate.utils import count_tokens, logger
 
 
-def remove_markdown_comments(content):
-    # Pattern to match HTML comment blocks
-    comment_pattern = re.compile(r"<!--.*?-->", re.DOTALL)
+class MDToken(NamedTuple):
+    "A span of a markdown document, `start` and `end` are offsets in the parsed text"
+    kind: str  # frontmatter, import, code, heading, shortcode, tag, link or comment
+    start: int
+    end: int
+    line: int  # 1-based line number of `start`
+    groups: tuple = ()  # kind specific: heading (level, title), link (title, target, link kind), shortcode (delimiter, closing, name), tag (closing, name, self closing), code (fence, info)
 
-    # Remove all matched comment blocks
-    cleaned_content = re.sub(comment_pattern, "\n", content)
 
-    return cleaned_content
+_HEADING = re.compile(r"(#{1,6}) (.+)")
+_FENCE = re.compile(r"[ \t]*(`{3,}|~{3,})(.*)")
+_DEFINITION = re.compile(r" {0,3}\[([^\]^][^\]]*)\]:[ \t]*<?([^\s>]+)>?")
+_INLINE = re.compile(
+    r"(?P<comment><!--)"
+    r"|(?P<shortcode>\{\{([<%])\s*(/?)\s*([\w./-]+).*?[>%]\}\})"
+    r"|(?P<image>!\[([^\]]*)\]\(([^)]+)\))"
+    r"|(?P<link>\[((?:!\[[^\]]*\]\([^)]*\)|[^\]])+)\]\(([^)]+)\))"
+    r"|(?P<reference>\[([^\]]+)\]\[([^\]]*)\])"
+    r"|(?P<tag><(/?)(Tabs|TabItem)\b[^>]*?(/?)>)"
+)
 
 
-def split_markdown(content):
-    header_pattern = re.compile(r"^(#{1,6} .+)$", re.MULTILINE)
-    code_block_pattern = re.compile(r"^```")
-
-    chunks = []
-    current_chunk = []
-    in_code_block = False
-
-    for line in content.split("\n"):
-        if code_block_pattern.match(line):
-            in_code_block = not in_code_block
-
-        # Split at headers, only if not within a code block
-        if header_pattern.match(line) and not in_code_block:
-            if current_chunk:
-                # Add the current chunk to chunks
-                chunks.append("\n".join(current_chunk).strip())
-                current_chunk = [line]
-                in_code_block = False
+@dataclass
+class MDDocument:
+    """
+    Result of a single pass over a markdown text.
+
+    `tokens` holds the front matter, imports, code fences, headings, Hugo shortcodes,
+    Docusaurus `<Tabs>`/`<TabItem>` tags, links and comments in document order. Shortcodes,
+    tags, links and comments inside code fences are not reported.
+    """
+    text: str
+    tokens: list[MDToken]
+    header_end: int  # end of the front matter and imports
+    content_start: int  # start of the first line after the header, len(text) if there is none
+
+    @property
+    def header(self) -> str:
+        return self.text[: self.header_end].rstrip()
+
+    @property
+    def content(self) -> str:
+        return self.text[self.content_start :].strip()
+
+    def find(self, *kinds: str) -> list[MDToken]:
+        return [t for t in self.tokens if t.kind in kinds]
+
+    def links(self, filename: str, content_only: bool = False) -> list["MDLink"]:
+        """
+        Links of the document, with `content_only` only the ones after the header and with
+        line numbers relative to `content`.
+        """
+        start, first_line = 0, 1
+        if content_only:
+            start = len(self.text) - len(self.text[self.content_start :].lstrip())
+            first_line = self.text.count("\n", 0, start) + 1
+        return [
+            MDLink(t.groups[0], t.groups[1], filename, t.line - first_line + 1, t.groups[2])
+            for t in self.tokens
+            if t.kind == "link" and t.start >= start
+        ]
+
+    def without_comments(self, replacement: str = "\n") -> str:
+        "Text with every comment replaced by `replacement`"
+        comments = self.find("comment")
+        if not comments:
+            return self.text
+        pieces, pos = [], 0
+        for comment in comments:
+            pieces += [self.text[pos : comment.start], replacement]
+            pos = comment.end
+        pieces.append(self.text[pos:])
+        return "".join(pieces)
+
+
+def parse_markdown(text: str, header: bool = True) -> MDDocument:
+    """
+    Tokenize a markdown (or MDX / Hugo) document in one pass over its lines.
+
+    The header is an optional front matter block delimited by `---` lines on top of the
+    file, followed by `import ...` lines. Use `header=False` for text without header,
+    like the content of a page.
+    """
+    tokens = []
+    n = len(text)
+    pos, line_no = 0, 1
+    header_end, content_start = 0, None if header else 0
+    phase = "start" if header else "content"  # start -> frontmatter -> imports -> content
+    fence = None  # (fence, start, line, info) of the open code block
+    resume = None  # offset right after a comment that ended on this line
+    unterminated = False  # an unterminated `<!--` was seen, no later one can be closed
+    definitions = set()  # lowercased labels of the `[label]: target` definitions
+
+    while pos <= n:
+        eol = text.find("\n", pos)
+        if eol == -1:
+            eol = n
+        line = text[pos:eol]
+
+        if phase != "content":
+            stripped = line.strip()
+            if phase == "start" and stripped == "---":
+                phase, frontmatter_start, header_end = "frontmatter", pos, eol
+            elif phase == "frontmatter":
+                if stripped == "---":
+                    tokens.append(MDToken("frontmatter", frontmatter_start, eol, 1))
+                    phase = "imports"
+                header_end = eol
+            elif stripped.startswith("import "):
+                tokens.append(MDToken("import", pos, eol, line_no))
+                phase, header_end = "imports", eol
+            else:
+                phase, content_start = "content", pos
+            if phase != "content":
+                pos, line_no = eol + 1, line_no + 1
+                continue
+
+        if fence is not None:
+            match = _FENCE.match(line)
+            if (
+                match
+                and match.group(1)[0] == fence[0][0]
+                and len(match.group(1)) >= len(fence[0])
+                and not match.group(2).strip()
+            ):
+                tokens.append(MDToken("code", fence[1], eol, fence[2], (fence[0], fence[3])))
+                fence = None
+            pos, line_no = eol + 1, line_no + 1
+            continue
+
+        scan = pos
+        if resume is not None:
+            scan, resume = resume, None
+        else:
+            match = _FENCE.match(line)
+            if match:
+                fence = (match.group(1), pos, line_no, match.group(2).strip())
+                pos, line_no = eol + 1, line_no + 1
+                continue
+            match = _HEADING.match(line)
+            if match:
+                level, title = len(match.group(1)), match.group(2).strip()
+                tokens.append(MDToken("heading", pos, eol, line_no, (level, title)))
+            match = _DEFINITION.match(line)
+            if match:
+                label, target = match.group(1, 2)
+                definitions.add(label.lower())
+                tokens.append(MDToken("link", pos, pos + match.end(), line_no, (label, target, "definition")))
+                scan = pos + match.end()
+
+        while match := _INLINE.search(text, scan, eol):
+            scan = match.end()
+            if match.group("comment"):
+                end = -1 if unterminated else text.find("-->", match.end())
+                if end == -1:  # unterminated, not a comment
+                    unterminated = True
+                    continue
+                scan = end + 3
+                tokens.append(MDToken("comment", match.start(), scan, line_no))
+                if scan > eol:  # spans several lines, carry on from the line where it ends
+                    break
+            elif match.group("shortcode"):
+                tokens.append(MDToken("shortcode", match.start(), match.end(), line_no, match.group(3, 4, 5)))
+            elif match.group("image"):
+                tokens.append(MDToken("link", match.start(), match.end(), line_no, (*match.group(7, 8), "image")))
+            elif match.group("link"):
+                title = match.group(10)
+                tokens.append(MDToken("link", match.start(), match.end(), line_no, (title, match.group(11), "inline")))
+                if "![" in title:  # an image used as link text, e.g. a badge
+                    scan = match.start(10)
+            elif match.group("tag"):
+                tokens.append(MDToken("tag", match.start(), match.end(), line_no, match.group(16, 17, 18)))
             else:
-                current_chunk.append(line)
+                title, label = match.group(13, 14)
+                tokens.append(MDToken("link", match.start(), match.end(), line_no, (title, label or title, "reference")))
+
+        if scan > eol:
+            line_no += text.count("\n", pos, scan)
+            pos, resume = text.rfind("\n", 0, scan) + 1, scan
         else:
-            current_chunk.append(line)
+            pos, line_no = eol + 1, line_no + 1
+
+    if fence is not None:  # an unclosed fence runs to the end of the document
+        tokens.append(MDToken("code", fence[1], n, fence[2], (fence[0], fence[3])))
+    if phase == "frontmatter":  # an unclosed front matter swallows the document
+        tokens.append(MDToken("frontmatter", frontmatter_start, n, 1))
+    if content_start is None:
+        content_start = n
+    # `[text][label]` is only a link if `label` is defined somewhere in the document
+    tokens = [
+        t for t in tokens
+        if t.kind != "link" or t.groups[2] != "reference" or t.groups[1].lower() in definitions
+    ]
+    return MDDocument(text=text, tokens=tokens, header_end=header_end, content_start=content_start)
+
+
+def remove_markdown_comments(content):
+    "Replace every HTML comment block by a line break"
+    return parse_markdown(content, header=False).without_comments()
 
-    # Add the last chunk if not empty
-    if current_chunk:
-        chunks.append("\n".join(current_chunk).strip())
 
+def split_markdown(content):
+    "Split the content in chunks starting at each heading, headings in code blocks are ignored"
+    starts = [t.start for t in parse_markdown(content, header=False).find("heading")]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    ends = starts[1:] + [len(content)]
+    return [content[start:end].strip() for start, end in zip(starts, ends)]
+
+
+def chunk_markdown(content: str, max_tokens: int) -> list[str]:
+    """
+    Group the sections of `split_markdown` into chunks of at most `max_tokens` tokens,
+    a section longer than that is a chunk on its own.
+    """
+    chunks, current, current_tokens = [], [], 0
+    for section in split_markdown(content):
+        tokens = count_tokens(section)
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append("\n\n".join(current))
+            current, current_tokens = [], 0
+        current.append(section)
+        current_tokens += tokens
+    if current:
+        chunks.append("\n\n".join(current))
     return chunks
 
 
@@ -55,24 +242,32 @@ class MDLink:
     target: str
     filename: str
     line_number: int
+    kind: str = "inline"  # inline, image, reference ([title][label], target is the label) or definition ([label]: target)
 
     def __str__(self):
+        if self.kind == "image":
+            return f"{self.filename}:{self.line_number:>4}: ![{self.title}]({self.target})"
+        if self.kind == "reference":
+            return f"{self.filename}:{self.line_number:>4}: [{self.title}][{self.target}]"
+        if self.kind == "definition":
+            return f"{self.filename}:{self.line_number:>4}: [{self.title}]: {self.target}"
         return f"{self.filename}:{self.line_number:>4}: [{self.title}]({self.target})"
 
+    @property
+    def key(self) -> tuple[str, str]:
+        "What has to survive a translation, titles are translated but the targets are not"
+        return (self.kind, self.target)
+
     def __eq__(self, other):
         "We only care to know if the link is still pointing to the same place"
-        return self.target == other.target
+        return self.key == other.key
+
+    def __hash__(self):
+        return hash(self.key)
 
 
 def extract_markdown_links(filename, content):
-    # This regular expression matches the Markdown link syntax
-    link_pattern = r"\[([^\]]+)\]\(([^)]+)\)"
-    links = []
-    for i, line in enumerate(content.split("\n")):
-        matches = re.findall(link_pattern, line)
-        for title, target in matches:
-            links.append(MDLink(title, target, filename, i + 1))
-    return links
+    return find_links(content, filename)
 
 
 @dataclass
@@ -151,60 +346,17 @@ class Header:
 @weave.op
 def extract_header(content: str) -> dict:
     "Extract header from a markdown file, including YAML frontmatter and imports"
-    lines = content.split("\n")
-    frontmatter = []
-    imports = []
-    content_lines = []
-    in_frontmatter = False
-
-    # Extract frontmatter
-    for line in lines:
-        if line.strip() == "---":
-            if not in_frontmatter:
-                in_frontmatter = True
-                frontmatter.append(line)
-            else:
-                frontmatter.append(line)
-                break
-        elif in_frontmatter:
-            frontmatter.append(line)
-        else:
-            break
-
-    # Extract imports and content
-    remaining_lines = lines[len(frontmatter) :]
-    for line in remaining_lines:
-        if line.strip().startswith("import "):
-            imports.append(line)
-        else:
-            content_lines = remaining_lines[len(imports) :]
-            break
-
-    # Combine frontmatter and imports for header
-    header_lines = frontmatter + imports
-
-    # Remove trailing empty lines from header
-    while header_lines and not header_lines[-1].strip():
-        header_lines.pop()
-
-    header = "\n".join(header_lines).rstrip()
-    content = "\n".join(content_lines).strip()
-
-    return {"header": header, "content": content}
+    document = parse_markdown(content)
+    return {"header": document.header, "content": document.content}
 
 
 def find_links(raw_content: str, filename: str) -> list[MDLink]:
     """
-    Finds all Markdown links in the content.
-    :return: list of tuples, each containing (link text, URL).
+    Finds all Markdown links in the content: inline links, images, reference links and
+    their definitions.
+    :return: list of MDLink, one per link outside code blocks and comments.
     """
-    link_pattern = r"\[([^\]]+)\]\(([^)]+)\)"
-    links = []
-    for i, line in enumerate(raw_content.split("\n")):
-        matches = re.findall(link_pattern, line)
-        for title, target in matches:
-            links.append(MDLink(title, target, filename, i + 1))
-    return links
+    return parse_markdown(raw_content, header=False).links(filename)
 
 
 class MDPage(weave.Object):
@@ -220,15 +372,21 @@ class MDPage(weave.Object):
         return self
 
     @classmethod
-    def from_raw_content(cls, filename: str, raw_content: str) -> "MDPage":
-        extracted = extract_header(raw_content)
-        header = extracted["header"]
-        content = extracted["content"]
-        header = Header.from_string(header)
+    def from_raw_content(cls, filename: str, raw_content: str, remove_comments: bool = False) -> "MDPage":
+        document = parse_markdown(raw_content)
+        if remove_comments and document.find("comment"):
+            logger.debug("Removing comments")
+            document = parse_markdown(document.without_comments())
+        return cls.from_document(filename, document)
+
+    @classmethod
+    def from_document(cls, filename: str, document: MDDocument) -> "MDPage":
+        "Build the page from an already tokenized document, without parsing it again"
         return cls(
             filename=filename,
-            content=content,
-            header=header,
+            content=document.content,
+            header=Header.from_string(document.header),
+            links=document.links(filename, content_only=True),
         )
 
     @weave.op
@@ -247,7 +405,7 @@ class MDPage(weave.Object):
                 logger.debug(f"Replacing {old_link} with {new_link}")
                 self.content = self.content.replace(old_link.target, new_link.target)
         if targets_only:
-            self.links = self.find_links(self.content)
+            self.links = find_links(self.content, self.filename)
         else:
             self.links = new_links
 
@@ -256,3 +414,70 @@ class MDPage(weave.Object):
         if str(self.header).strip():
             return f"{self.header}\n\n{self.content}"
         return str(self.content)
+
+
+class Page:
+    """
+    Lightweight markdown page for bulk work over a corpus.
+
+    Unlike `MDPage` nothing is validated on construction: the header is parsed and the
+    links are extracted the first time they are read. Use `to_mdpage` where a traced
+    `MDPage` is needed (weave ops, datasets).
+    """
+    __slots__ = ("filename", "content", "_header", "_links")
+
+    def __init__(
+        self,
+        filename: str,
+        content: str,
+        header: "Header | dict | str | None" = None,  # parsed, serialized or raw header
+        links: "list[MDLink | dict] | None" = None,  # None to extract them from the content
+    ):
+        self.filename = filename
+        self.content = content
+        self._header = header
+        self._links = links
+
+    @classmethod
+    def from_raw_content(cls, filename: str, raw_content: str, remove_comments: bool = False) -> "Page":
+        document = parse_markdown(raw_content)
+        if remove_comments and document.find("comment"):
+            document = parse_markdown(document.without_comments())
+        return cls(filename, document.content, header=document.header)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Page":
+        "Load a page serialized from an `MDPage`, e.g. `MDPage.model_dump()`"
+        return cls(data["filename"], data["content"], header=data.get("header"), links=data.get("links"))
+
+    @property
+    def header(self) -> Header:
+        header = self._header
+        if not isinstance(header, Header):
+            if header is None:
+                header = Header()
+            elif isinstance(header, str):
+                header = Header.from_string(header)
+            else:
+                header = Header(**header)
+            self._header = header
+        return header
+
+    @property
+    def links(self) -> list[MDLink]:
+        links = self._links
+        if links is None:
+            links = find_links(self.content, self.filename)
+        elif links and isinstance(links[0], dict):
+            links = [MDLink(**link) for link in links]
+        self._links = links
+        return links
+
+    def to_mdpage(self) -> MDPage:
+        return MDPage(filename=self.filename, content=self.content, header=self.header, links=self.links)
+
+    def __str__(self):
+        "Concatenate header and content"
+        if str(self.header).strip():
+            return f"{self.header}\n\n{self.content}"
+        return str(self.content)
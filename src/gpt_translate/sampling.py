@@ -0,0 +1,133 @@
+import math
+import random
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import PurePosixPath
+from statistics import NormalDist, variance
+from typing import Any, Callable, Iterable, Optional
+
+STRATIFY_BY = ("size", "section", "changed")
+SIZE_BUCKETS = (500, 2_000, 8_000)  # token bounds of the size strata
+
+
+def size_stratum(tokens: int) -> str:
+    "Size bucket of a page, e.g. '500-2000 tokens'"
+    lower = 0
+    for upper in SIZE_BUCKETS:
+        if tokens < upper:
+            return f"{lower}-{upper} tokens"
+        lower = upper
+    return f">{lower} tokens"
+
+
+def section_stratum(filename: str) -> str:
+    "Top level folder of a page, the site section it belongs to"
+    parts = PurePosixPath(filename).parts
+    return parts[0] if len(parts) > 1 else "/"
+
+
+def z_score(confidence: float) -> float:
+    return NormalDist().inv_cdf(0.5 + confidence / 2)
+
+
+def sample_size(population: int, margin: float = 0.05, confidence: float = 0.95) -> int:
+    """
+    Pages to sample so a pass rate is known within `margin` at `confidence`.
+
+    Uses the worst case variance of a proportion (p = 0.5) and the finite population
+    correction, so small sites need proportionally more pages than large ones.
+    """
+    if population <= 0:
+        return 0
+    n0 = z_score(confidence) ** 2 * 0.25 / margin**2
+    return min(population, math.ceil(n0 / (1 + (n0 - 1) / population)))
+
+
+def allocate(population: dict[str, int], n: int) -> dict[str, int]:
+    """
+    Split `n` samples between strata proportionally to their size (largest remainders),
+    with at least 2 per stratum when it has them, so every stratum has a variance.
+    """
+    total = sum(population.values())
+    if total == 0:
+        return {}
+    quotas = {s: n * size / total for s, size in population.items()}
+    allocation = {s: math.floor(q) for s, q in quotas.items()}
+    for s in sorted(quotas, key=lambda s: quotas[s] - allocation[s], reverse=True)[: n - sum(allocation.values())]:
+        allocation[s] += 1
+    return {s: min(size, max(allocation[s], 2)) for s, size in population.items()}
+
+
+@dataclass
+class StratifiedSample:
+    "Items drawn in every stratum and the size of each stratum in the population"
+    items: list[Any]
+    population: dict[str, int]  # stratum -> number of items in the population
+    strata: dict[str, str] = field(default_factory=dict)  # item key -> stratum
+
+    @property
+    def size(self) -> int:
+        return len(self.items)
+
+
+def stratified_sample(
+    items: Iterable[Any],
+    stratum: Callable[[Any], str],
+    key: Callable[[Any], str],
+    margin: float = 0.05,
+    confidence: float = 0.95,
+    seed: int = 0,
+) -> StratifiedSample:
+    "Sample enough items to reach `margin` at `confidence`, spread over the strata"
+    groups = defaultdict(list)
+    for item in items:
+        groups[stratum(item)].append(item)
+    population = {s: len(group) for s, group in sorted(groups.items())}
+    allocation = allocate(population, sample_size(sum(population.values()), margin, confidence))
+    rng = random.Random(seed)
+    sample = StratifiedSample(items=[], population=population)
+    for s, group in sorted(groups.items()):
+        for item in rng.sample(group, allocation[s]):
+            sample.items.append(item)
+            sample.strata[key(item)] = s
+    return sample
+
+
+def stratified_means(
+    rows: Iterable[dict],  # per row scores, with the key of the row under "filename"
+    sample: StratifiedSample,
+    confidence: float = 0.95,
+) -> dict[str, tuple[float, float]]:
+    """
+    Population estimate of every score with the half width of its confidence interval.
+
+    Each stratum mean is weighted by the share of the population in that stratum, the
+    variance includes the finite population correction of every stratum.
+    """
+    values = defaultdict(lambda: defaultdict(list))  # metric -> stratum -> values
+    for row in rows:
+        s = sample.strata.get(row["filename"])
+        if s is None:
+            continue
+        for metric, value in row.items():
+            if metric != "filename":
+                values[metric][s].append(value)
+
+    z = z_score(confidence)
+    estimates = {}
+    for metric, by_stratum in sorted(values.items()):
+        # strata without any score for this metric are left out of its population
+        covered = sum(sample.population[s] for s in by_stratum)
+        mean = var = 0.0
+        for s, stratum_values in by_stratum.items():
+            weight, n, size = sample.population[s] / covered, len(stratum_values), sample.population[s]
+            mean += weight * sum(stratum_values) / n
+            if n > 1:
+                var += weight**2 * (1 - n / size) * variance(stratum_values) / n
+        estimates[metric] = (mean, z * math.sqrt(var))
+    return estimates
+
+
+def changed_since(mtime: float, since: Optional[float]) -> str:
+    "'changed' if a file was modified after `since` (None: never evaluated), else 'unchanged'"
+    return "changed" if since is None or mtime > since else "unchanged"
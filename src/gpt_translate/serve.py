@@ -0,0 +1,347 @@
+import json
+import time
+import asyncio
+import itertools
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Optional
+from uuid import uuid4
+
+from gpt_translate.cache import SqliteLRUCache
+from gpt_translate.translate import Translator, _translate_file
+from gpt_translate.utils import logger
+
+MAX_BODY_SIZE = 1 << 20  # job requests are small JSON documents
+HTTP_STATUS = {
+    200: "OK",
+    202: "Accepted",
+    400: "Bad Request",
+    403: "Forbidden",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    415: "Unsupported Media Type",
+}
+
+
+class RequestError(Exception):
+    "A request the server answers with an HTTP error status"
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+@dataclass
+class Job:
+    "A file to translate, submitted to a `TranslationService`"
+    input_file: str
+    out_file: str
+    language: str
+    priority: int = 0  # lower runs first, FIFO within a priority
+    id: str = field(default_factory=lambda: uuid4().hex)
+    status: str = "queued"  # queued, running, done or failed
+    error: Optional[str] = None
+    changed: Optional[bool] = None
+    failed_chunks: list[dict] = field(default_factory=list)
+    submitted: float = field(default_factory=time.time)
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    done: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "input_file": self.input_file,
+            "out_file": self.out_file,
+            "language": self.language,
+            "priority": self.priority,
+            "error": self.error,
+            "changed": self.changed,
+            "failed_chunks": self.failed_chunks,
+            "queued_seconds": (self.started or time.time()) - self.submitted,
+            "duration": self.finished - self.started if self.finished else None,
+        }
+
+
+class TranslationService:
+    """
+    Translate the submitted files with warm translators.
+
+    One `Translator` is built per language on first use and kept, so the prompts and
+    dictionaries are loaded once and every job only pays for the LLM calls. Jobs wait in
+    a priority queue served by `num_workers` workers, and the last `keep_jobs` finished
+    jobs are kept for status requests. Submitted files must be in `input_folder` and
+    translations are only written to `out_folder`.
+    """
+
+    def __init__(
+        self,
+        config_folder: str = "./configs",
+        language: str = "ja",  # language of the jobs that do not set one
+        model_args: dict = dict(model="gpt-4o", temperature=1.0),
+        num_workers: int = 7,
+        replace: bool = True,
+        remove_comments: bool = True,
+        do_translate_header_description: bool = True,
+        do_translate_header_title: bool = True,
+        skip_unchanged: bool = False,
+        chunk_tokens: int = 0,
+        validation_retries: int = 1,
+        max_retries: int = 3,
+        keep_jobs: int = 1000,
+        input_folder: str = ".",  # files outside of this folder are refused
+        out_folder: str = ".",  # translations outside of this folder are refused
+        cache: Optional[SqliteLRUCache] = None,  # translated sections, only edited sections are translated again
+    ):
+        self.config_folder = config_folder
+        self.language = language
+        self.model_args = model_args
+        self.num_workers = num_workers
+        self.replace = replace
+        self.remove_comments = remove_comments
+        self.do_translate_header_description = do_translate_header_description
+        self.do_translate_header_title = do_translate_header_title
+        self.skip_unchanged = skip_unchanged
+        self.chunk_tokens = chunk_tokens
+        self.validation_retries = validation_retries
+        self.max_retries = max_retries
+        self.keep_jobs = keep_jobs
+        self.input_folder = Path(input_folder).resolve()
+        self.out_folder = Path(out_folder).resolve()
+        self.cache = cache
+        self.jobs: dict[str, Job] = {}
+        self.translators: dict[str, Translator] = {}
+        self._finished = deque()
+        self._queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self._order = itertools.count()
+        self._workers: list[asyncio.Task] = []
+
+    @property
+    def queued(self) -> int:
+        return self._queue.qsize()
+
+    @property
+    def running(self) -> int:
+        return sum(job.status == "running" for job in self.jobs.values())
+
+    def translator(self, language: str) -> Translator:
+        "The translator of `language`, built on first use"
+        if language not in self.translators:
+            logger.info(f"Loading the {language} translator")
+            self.translators[language] = Translator(
+                config_folder=self.config_folder,
+                language=language,
+                do_translate_header_description=self.do_translate_header_description,
+                do_translate_header_title=self.do_translate_header_title,
+                model_args=self.model_args,
+                chunk_tokens=self.chunk_tokens,
+                validation_retries=self.validation_retries,
+            )
+        return self.translators[language]
+
+    def submit(self, input_file: str, out_file: str, language: Optional[str] = None, priority: int = 0) -> Job:
+        job = Job(input_file=input_file, out_file=out_file, language=language or self.language, priority=priority)
+        self.jobs[job.id] = job
+        self._queue.put_nowait((job.priority, next(self._order), job.id))
+        logger.info(f"Queued {job.input_file} -> {job.out_file} ({job.language}, priority {job.priority})")
+        return job
+
+    async def _run(self, job: Job) -> None:
+        job.status, job.started = "running", time.time()
+        try:
+            result = await _translate_file(
+                input_file=job.input_file,
+                out_file=job.out_file,
+                replace=self.replace,
+                language=job.language,
+                remove_comments=self.remove_comments,
+                max_retries=self.max_retries,
+                skip_unchanged=self.skip_unchanged,
+                translator=self.translator(job.language),
+                cache=self.cache,
+            )
+        except Exception as e:
+            result = {"error": str(e)}
+        job.error = result.get("error")
+        job.changed = result.get("changed")
+        job.failed_chunks = result.get("failed_chunks", [])
+        job.status = "failed" if job.error is not None else "done"
+        job.finished = time.time()
+        logger.info(f"{job.status.capitalize()}: {job.input_file} in {job.finished - job.started:.2f} s")
+
+    def _forget_old_jobs(self, job: Job) -> None:
+        self._finished.append(job.id)
+        while len(self._finished) > self.keep_jobs:
+            self.jobs.pop(self._finished.popleft(), None)
+
+    async def _worker(self) -> None:
+        while True:
+            _, _, job_id = await self._queue.get()
+            job = self.jobs[job_id]
+            try:
+                await self._run(job)
+            finally:
+                job.done.set()
+                self._forget_old_jobs(job)
+                self._queue.task_done()
+
+    async def start(self) -> None:
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.num_workers)]
+
+    async def stop(self) -> None:
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def health(self) -> dict[str, Any]:
+        return {
+            "status": "ok",
+            "queued": self.queued,
+            "running": self.running,
+            "languages": sorted(self.translators),
+        }
+
+    async def handle(self, method: str, path: str, body: dict) -> tuple[int, dict]:
+        """
+        Answer one API request with a status and a JSON payload.
+
+        - `GET /health`: queue size, running jobs and loaded languages
+        - `POST /jobs` with `{"input_file", "out_file", "language", "priority", "wait"}`: queue a
+          job, with `"wait": true` the answer is sent once it is finished
+        - `GET /jobs/<id>`: status of a job
+        """
+        if path == "/health":
+            if method != "GET":
+                raise RequestError(405, f"{method} {path}")
+            return 200, self.health()
+        if path == "/jobs":
+            if method != "POST":
+                raise RequestError(405, f"{method} {path}")
+            missing = [key for key in ("input_file", "out_file") if not body.get(key)]
+            if missing:
+                raise RequestError(400, f"Missing {', '.join(missing)}")
+            if Path(body["input_file"]).suffix not in (".md", ".mdx"):
+                raise RequestError(400, f"{body['input_file']} is not a markdown file")
+            input_file = confine(body["input_file"], self.input_folder)
+            out_file = confine(body["out_file"], self.out_folder)
+            try:
+                priority = int(body.get("priority", 0))
+            except (TypeError, ValueError):
+                raise RequestError(400, f"Invalid priority {body.get('priority')!r}")
+            job = self.submit(str(input_file), str(out_file), body.get("language"), priority)
+            if body.get("wait"):
+                await job.done.wait()
+                return 200, job.to_dict()
+            return 202, job.to_dict()
+        if path.startswith("/jobs/"):
+            if method != "GET":
+                raise RequestError(405, f"{method} {path}")
+            job = self.jobs.get(path.removeprefix("/jobs/"))
+            if job is None:
+                raise RequestError(404, f"No job {path.removeprefix('/jobs/')}")
+            return 200, job.to_dict()
+        raise RequestError(404, f"Unknown path {path}")
+
+
+def confine(path: str, root: Path) -> Path:
+    "`path` resolved, relative to the working directory, refused unless it is inside `root`"
+    resolved = Path(path).resolve()
+    if not resolved.is_relative_to(root):
+        raise RequestError(403, f"{path} is outside of {root}")
+    return resolved
+
+
+async def read_request(reader: asyncio.StreamReader) -> tuple[str, str, dict]:
+    """
+    Method, path and JSON body of an HTTP/1.1 request.
+
+    Requests sent by browsers (with an `Origin` header) are refused, so a web page cannot
+    submit jobs to a local service, and bodies must be sent as `application/json`.
+    """
+    request_line = (await reader.readline()).decode("latin-1").split()
+    if len(request_line) != 3:
+        raise RequestError(400, "Malformed request line")
+    method, path, _ = request_line
+    headers = {}
+    while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    if "origin" in headers:
+        raise RequestError(403, "Cross-origin requests are not allowed")
+    try:
+        length = int(headers.get("content-length", 0) or 0)
+    except ValueError:
+        raise RequestError(400, f"Invalid Content-Length {headers['content-length']!r}")
+    if length < 0:
+        raise RequestError(400, f"Invalid Content-Length {length}")
+    if length > MAX_BODY_SIZE:
+        raise RequestError(413, f"Body larger than {MAX_BODY_SIZE} bytes")
+    body = {}
+    if length:
+        if headers.get("content-type", "").split(";")[0].strip().lower() != "application/json":
+            raise RequestError(415, "The body must be sent as application/json")
+        try:
+            body = json.loads(await reader.readexactly(length))
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            raise RequestError(400, f"Invalid JSON body: {e}")
+        if not isinstance(body, dict):
+            raise RequestError(400, "The body must be a JSON object")
+    return method.upper(), path.split("?", 1)[0].rstrip("/") or "/", body
+
+
+def write_response(writer: asyncio.StreamWriter, status: int, payload: dict) -> None:
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    writer.write(
+        f"HTTP/1.1 {status} {HTTP_STATUS.get(status, '')}\r\n"
+        "Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "Connection: close\r\n\r\n".encode("latin-1")
+        + body
+    )
+
+
+async def serve(
+    service: TranslationService,
+    host: str = "127.0.0.1",
+    port: int = 8765,
+    socket: Optional[str] = None,  # listen on this Unix socket instead of host:port
+    ready: Optional[asyncio.Event] = None,  # set once the server accepts connections
+) -> None:
+    "Serve the API of `service` over HTTP until cancelled, one request per connection"
+
+    async def _on_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            method, path, body = await read_request(reader)
+            status, payload = await service.handle(method, path, body)
+        except RequestError as e:
+            status, payload = e.status, {"error": str(e)}
+        except (ConnectionError, asyncio.IncompleteReadError):
+            writer.close()
+            return
+        write_response(writer, status, payload)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    if socket:
+        server = await asyncio.start_unix_server(_on_connection, path=socket)
+        where = socket
+    else:
+        server = await asyncio.start_server(_on_connection, host=host, port=port)
+        where = f"http://{host}:{server.sockets[0].getsockname()[1]}"
+    await service.start()
+    logger.info(f"Translation service listening on {where}")
+    if ready is not None:
+        ready.set()
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
+        if socket:
+            Path(socket).unlink(missing_ok=True)
@@ -0,0 +1,148 @@
+import os
+import json
+import heapq
+import hashlib
+from dataclasses import asdict
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+from gpt_translate.translate import TranslationReport
+from gpt_translate.utils import DiscoveredFile, estimate_tokens, stat_files
+
+SHARD_BY = ("hash", "tokens")
+
+
+def shard_key(path: Path | str, input_folder: Path | str) -> str:
+    "Path of a file relative to the input folder, the same on every machine"
+    try:
+        return Path(path).relative_to(input_folder).as_posix()
+    except ValueError:
+        return Path(path).as_posix()
+
+
+def hash_shard(key: str, num_shards: int) -> int:
+    "Shard of `key`, stable across runs, machines and Python versions (unlike `hash`)"
+    digest = hashlib.sha1(key.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % num_shards
+
+
+def balance_shards(weights: dict[str, int], num_shards: int) -> dict[str, int]:
+    """
+    Assign every key to a shard so that the shards get about the same total weight.
+
+    The heaviest keys are placed first, each on the lightest shard so far. Ties are
+    broken by key and shard index, so every machine gets the same assignment from the
+    same files.
+    """
+    loads = [(0, shard) for shard in range(num_shards)]
+    assignment = {}
+    for key in sorted(weights, key=lambda k: (-weights[k], k)):
+        load, shard = heapq.heappop(loads)
+        assignment[key] = shard
+        heapq.heappush(loads, (load + weights[key], shard))
+    return assignment
+
+
+def select_shard(
+    files: Iterable[str | Path | DiscoveredFile],
+    input_folder: Path | str,
+    shard_index: int = 0,
+    num_shards: int = 1,
+    shard_by: str = "hash",  # "hash" of the relative path, or "tokens" to balance the token estimates
+) -> Iterator[DiscoveredFile]:
+    """
+    The files of shard `shard_index` out of `num_shards`.
+
+    With "hash" files are filtered lazily and a file stays in the same shard when others
+    are added or removed. With "tokens" every file is estimated upfront and the shards get
+    about the same amount of work, see `balance_shards`.
+    """
+    if shard_by not in SHARD_BY:
+        raise ValueError(f"Unknown shard_by {shard_by}, expected one of {SHARD_BY}")
+    if not 0 <= shard_index < num_shards:
+        raise ValueError(f"shard_index must be in [0, {num_shards}), got {shard_index}")
+    files = stat_files(files)
+    if num_shards == 1:
+        return files
+    if shard_by == "hash":
+        return (f for f in files if hash_shard(shard_key(f.path, input_folder), num_shards) == shard_index)
+    files = {shard_key(f.path, input_folder): f for f in files}
+    assignment = balance_shards({key: estimate_tokens(f) for key, f in files.items()}, num_shards)
+    return (f for key, f in files.items() if assignment[key] == shard_index)
+
+
+def manifest_path(out_folder: Path | str, shard_index: int, num_shards: int, manifest: Optional[str] = None) -> Path:
+    "Where a shard writes its manifest, next to the translations by default"
+    if manifest:
+        return Path(manifest)
+    return Path(out_folder) / f".gpt_translate_shard_{shard_index}_of_{num_shards}.json"
+
+
+def write_manifest(
+    path: Path | str,
+    report: TranslationReport,
+    shard_index: int,
+    num_shards: int,
+    language: str,
+    sync_commit: Optional[str] = None,  # source commit the shard was synchronized to, with since_last_sync
+) -> None:
+    "Save the report of a shard with what `merge_manifests` needs to combine it with the others"
+    path = Path(path)
+    manifest = {
+        "shard_index": shard_index,
+        "num_shards": num_shards,
+        "language": language,
+        "sync_commit": sync_commit,
+        "report": asdict(report),
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = path.with_name(path.name + ".tmp")
+    tmp_file.write_text(json.dumps(manifest, indent=2, ensure_ascii=False) + "\n")
+    os.replace(tmp_file, path)
+
+
+def read_manifest(path: Path | str) -> dict:
+    return json.loads(Path(path).read_text())
+
+
+def merge_manifests(manifests: Iterable[dict]) -> dict:
+    """
+    Combine the manifests of the shards of one run.
+
+    Counts add up, failures and outputs are concatenated and durations are the ones of
+    the slowest shard. `missing_shards` lists the shards without a manifest, and
+    `sync_commit` is only kept if every shard was synchronized to the same commit.
+    """
+    manifests = sorted(manifests, key=lambda m: m["shard_index"])
+    if not manifests:
+        raise ValueError("No manifests to merge")
+    for key in ("num_shards", "language"):
+        values = {m[key] for m in manifests}
+        if len(values) > 1:
+            raise ValueError(f"Manifests of different runs, {key} is one of {sorted(values)}")
+    shards = [m["shard_index"] for m in manifests]
+    if len(set(shards)) < len(shards):
+        raise ValueError(f"Several manifests for the same shard: {shards}")
+    num_shards = manifests[0]["num_shards"]
+
+    merged = TranslationReport(outputs=[])
+    for manifest in manifests:
+        report = manifest["report"]
+        merged.translated += report["translated"]
+        merged.changed += report["changed"]
+        merged.failed += report["failed"]
+        merged.failed_chunks += report["failed_chunks"]
+        merged.outputs += report.get("outputs") or []
+        merged.duration = max(merged.duration, report["duration"])
+        merged.tail = max(merged.tail, report["tail"])
+        merged.max_loop_lag = max(merged.max_loop_lag, report["max_loop_lag"])
+    merged.mean_loop_lag = sum(m["report"]["mean_loop_lag"] for m in manifests) / len(manifests)
+    sync_commits = {m["sync_commit"] for m in manifests}
+    return {
+        "num_shards": num_shards,
+        "shards": shards,
+        "missing_shards": sorted(set(range(num_shards)) - set(shards)),
+        "language": manifests[0]["language"],
+        "sync_commit": sync_commits.pop() if len(sync_commits) == 1 else None,
+        "report": asdict(merged),
+    }
@@ -0,0 +1,88 @@
+import os
+import json
+from pathlib import Path
+from typing import Iterable, Optional
+
+from gpt_translate.utils import DEFAULT_EXCLUDE, FileChange, IgnoreRules, logger
+
+SYNC_STATE_FILE = ".gpt_translate_sync.json"
+
+
+def sync_state_path(out_folder: Path | str, state_file: Optional[str] = None) -> Path:
+    "Where the last synchronized commits are stored, next to the translations by default"
+    return Path(state_file) if state_file else Path(out_folder) / SYNC_STATE_FILE
+
+
+def read_last_sync(state_file: Path | str, language: str) -> Optional[str]:
+    "Source commit SHA `language` was last synchronized to, None if it never was"
+    state_file = Path(state_file)
+    if not state_file.exists():
+        return None
+    return json.loads(state_file.read_text()).get(language)
+
+
+def write_last_sync(state_file: Path | str, language: str, commit: str) -> None:
+    "Record that `language` is synchronized to `commit`, keeping the other locales"
+    state_file = Path(state_file)
+    state = json.loads(state_file.read_text()) if state_file.exists() else {}
+    state[language] = commit
+    state_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = state_file.with_name(state_file.name + ".tmp")
+    tmp_file.write_text(json.dumps(state, indent=2, sort_keys=True) + "\n")
+    os.replace(tmp_file, state_file)
+
+
+def apply_changes(
+    changes: Iterable[FileChange],
+    repo_root: Path,
+    input_folder: Path | str,
+    out_folder: Path | str,
+    exclude: Iterable[str] | IgnoreRules = DEFAULT_EXCLUDE,
+) -> list[Path]:
+    """
+    Mirror source deletions and renames in `out_folder` and return the source files to translate.
+
+    Translations of deleted sources are removed, translations of renamed sources are
+    moved along and only re-translated if the content changed too. Every change is applied
+    before returning, so a caller translating only part of the list still leaves
+    `out_folder` consistent. Files matching `exclude` are skipped like in a full run, a file
+    renamed into an excluded folder counts as deleted and one renamed out of it as added.
+    """
+    input_folder = Path(input_folder)
+    out_folder = Path(out_folder)
+    resolved_input_folder = input_folder.resolve()
+    rules = exclude if isinstance(exclude, IgnoreRules) else IgnoreRules(exclude)
+
+    def _relative(path: Path) -> Path:
+        return (repo_root / path).relative_to(resolved_input_folder)
+
+    def _out_file(path: Path) -> Path:
+        return out_folder / _relative(path)
+
+    def _excluded(path: Path) -> bool:
+        return rules.excluded(_relative(path).as_posix())
+
+    to_translate = []
+    for change in changes:
+        if change.status == "R" and _excluded(change.old_path):
+            change = FileChange("A", change.path)
+        if _excluded(change.path):
+            if change.status != "R":
+                continue
+            change = FileChange("D", change.old_path)
+        if change.status == "D":
+            out_file = _out_file(change.path)
+            if out_file.exists():
+                out_file.unlink()
+                logger.info(f"Removed {out_file}, its source was deleted")
+            continue
+        if change.status == "R":
+            old_out_file, new_out_file = _out_file(change.old_path), _out_file(change.path)
+            if old_out_file.exists():
+                new_out_file.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(old_out_file, new_out_file)
+                logger.info(f"Moved {old_out_file} to {new_out_file}")
+                if change.similarity == 100:
+                    continue
+        to_translate.append(input_folder / _relative(change.path))
+    return to_translate
@@ -1,24 +1,40 @@
+import os
+import math
 import asyncio
-import time
-from typing import Any
+import multiprocessing
 from pathlib import Path
 from copy import copy
-from dataclasses import dataclass
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Any, Awaitable, Callable, Iterable, Iterator, Optional
 import weave
 from pydantic import model_validator, Field
 
 from gpt_translate.prompts import PromptTemplate
 from gpt_translate.loader import (
-    remove_markdown_comments,
     MDPage,
     Header,
+    chunk_markdown,
+    split_markdown,
 )
+from gpt_translate.cache import SqliteLRUCache, cache_key
+from gpt_translate.validation import chunk_problems, header_item_problems
 from gpt_translate.utils import (
     file_is_empty,
+    stat_files,
+    DiscoveredFile,
     count_tokens,
     longer_create,
     to_weave_dataset,
-    gather_with_progress,
+    run_workers,
+    make_progress,
+    estimate_tokens,
+    read_text,
+    read_text_async,
+    write_text_async,
+    LoopLagMonitor,
     console,
     logger,
 )
@@ -29,6 +45,7 @@ REPLACE = False
 REMOVE_COMMENTS = True
 MAX_CONCURRENT_CALLS = 7  # Adjust the limit as needed
 MIN_CONTENT_LENGTH = 10
+SCHEDULES = ("discovery", "longest_first")
 
 @dataclass
 class TranslationResult:
@@ -36,6 +53,104 @@ class TranslationResult:
     tokens: int
 
 
+@dataclass
+class PreparedPage:
+    "A page parsed and split into chunks ahead of its translation, see `prepare_pages`"
+    md_page: MDPage
+    chunks: list[str]
+
+
+def page_chunks(content: str, chunk_tokens: int = 0, sections: bool = False) -> list[str]:
+    "Pieces of `content` translated in one call each: groups of sections, single sections or the whole content"
+    if chunk_tokens:
+        return chunk_markdown(content, chunk_tokens)
+    if sections:
+        return split_markdown(content)
+    return [content]
+
+
+def prepare_pages(
+    files: list[str],
+    remove_comments: bool = REMOVE_COMMENTS,
+    chunk_tokens: int = 0,
+    sections: bool = False,
+) -> list[Optional[PreparedPage]]:
+    """
+    Read, parse and chunk a batch of files, the CPU-bound part of a translation.
+
+    Meant to run in a process pool, one batch per call to keep the pickling and scheduling
+    overhead low. Empty or unreadable files are None, the translation handles them as usual.
+    """
+    prepared = []
+    for md_file in files:
+        try:
+            raw_content = read_text(md_file)
+        except (OSError, UnicodeDecodeError):
+            raw_content = ""
+        if not raw_content.strip():
+            prepared.append(None)
+            continue
+        md_page = MDPage.from_raw_content(filename=md_file, raw_content=raw_content, remove_comments=remove_comments)
+        prepared.append(PreparedPage(md_page, page_chunks(md_page.content, chunk_tokens, sections)))
+    return prepared
+
+
+def _prepare_batches(
+    md_files: Iterable[DiscoveredFile],
+    pool: Executor,
+    batch_size: int,
+    **kwargs,
+) -> Iterator[tuple[DiscoveredFile, Future, int]]:
+    """
+    Submit `prepare_pages` for every `batch_size` files as they are pulled, and yield each
+    file with the future of its batch and its index in it. Batches are prepared in the pool
+    while the files ahead of them are being translated.
+    """
+    md_files = iter(md_files)
+    while batch := list(islice(md_files, batch_size)):
+        future = pool.submit(prepare_pages, [str(f.path) for f in batch], **kwargs)
+        for index, md_file in enumerate(batch):
+            yield md_file, future, index
+
+
+@dataclass
+class TranslationReport:
+    "Summary of a translation run, fed one file result at a time"
+    translated: int = 0
+    changed: int = 0  # translated files whose output actually changed on disk
+    failed: list[dict] = field(default_factory=list)
+    failed_chunks: list[dict] = field(default_factory=list)  # chunks kept despite failing validation
+    duration: float = 0.0  # seconds
+    tail: float = 0.0  # seconds between the first idle worker and the end of the run
+    max_loop_lag: float = 0.0  # seconds, worst delay of the event loop during the run
+    mean_loop_lag: float = 0.0  # seconds
+    outputs: Optional[list[dict]] = None  # input, output and changed flag of every translated file, kept if a list
+
+    @property
+    def total(self) -> int:
+        return self.translated + len(self.failed)
+
+    def add(self, result: dict) -> None:
+        "Record a result from `_translate_file`, keeping only what the summary needs"
+        if result.get("error") is None:
+            self.translated += 1
+            self.changed += bool(result.get("changed", True))
+            if self.outputs is not None:
+                self.outputs.append(
+                    {
+                        "input_file": result.get("input_file"),
+                        "output_file": result.get("output_file"),
+                        "changed": bool(result.get("changed", True)),
+                    }
+                )
+            for chunk in result.get("failed_chunks", []):
+                self.failed_chunks.append({"input_file": result.get("input_file"), **chunk})
+        else:
+            self.failed.append(
+                {"input_file": result.get("input_file"), "error": result["error"]}
+            )
+
+
 @weave.op
 async def translate_content(md_content: str, prompt: PromptTemplate, **model_args) -> TranslationResult:
     """Translate a markdown chunk asynchronously
@@ -57,6 +172,8 @@ class Translator(weave.Object):
     do_translate_header_title: bool = True
     model_args: dict = dict(model="gpt-4o", temperature=1.0)
     prompt_template: PromptTemplate = Field(default=None)
+    chunk_tokens: int = 0  # Translate the content in chunks of sections up to this size, 0 for a single call
+    validation_retries: int = 1  # Times a chunk failing the structural checks is translated again, needs chunk_tokens
 
     @model_validator(mode="before")
     def initialize_fields(cls, values):
@@ -71,44 +188,185 @@ class Translator(weave.Object):
         )
         return values
 
+    def cache_key(self, text: str) -> str:
+        "Everything the translation of `text` depends on, hashed"
+        prompt = self.prompt_template
+        return cache_key(
+            text, self.language, prompt.system_prompt, prompt.human_prompt, prompt.dictionary, self.model_args
+        )
+
     @weave.op
-    async def translate_file(self, md_file: str, remove_comments: bool = True) -> dict[str, Any]:
-        """Translate a markdown file asynchronously"""
-        with open(md_file, "r") as f:
-            raw_content = f.read()
-        if remove_comments:
-            logger.debug("Removing comments")
-            raw_content_cleaned = remove_markdown_comments(raw_content)
-
-        md_page = MDPage.from_raw_content(filename=md_file, raw_content=raw_content_cleaned)
+    async def translate_file(
+        self,
+        md_file: str,
+        remove_comments: bool = True,
+        cache: Optional[SqliteLRUCache] = None,
+        prepared: Optional[PreparedPage] = None,  # the page already parsed and chunked, e.g. in a process pool
+        executor: Optional[Executor] = None,  # runs the validation of the translated chunks
+    ) -> dict[str, Any]:
+        """Translate a markdown file asynchronously, see `translate_page` for the `cache`"""
+        if prepared is None:
+            raw_content = await read_text_async(md_file)
+            md_page = MDPage.from_raw_content(
+                filename=md_file, raw_content=raw_content, remove_comments=remove_comments
+            )
+            chunks = None
+        else:
+            md_page, chunks = prepared.md_page, prepared.chunks
         logger.debug(
             f"[bold red blink]Calling OpenAI [/bold red blink]with {self.model_args}\nFile: {md_file}\nContent:\n{md_page.content[:100]}...",
             extra={"markup": True},
         )
-        translated_page = await self.translate_page(md_page)
-        return {"original_page": md_page, "translated_page": translated_page, "error": None}
+        failed_chunks = []
+        translated_page = await self.translate_page(
+            md_page, failures=failed_chunks, cache=cache, chunks=chunks, executor=executor
+        )
+        return {
+            "original_page": md_page,
+            "translated_page": translated_page,
+            "error": None,
+            "failed_chunks": failed_chunks,
+        }
+
+    async def _translate_checked(
+        self,
+        text: str,
+        translate: Callable[[str], Awaitable[TranslationResult]],
+        check: Callable[[str, str], list[str]],
+        what: str,
+        failures: Optional[list[dict]],
+        cache: Optional[SqliteLRUCache] = None,
+        executor: Optional[Executor] = None,
+        retries: Optional[int] = None,  # defaults to `validation_retries`
+    ) -> str:
+        """
+        Translate `text` and run the `check` validator on the result, translating it again
+        up to `retries` times while it fails. The last translation is kept and
+        the failure recorded in `failures`. Translations passing the checks are stored in
+        `cache`, and `text` is only sent to the model if the cache has no translation for it.
+        With an `executor` the checks run there instead of on the event loop.
+        """
+        key = self.cache_key(text) if cache is not None else None
+        if key is not None and (cached := cache.get(key)) is not None:
+            return cached
+        if retries is None:
+            retries = self.validation_retries
+        for attempt in range(retries + 1):
+            translated = str((await translate(text)).content)
+            if executor is None:
+                problems = check(text, translated)
+            else:
+                problems = await asyncio.get_running_loop().run_in_executor(executor, check, text, translated)
+            if not problems:
+                if key is not None:
+                    cache.put(key, translated)
+                return translated
+            logger.warning(f"{what} failed validation (attempt {attempt + 1}): {'; '.join(problems)}")
+        if failures is not None:
+            failures.append({"chunk": what, "problems": problems})
+        return translated
+
+    async def _translate_chunk(self, chunk: str) -> TranslationResult:
+        return await translate_content(chunk, self.prompt_template, **self.model_args)
+
+    async def _translate_cached_chunks(
+        self,
+        md_page: MDPage,
+        chunks: list[str],
+        failures: Optional[list[dict]],
+        cache: SqliteLRUCache,
+        executor: Optional[Executor],
+        retries: int,
+    ) -> str:
+        """
+        Translate the chunks of `md_page` missing from `cache`, all at once.
+
+        When none of the sections of a page is cached, the page is translated in a single
+        call like without a cache, and its translation is split by heading to fill the cache.
+        """
+        keys = [self.cache_key(chunk) for chunk in chunks]
+        translated = [cache.get(key) for key in keys]
+        if not self.chunk_tokens and len(chunks) > 1 and all(t is None for t in translated):
+            problems = []
+            content = await self._translate_checked(
+                md_page.content, self._translate_chunk, chunk_problems,
+                f"{md_page.filename} chunk 1/1", problems, None, executor, retries,
+            )
+            if failures is not None:
+                failures.extend(problems)
+            sections = split_markdown(content)
+            if not problems and len(sections) == len(chunks):
+                for key, section in zip(keys, sections):
+                    cache.put(key, section)
+            return content
+        missing = [i for i, t in enumerate(translated) if t is None]
+        results = await asyncio.gather(
+            *(
+                self._translate_checked(
+                    chunks[i], self._translate_chunk, chunk_problems,
+                    f"{md_page.filename} chunk {i + 1}/{len(chunks)}", failures, cache, executor, retries,
+                )
+                for i in missing
+            )
+        )
+        for i, result in zip(missing, results):
+            translated[i] = result
+        return "\n\n".join(translated)
 
     @weave.op
-    async def translate_page(self, md_page: MDPage, translate_header: bool = True):
-        """Translate a markdown page asynchronously"""
+    async def translate_page(
+        self,
+        md_page: MDPage,
+        translate_header: bool = True,
+        failures: Optional[list[dict]] = None,  # collects the chunks still failing validation
+        cache: Optional[SqliteLRUCache] = None,  # translations of chunks and header items already done
+        chunks: Optional[list[str]] = None,  # `page_chunks` of the content if already computed
+        executor: Optional[Executor] = None,  # runs the validation of the translations
+    ):
+        """
+        Translate a markdown page asynchronously, checking every chunk as it comes back.
+
+        With a `cache`, the page is split by section (unless `chunk_tokens` groups them) and
+        only the sections missing from the cache are sent to the model, concurrently, so
+        editing one section of a page only translates that section again. A page with no
+        cached section is translated in one call, see `_translate_cached_chunks`. Content chunks are
+        only translated again on failed checks with `chunk_tokens`, without it a retry would
+        translate the whole page again.
+        """
         if len(md_page.content.strip()) < MIN_CONTENT_LENGTH:
             translated_content = md_page.content
             logger.warning(f"Skipping translation of {md_page} because it is empty")
         else:
-            translated_content = await translate_content(
-                md_page.content, self.prompt_template, **self.model_args
-            )
-            translated_content = str(translated_content.content)
+            if chunks is None:
+                chunks = page_chunks(md_page.content, self.chunk_tokens, sections=cache is not None)
+            retries = self.validation_retries if self.chunk_tokens > 0 else 0
+            if cache is not None:
+                translated_content = await self._translate_cached_chunks(
+                    md_page, chunks, failures, cache, executor, retries
+                )
+            else:
+                translated_chunks = []
+                for i, chunk in enumerate(chunks):
+                    what = f"{md_page.filename} chunk {i + 1}/{len(chunks)}"
+                    translated_chunks.append(
+                        await self._translate_checked(
+                            chunk, self._translate_chunk, chunk_problems, what, failures, cache, executor, retries
+                        )
+                    )
+                translated_content = "\n\n".join(translated_chunks)
 
         logger.debug(f"Translated content: {translated_content}")
         logger.debug(f"Header {md_page.header}")
         if md_page.header.description and self.do_translate_header_description:
-            translated_header_description = await self.translate_header_item(
-                md_page.header.description
+            translated_desc = await self._translate_checked(
+                md_page.header.description,
+                self.translate_header_item,
+                header_item_problems,
+                f"{md_page.filename} description",
+                failures,
+                cache,
+                executor,
             )
-            
-            # Ensure the translated description is a string
-            translated_desc = str(translated_header_description.content) if translated_header_description else None
         else:
             translated_desc = md_page.header.description
 
@@ -116,12 +374,15 @@ class Translator(weave.Object):
         new_metadata = copy(md_page.header.metadata)
         
         if  md_page.header.title and self.do_translate_header_title:
-            translated_header_title = await self.translate_header_item(
-                md_page.header.title
+            translated_title = await self._translate_checked(
+                md_page.header.title,
+                self.translate_header_item,
+                header_item_problems,
+                f"{md_page.filename} title",
+                failures,
+                cache,
+                executor,
             )
-
-            # Ensure the translated title is a string
-            translated_title = str(translated_header_title.content) if translated_header_title else None
         else:
             translated_title = md_page.header.title
         if 'support' in md_page.header.metadata:
@@ -129,9 +390,17 @@ class Translator(weave.Object):
                 # logging.info(f"medatada: {md_page.header.metadata}")
                 support_translated = []
                 for item in md_page.header.metadata["support"]:
-                    support_item = await self.translate_header_item(item)
-                    # Explicitly cast to string
-                    support_translated.append(str(support_item.content))
+                    support_translated.append(
+                        await self._translate_checked(
+                            item,
+                            self.translate_header_item,
+                            header_item_problems,
+                            f"{md_page.filename} support item",
+                            failures,
+                            cache,
+                            executor,
+                        )
+                    )
                 new_metadata["support"] = support_translated
                 # logging.info(f"new_support: {new_metadata['support']}")
                 # logging.info(f"New metadata: {new_metadata}")
@@ -171,10 +440,18 @@ async def _translate_file(
     model_args: dict = dict(model="gpt-4o", temperature=1.0),  # Model args
     max_retries: int = 3,  # Maximum number of attempts
     retry_delay: float = 3.0,  # Delay (in seconds) between retries
+    input_stat: os.stat_result | None = None,  # `stat` of input_file if already known
+    skip_unchanged: bool = False,  # Leave out_file untouched if the translation is identical
+    chunk_tokens: int = 0,  # Translate the content in chunks of sections up to this size, 0 for a single call
+    validation_retries: int = 1,  # Times a chunk failing the structural checks is translated again, needs chunk_tokens
+    translator: Optional["Translator"] = None,  # Reuse this translator, the arguments above that configure one are ignored
+    cache: Optional[SqliteLRUCache] = None,  # Reuse the translations of unchanged sections, see `Translator.translate_page`
+    prepared: Optional[PreparedPage] = None,  # input_file already parsed and chunked, see `prepare_pages`
+    executor: Optional[Executor] = None,  # Run the validation of the translated chunks in this executor
 ) -> MDPage:
     """Translate a markdown file asynchronously with retry logic"""
 
-    if file_is_empty(input_file):
+    if prepared is None and file_is_empty(input_file, input_stat):
         raise ValueError(f"File {input_file} is empty")
 
     # Check that it is a markdown file
@@ -188,21 +465,31 @@ async def _translate_file(
 
     for attempt in range(1, max_retries + 1):
         try:
-            translator = Translator(
-                config_folder=config_folder,
-                language=language,
-                do_translate_header_description=do_translate_header_description,
-                model_args=model_args,
+            if translator is None:
+                translator = Translator(
+                    config_folder=config_folder,
+                    language=language,
+                    do_translate_header_description=do_translate_header_description,
+                    model_args=model_args,
+                    chunk_tokens=chunk_tokens,
+                    validation_retries=validation_retries,
+                )
+            translation_results = await translator.translate_file(
+                input_file, remove_comments, cache=cache, prepared=prepared, executor=executor
             )
-            translation_results = await translator.translate_file(input_file, remove_comments)
-            with open(out_file, "w", encoding="utf-8") as f:
-                f.write(str(translation_results["translated_page"]))
-            logger.debug(
-                f"✅ Translated file saved to [green]{out_file}[/green]",
-                extra={"markup": True},
+            changed = await write_text_async(
+                out_file, str(translation_results["translated_page"]), skip_unchanged
             )
+            if changed:
+                logger.debug(
+                    f"✅ Translated file saved to [green]{out_file}[/green]",
+                    extra={"markup": True},
+                )
+            else:
+                logger.debug(f"Translation of {input_file} is unchanged, {out_file} left untouched")
             return {
                 **translation_results,
+                "changed": changed,
                 "input_file": input_file,
                 "output_file": str(out_file),
                 "language": language,
@@ -223,9 +510,74 @@ async def _translate_file(
                 }
 
 
+def _take(jobs: deque, largest: bool):
+    "Pop jobs from the largest (left) or the smallest (right) end of a sorted deque"
+    while jobs:
+        yield jobs.popleft() if largest else jobs.pop()
+
+
+async def _longest_first(
+    md_files: Iterable[DiscoveredFile],
+    worker,
+    sink,
+    num_workers: int,
+    short_job_slots: int,
+    max_tokens: int,
+    progress,
+    pool: Optional[Executor] = None,
+    batch_size: int = 16,
+    stage: Callable[[Iterator], Iterable] = lambda jobs: jobs,
+) -> list[dict]:
+    """Run the largest files first to shorten the tail of the run.
+
+    Files are sorted by token count and most workers pop from the largest end, while
+    `short_job_slots` workers pop from the smallest end so short pages keep flowing.
+    Tokens are counted in `pool` by batches of `batch_size` files if given, and `stage`
+    wraps the jobs handed to the workers. Returns the `run_workers` stats of each pool.
+    """
+    # reading every file is blocking, keep it off the event loop
+    if pool is None:
+        tokens = await asyncio.to_thread(lambda: {f: estimate_tokens(f) for f in md_files})
+    else:
+        md_files = list(md_files)
+        counts = await asyncio.to_thread(lambda: list(pool.map(estimate_tokens, md_files, chunksize=batch_size)))
+        tokens = dict(zip(md_files, counts))
+    jobs = deque(sorted(tokens, key=tokens.get, reverse=True))
+    for md_file in list(jobs)[:3]:
+        continuations = math.ceil(tokens[md_file] / max_tokens)
+        logger.info(
+            f"Large job: {md_file.path} ({tokens[md_file]} tokens, ~{continuations} call"
+            + ("s)" if continuations > 1 else ")")
+        )
+
+    short_job_slots = min(short_job_slots, num_workers - 1)
+    pools = [
+        run_workers(
+            stage(_take(jobs, largest=True)),
+            worker,
+            sink=sink,
+            num_workers=num_workers - short_job_slots,
+            description="Translating files (largest first)",
+            progress=progress,
+        )
+    ]
+    if short_job_slots > 0:
+        pools.append(
+            run_workers(
+                stage(_take(jobs, largest=False)),
+                worker,
+                sink=sink,
+                num_workers=short_job_slots,
+                description="Translating files (short jobs)",
+                progress=progress,
+            )
+        )
+    return await asyncio.gather(*pools)
+
+
 @weave.op
 async def _translate_files(
-    input_files: list[str],  # Files to translate
+    input_files: Iterable[str | DiscoveredFile],  # Files to translate, consumed lazily
     input_folder: str,  # Folder where the files live
     out_folder: str,  # Folder to save the translated files to
     replace: bool = REPLACE,  # Replace existing file
@@ -235,56 +587,138 @@ async def _translate_files(
     do_translate_header_description: bool = True,  # Translate the header description
     model_args: dict = dict(model="gpt-4o", temperature=1.0),  # Model args
     max_concurrent_calls: int = MAX_CONCURRENT_CALLS,  # Maximum number of concurrent calls to OpenAI
-):
-    input_files = [
-        Path(f)
-        for f in input_files
-        if (Path(f).suffix in [".md", ".mdx"] and Path(f).exists())
-    ]
-    logger.info(
-        f"Translating {len(input_files)} file" + ("s" if len(input_files) > 1 else "")
-    )
-    input_files.sort()
+    schedule: str = "discovery",  # Order of the work: "discovery" or "longest_first"
+    short_job_slots: int = 1,  # Workers reserved for the smallest files with "longest_first"
+    skip_unchanged: bool = False,  # Leave outputs identical to the new translation untouched
+    changed_files: str | None = None,  # Write the outputs that really changed to this file, one per line
+    chunk_tokens: int = 0,  # Translate the content in chunks of sections up to this size, 0 for a single call
+    validation_retries: int = 1,  # Times a chunk failing the structural checks is translated again, needs chunk_tokens
+    record_outputs: bool = False,  # Keep the outputs of every file in the report, e.g. for a shard manifest
+    cpu_workers: int = 0,  # Processes parsing, chunking, counting tokens and validating, 0 to do it on the event loop
+    cpu_batch_size: int = 16,  # Files sent to a CPU worker at once
+) -> TranslationReport:
+    """Translate files through a bounded pool of `max_concurrent_calls` workers.
+
+    Files are pulled from `input_files` as workers free up and every result is folded
+    into a `TranslationReport` as soon as it is ready, so memory stays flat no matter
+    how many files are translated. With `schedule="longest_first"` the files are
+    estimated upfront and the largest ones start first, see `_longest_first`.
+
+    With `cpu_workers`, the CPU-bound stages run in a pool of processes: files are parsed
+    and chunked ahead of the workers by batches of `cpu_batch_size` (see `prepare_pages`)
+    and the translated chunks are validated there, the event loop only waits on the model.
+    """
+    if schedule not in SCHEDULES:
+        raise ValueError(f"Unknown schedule {schedule}, expected one of {SCHEDULES}")
     input_folder = Path(input_folder)
     out_folder = Path(out_folder)
     if not input_folder.is_dir():
         raise ValueError(f"{input_folder} is not a folder")
 
-    semaphore = asyncio.Semaphore(max_concurrent_calls)
-
-    async def _translate_with_semaphore(md_file: Path):
-        async with semaphore:
-            out_file = out_folder / md_file.relative_to(input_folder)
-            return await _translate_file(
-                input_file=str(md_file),
-                out_file=str(out_file),
-                replace=replace,
-                language=language,
-                config_folder=config_folder,
-                remove_comments=remove_comments,
-                do_translate_header_description=do_translate_header_description,
-                model_args=model_args,
-            )
+    # spawned workers, forking while the event loop and weave run threads can deadlock them
+    pool = ProcessPoolExecutor(cpu_workers, mp_context=multiprocessing.get_context("spawn")) if cpu_workers else None
 
-    start_time = time.perf_counter()
-    tasks = [_translate_with_semaphore(md_file) for md_file in input_files]
-    results = await gather_with_progress(tasks, "Translating files")
-    duration = time.perf_counter() - start_time
-    console.rule(f"Finished translating {len(input_files)} files in {duration:.2f} s")
+    def _stage(md_files: Iterable[DiscoveredFile]) -> Iterable:
+        if pool is None:
+            return md_files
+        return _prepare_batches(
+            md_files, pool, cpu_batch_size, remove_comments=remove_comments, chunk_tokens=chunk_tokens
+        )
 
-    correct_translations = [r for r in results if r.get("error") is None]
-    failed_translations = [r for r in results if r.get("error") is not None]
+    async def _translate_one(item):
+        prepared = None
+        if pool is None:
+            md_file = item
+        else:
+            md_file, batch, index = item
+            try:
+                prepared = (await asyncio.wrap_future(batch))[index]
+            except Exception as e:
+                logger.warning(f"Preparing {md_file.path} in the CPU pool failed, preparing it here: {e}")
+        out_file = out_folder / md_file.path.relative_to(input_folder)
+        return await _translate_file(
+            input_file=str(md_file.path),
+            out_file=str(out_file),
+            replace=replace,
+            language=language,
+            config_folder=config_folder,
+            remove_comments=remove_comments,
+            do_translate_header_description=do_translate_header_description,
+            model_args=model_args,
+            input_stat=md_file.stat,
+            skip_unchanged=skip_unchanged,
+            chunk_tokens=chunk_tokens,
+            validation_retries=validation_retries,
+            prepared=prepared,
+            executor=pool,
+        )
 
-    if failed_translations:
-        console.rule(f"Failed to translate {len(failed_translations)} files after maximum retry attempts")
-        for result in failed_translations:
+    report = TranslationReport(outputs=[] if record_outputs else None)
+    md_files = stat_files(input_files)
+    changed_list = open(changed_files, "w") if changed_files else None
+
+    def _sink(result: dict):
+        report.add(result)
+        if changed_list is not None and result.get("error") is None and result.get("changed"):
+            changed_list.write(f"{result['output_file']}\n")
+
+    try:
+        async with LoopLagMonitor() as loop_lag:
+            if schedule == "longest_first":
+                with make_progress() as progress:
+                    all_stats = await _longest_first(
+                        md_files,
+                        _translate_one,
+                        sink=_sink,
+                        num_workers=max_concurrent_calls,
+                        short_job_slots=short_job_slots,
+                        max_tokens=model_args.get("max_tokens", 4096),
+                        progress=progress,
+                        pool=pool,
+                        batch_size=cpu_batch_size,
+                        stage=_stage,
+                    )
+            else:
+                all_stats = [
+                    await run_workers(
+                        _stage(md_files),
+                        _translate_one,
+                        sink=_sink,
+                        num_workers=max_concurrent_calls,
+                        description="Translating files",
+                    )
+                ]
+    finally:
+        if changed_list is not None:
+            changed_list.close()
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+    finished = max(s["finished"] for s in all_stats)
+    report.duration = finished - min(s["started"] for s in all_stats)
+    report.tail = finished - min(s["first_idle"] for s in all_stats)
+    report.max_loop_lag, report.mean_loop_lag = loop_lag.max_lag, loop_lag.mean_lag
+    console.rule(
+        f"Finished translating {report.total} files in {report.duration:.2f} s "
+        f"(tail: {report.tail:.2f} s)"
+    )
+    console.print(
+        f"Event loop lag: max {report.max_loop_lag * 1000:.1f} ms, "
+        f"mean {report.mean_loop_lag * 1000:.1f} ms"
+    )
+    if skip_unchanged:
+        console.print(f"{report.changed} of {report.translated} translated files changed on disk")
+
+    if report.failed_chunks:
+        console.rule(f"{len(report.failed_chunks)} chunks still fail validation, check them")
+        for chunk in report.failed_chunks:
+            console.print(f"{chunk['chunk']}: {'; '.join(chunk['problems'])}", markup=False)
+    if report.failed:
+        console.rule(f"Failed to translate {len(report.failed)} files after maximum retry attempts")
+        for result in report.failed:
             console.print(f"Error translating {result['input_file']}: {result['error']}")
     else:
         console.rule("All files translated successfully")
-
-    # dataset = to_weave_dataset(name=f"Translation-{language}", rows=correct_translations)
-    # weave.publish(dataset)
-    # console.rule(f"Uploaded to Weave Dataset: Translation-{language}")
+    return report
 
 if __name__ == "__main__":
     from gpt_translate.cli import setup_logging
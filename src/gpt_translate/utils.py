@@ -1,4 +1,11 @@
+import os
+import re
 import time
+import errno
+import shutil
+import hashlib
+import tempfile
+import threading
 import git
 import logging
 import asyncio
@@ -6,16 +13,22 @@ import weave
 from pydantic import BaseModel, Field
 from datetime import datetime, timedelta
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 
 import tiktoken
 from litellm import acompletion
-from fastcore.xtras import globtastic
+from fnmatch import fnmatch
 from rich.console import Console
 from rich.logging import RichHandler
 from rich.progress import Progress, TaskID, TimeElapsedColumn, BarColumn, TextColumn, MofNCompleteColumn
-from typing import Optional
+from typing import Any, AsyncIterable, Awaitable, Callable, Iterable, Iterator, NamedTuple, Optional, Sized
 
 MODEL = "gpt-4o"
+MD_EXTENSIONS = (".md", ".mdx")
+DEFAULT_EXCLUDE = [".git/", "node_modules/"]
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".bmp", ".svg")
+# os.link errors meaning the files can not be hard-linked here, e.g. across devices
+NO_LINK_ERRORS = (errno.EXDEV, errno.EPERM, errno.ENOTSUP, errno.EOPNOTSUPP, errno.EMLINK)
 
 # Console for Rich formatting - shared across the application
 console = Console()
@@ -25,6 +38,18 @@ console = Console()
 logger = logging.getLogger("gpt_translate")
 
 
+def make_progress() -> Progress:
+    "Default Rich progress bar, can be shared between several `run_workers` calls"
+    return Progress(
+        TextColumn("[bold blue]{task.description}"),
+        BarColumn(bar_width=None),
+        MofNCompleteColumn(),
+        TimeElapsedColumn(),
+        console=console,
+        transient=False
+    )
+
+
 @weave.op
 async def gather_with_progress(
     tasks: list,
@@ -32,94 +57,134 @@ async def gather_with_progress(
     progress: Optional[Progress] = None
 ) -> list:
     """
-    Execute multiple async tasks with a Rich progress bar.
-    
-    Args:
-        tasks: List of async tasks to execute
-        description: Description to show in the progress bar
-        progress: Rich Progress object. If None, creates a default one.
-        
-    Returns:
-        List of results from completed tasks. Failed tasks return {"error": "error_message"}
+    Run async tasks concurrently with `run_workers` and return their results in order.
+
+    Failed tasks return {"error": "error_message"}.
     """
     if not tasks:
         return []
-    
-    # Create default progress if none provided
-    if progress is None:
-        with Progress(
-            TextColumn("[bold blue]{task.description}"),
-            BarColumn(bar_width=None),
-            MofNCompleteColumn(),
-            TimeElapsedColumn(),
-            console=console,
-            transient=False
-        ) as default_progress:
-            return await _execute_tasks_with_progress(tasks, description, default_progress)
-    else:
-        # Use provided progress object (don't manage its lifecycle)
-        return await _execute_tasks_with_progress(tasks, description, progress)
+    results = [None] * len(tasks)
+
+    async def _await(item):
+        index, task = item
+        try:
+            return index, await task
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.exception(f"Task {index} failed: {e}")
+            return index, {"error": str(e)}
+
+    await run_workers(
+        list(enumerate(tasks)),
+        _await,
+        sink=lambda result: results.__setitem__(*result),
+        num_workers=len(tasks),
+        description=description,
+        progress=progress,
+    )
+    return results
 
 
-async def _execute_tasks_with_progress(tasks: list, description: str, progress: Progress) -> list:
+async def run_workers(
+    items: Iterable | AsyncIterable,
+    worker: Callable[[Any], Awaitable[Any]],
+    sink: Optional[Callable[[Any], None]] = None,
+    num_workers: int = 7,
+    queue_size: Optional[int] = None,
+    description: str = "Processing",
+    progress: Optional[Progress] = None,
+) -> dict:
     """
-    Internal function to execute tasks with a given progress object.
-    
+    Stream items through a fixed pool of async workers.
+
+    A producer pulls from `items` lazily and feeds a bounded queue, `num_workers` workers
+    consume it and each result is handed to `sink` as soon as it is ready. Neither the
+    pending work nor the results are held in memory all at once.
+
     Args:
-        tasks: List of async tasks to execute
-        description: Description for the progress task
-        progress: Active Progress object
-        
+        items: Iterable or async iterable of work items, consumed lazily (can be a generator)
+        worker: Async callable processing one item
+        sink: Callable receiving every result. Failed items are passed as {"error": "error_message"}
+        num_workers: Number of concurrent workers
+        queue_size: Maximum number of items waiting in the queue. Defaults to `num_workers`.
+        description: Description to show in the progress bar
+        progress: Rich Progress object. If None, creates a default one.
+
     Returns:
-        List of results from completed tasks
+        Dict with the number of processed items, the `duration` of the run and its `tail`:
+        the seconds between the first worker running out of items and the last one
+        finishing. `started`, `first_idle` and `finished` are the raw `perf_counter` stamps.
     """
-    task_id = progress.add_task(description, total=len(tasks))
-    
-    # Use a proper mapping instead of mutating task objects
-    task_to_index = {}
-    results = [None] * len(tasks)
-    asyncio_tasks = []
-    
-    try:
-        # Create all tasks
-        for i, task in enumerate(tasks):
-            asyncio_task = asyncio.create_task(task)
-            task_to_index[asyncio_task] = i
-            asyncio_tasks.append(asyncio_task)
-        
-        pending_tasks = set(asyncio_tasks)
-        
-        while pending_tasks:
-            # Use wait to get completed tasks
-            done, pending_tasks = await asyncio.wait(
-                pending_tasks, 
-                return_when=asyncio.FIRST_COMPLETED
+    if progress is None:
+        with make_progress() as default_progress:
+            return await _run_workers(
+                items, worker, sink, num_workers, queue_size, description, default_progress
             )
-            
-            for completed_task in done:
-                task_index = task_to_index[completed_task]
-                
-                try:
-                    result = await completed_task
-                    results[task_index] = result
-                except asyncio.CancelledError:
-                    results[task_index] = {"error": "Task was cancelled"}
-                    raise  # Re-raise cancellation
-                except Exception as e:
-                    # Handle errors by storing them in the result
-                    logger.exception(f"Task {task_index} failed: {e}")
-                    results[task_index] = {"error": str(e)}
-                
-                progress.update(task_id, advance=1)
-        
-        return results
-        
-    except Exception:
-        # Cancel any remaining tasks on error
-        for task in asyncio_tasks:
-            if not task.done():
-                task.cancel()
+    return await _run_workers(items, worker, sink, num_workers, queue_size, description, progress)
+
+
+async def _run_workers(
+    items: Iterable | AsyncIterable,
+    worker: Callable[[Any], Awaitable[Any]],
+    sink: Optional[Callable[[Any], None]],
+    num_workers: int,
+    queue_size: Optional[int],
+    description: str,
+    progress: Progress,
+) -> dict:
+    total = len(items) if isinstance(items, Sized) else None
+    task_id = progress.add_task(description, total=total)
+    queue = asyncio.Queue(maxsize=queue_size or num_workers)
+    done = object()  # sentinel telling a worker to stop
+    processed = 0
+    idle_times = []
+
+    async def _produce():
+        if isinstance(items, AsyncIterable):
+            async for item in items:
+                await queue.put(item)
+        else:
+            for item in items:
+                await queue.put(item)
+        for _ in range(num_workers):
+            await queue.put(done)
+
+    async def _consume():
+        nonlocal processed
+        while (item := await queue.get()) is not done:
+            try:
+                result = await worker(item)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception(f"Worker failed on {item}: {e}")
+                result = {"error": str(e)}
+            if sink is not None:
+                sink(result)
+            processed += 1
+            progress.update(task_id, advance=1)
+        idle_times.append(time.perf_counter())
+
+    start_time = time.perf_counter()
+    tasks = [asyncio.create_task(_produce())]
+    tasks += [asyncio.create_task(_consume()) for _ in range(num_workers)]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        # Stop the whole pipeline if the producer, a sink or the caller fails
+        for task in tasks:
+            task.cancel()
         raise
+    end_time = time.perf_counter()
+    return {
+        "processed": processed,
+        "duration": end_time - start_time,
+        "tail": end_time - min(idle_times),
+        "started": start_time,
+        "first_idle": min(idle_times),
+        "finished": end_time,
+    }
 
 
 @weave.op
@@ -186,42 +251,480 @@ def measure_execution_time(func):
     return wrapper
 
 
-def file_is_empty(file: str | Path):
+def file_is_empty(file: str | Path, stat: Optional[os.stat_result] = None):
+    "Check if a file is empty or whitespace only, `stat` avoids reading files of size 0"
+    if stat is not None and stat.st_size == 0:
+        return True
     return not Path(file).read_text().strip()
 
 
+class DiscoveredFile(NamedTuple):
+    "A file found during discovery, with the `stat` collected while walking the tree"
+    path: Path
+    stat: os.stat_result
+
+
+def _glob_to_regex(pattern: str) -> str:
+    "Translate a gitignore glob to a regex, `*` and `?` never cross a `/`"
+    i, out = 0, []
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+        elif pattern[i] == "*":
+            out.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            out.append("[^/]")
+            i += 1
+        elif pattern[i] == "[" and "]" in pattern[i + 1 :]:
+            end = pattern.index("]", i + 1)
+            out.append("[" + pattern[i + 1 : end].replace("!", "^", 1) + "]")
+            i = end + 1
+        else:
+            out.append(re.escape(pattern[i]))
+            i += 1
+    return "".join(out)
+
+
+class IgnoreRules:
+    """
+    Gitignore-style exclude patterns, matched against paths relative to the walked root.
+
+    Supports `*`, `?`, `**`, `[...]`, trailing `/` for directories only, a leading or
+    inner `/` to anchor the pattern to the root and `!` to re-include. The last matching
+    pattern wins.
+    """
+
+    def __init__(self, patterns: Iterable[str] = ()):
+        self.rules = []
+        for pattern in patterns:
+            pattern = pattern.strip()
+            if not pattern or pattern.startswith("#"):
+                continue
+            negate = pattern.startswith("!")
+            pattern = pattern.lstrip("!")
+            dir_only = pattern.endswith("/")
+            pattern = pattern.rstrip("/")
+            anchored = "/" in pattern
+            regex = _glob_to_regex(pattern.lstrip("/"))
+            if not anchored:
+                regex = "(?:.*/)?" + regex
+            self.rules.append((re.compile(regex + r"\Z"), negate, dir_only))
+
+    @classmethod
+    def from_file(cls, path: str | Path) -> "IgnoreRules":
+        return cls(Path(path).read_text().splitlines())
+
+    def ignored(self, rel_path: str, is_dir: bool = False) -> bool:
+        result = False
+        for regex, negate, dir_only in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if regex.match(rel_path):
+                result = not negate
+        return result
+
+    def excluded(self, rel_path: str) -> bool:
+        "Whether `iter_files` would skip the file `rel_path`, because of its name or one of its folders"
+        parts = rel_path.split("/")
+        return self.ignored(rel_path) or any(
+            self.ignored("/".join(parts[:i]), is_dir=True) for i in range(1, len(parts))
+        )
+
+
+def iter_files(
+    path: Path | str,
+    extensions: Optional[Iterable[str]] = MD_EXTENSIONS,
+    exclude: Iterable[str] | IgnoreRules = DEFAULT_EXCLUDE,
+) -> Iterator[DiscoveredFile]:
+    """
+    Walk `path` with `os.scandir` and yield files as they are found.
+
+    Entries are visited in name order so runs are reproducible, excluded folders are
+    never entered and every file comes with the `stat` result gathered during the walk.
+    `extensions=None` yields every file.
+    """
+    path = Path(path)
+    if path.is_file():
+        yield DiscoveredFile(path, path.stat())
+        return
+    rules = exclude if isinstance(exclude, IgnoreRules) else IgnoreRules(exclude)
+    extensions = tuple(e.lower() for e in extensions) if extensions is not None else None
+
+    def _walk(folder: str, rel_folder: str):
+        with os.scandir(folder) as it:
+            entries = sorted(it, key=lambda e: e.name)
+        for entry in entries:
+            rel_path = rel_folder + entry.name
+            if entry.is_dir(follow_symlinks=False):
+                if not rules.ignored(rel_path, is_dir=True):
+                    yield from _walk(entry.path, rel_path + "/")
+            elif extensions is None or entry.name.lower().endswith(extensions):
+                if not rules.ignored(rel_path):
+                    try:
+                        yield DiscoveredFile(Path(entry.path), entry.stat())
+                    except FileNotFoundError:  # removed while walking
+                        continue
+
+    yield from _walk(str(path), "")
+
+
+def stat_files(
+    files: Iterable[str | Path | DiscoveredFile], extensions: Iterable[str] = MD_EXTENSIONS
+) -> Iterator[DiscoveredFile]:
+    "Lazily turn paths into `DiscoveredFile`s, dropping missing files and other extensions"
+    extensions = tuple(extensions)
+    for file in files:
+        if isinstance(file, DiscoveredFile):
+            yield file
+            continue
+        file = Path(file)
+        if file.suffix not in extensions:
+            continue
+        try:
+            yield DiscoveredFile(file, file.stat())
+        except FileNotFoundError:
+            continue
+
+
+def estimate_tokens(file: str | Path | DiscoveredFile, model: str = MODEL) -> int:
+    "Token count of a file, used to estimate the cost of translating it"
+    path = file.path if isinstance(file, DiscoveredFile) else Path(file)
+    return count_tokens(path.read_text(), model=model)
+
+
+def read_file_list(list_file: Path | str) -> Iterator[str]:
+    "Lazily read a .txt file listing one path per line"
+    with open(list_file, "r") as f:
+        for line in f:
+            if line.strip():
+                yield line.strip()
+
+
 def get_md_files(path: Path | str, files_glob: str = "*.md", file_re: str = None):
     """
-    Get a list of markdown files in the given path.
+    Get a sorted list of markdown files in the given path.
     """
     path = Path(path)
     if path.is_file():
         return [path]
-    files = globtastic(path, file_glob=files_glob, file_re=file_re)
-    return [Path(f) for f in files.sorted() if Path(f).exists()]
+    files = [
+        f.path
+        for f in iter_files(path, extensions=None)
+        if fnmatch(f.path.name, files_glob) and (file_re is None or re.search(file_re, f.path.name))
+    ]
+    return sorted(files)
 
 
-def _copy_images(src_path: Path | str, dst_path: Path | str):
-    "recursively copy images from src_path to dst_path"
+def file_hash(path: Path | str, chunk_size: int = 1 << 20) -> str:
+    "SHA-256 of a file, read in chunks"
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _is_synced(src: DiscoveredFile, dst: Path, compare: str) -> bool:
+    "Check if `dst` already holds the content of `src`, by size and mtime or by content hash"
+    try:
+        dst_stat = dst.stat()
+    except FileNotFoundError:
+        return False
+    if dst_stat.st_size != src.stat.st_size:
+        return False
+    if compare == "hash":
+        return file_hash(src.path) == file_hash(dst)
+    return dst_stat.st_mtime_ns == src.stat.st_mtime_ns
+
+
+def _sync_file(src: DiscoveredFile, dst: Path, compare: str, link: bool) -> str:
+    "Bring `dst` up to date with `src`, returns what was done"
+    if _is_synced(src, dst, compare):
+        return "skipped"
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    # never write through a link left by a previous run
+    dst.unlink(missing_ok=True)
+    if link:
+        try:
+            os.link(src.path, dst)
+            return "linked"
+        except OSError as e:  # e.g. src and dst on different devices
+            logger.debug(f"Could not link {src.path} to {dst} ({e}), copying instead")
+    # copy2 goes through the kernel (sendfile) and keeps the mtime for the next run
+    shutil.copy2(src.path, dst)
+    return "copied"
+
+
+def _dedup_file(src: DiscoveredFile, dst: Path, compare: str, store: Path, link_mode: str) -> tuple[str, int]:
+    """
+    Point `dst` to the content-addressed copy of `src` in `store`, adding it if needed.
+
+    Returns what was done and the number of bytes saved, the size of the file when its
+    content was already in the store. When `dst` can not be hard-linked to the store (other
+    filesystem, no hard link support) the file is copied instead.
+    """
+    if _is_synced(src, dst, compare):
+        return "skipped", 0
+    digest = file_hash(src.path)
+    stored = store / digest[:2] / (digest + src.path.suffix.lower())
+    # identical content with another mtime already points to the store
+    if stored.exists() and dst.exists() and os.path.samefile(dst, stored):
+        return "skipped", 0
+    saved = src.stat.st_size
+    if not stored.exists():
+        stored.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = stored.with_name(f"{stored.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        shutil.copy2(src.path, tmp_file)
+        os.replace(tmp_file, stored)
+        saved = 0
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    dst.unlink(missing_ok=True)
+    if link_mode == "symlink":
+        # relative, so the store and the locale trees can be moved together
+        dst.symlink_to(os.path.relpath(stored, dst.parent))
+    else:
+        try:
+            os.link(stored, dst)
+        except OSError as e:
+            if e.errno not in NO_LINK_ERRORS:
+                raise
+            logger.debug(f"Could not link {stored} to {dst} ({e}), copying instead")
+            shutil.copy2(src.path, dst)
+            return "copied", 0
+    return "deduplicated", saved
+
+
+def sync_files(
+    src_path: Path | str,
+    dst_path: Path | str,
+    extensions: Iterable[str] = IMAGE_EXTENSIONS,
+    compare: str = "mtime",
+    link: bool = False,
+    max_workers: int = 8,
+    exclude: Iterable[str] = DEFAULT_EXCLUDE,
+    store: Optional[Path | str] = None,
+    link_mode: str = "hardlink",
+) -> dict:
+    """
+    Incrementally mirror the files of `src_path` with the given extensions into `dst_path`.
+
+    Files already up to date are skipped (`compare="mtime"` checks size and mtime,
+    `compare="hash"` checks size and content), the others are copied, or hard-linked
+    with `link=True`, in a thread pool.
+
+    With a `store`, every distinct content is kept once in that folder, named after its
+    hash, and `dst_path` only holds hard links (`link_mode="hardlink"`) or symlinks
+    (`link_mode="symlink"`) to it. Syncing several locales against the same store keeps
+    a single copy of each image.
+
+    Returns:
+        Dict with the number of files "copied", "linked", "deduplicated" and "skipped",
+        the "bytes" written and the "saved" bytes, hard-linked or already in the store
+    """
     src_path = Path(src_path)
     dst_path = Path(dst_path)
+    if compare not in ("mtime", "hash"):
+        raise ValueError(f"Unknown compare mode {compare}, expected 'mtime' or 'hash'")
+    if link_mode not in ("hardlink", "symlink"):
+        raise ValueError(f"Unknown link mode {link_mode}, expected 'hardlink' or 'symlink'")
+    store = Path(store) if store is not None else None
+    summary = {"copied": 0, "linked": 0, "deduplicated": 0, "skipped": 0, "bytes": 0, "saved": 0}
+
+    def _collect(done):
+        for future in done:
+            action, size, saved = future.result()
+            summary[action] += 1
+            summary["saved"] += saved
+            if action != "skipped":
+                summary["bytes"] += size - saved
+
+    def _task(src: DiscoveredFile):
+        dst = dst_path / src.path.relative_to(src_path)
+        if store is not None:
+            action, saved = _dedup_file(src, dst, compare, store, link_mode)
+        else:
+            action = _sync_file(src, dst, compare, link)
+            # a hard link writes no data, its size is saved rather than copied
+            saved = src.stat.st_size if action == "linked" else 0
+        logger.debug(f"{action.capitalize()} {src.path} to {dst}")
+        return action, src.stat.st_size, saved
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending = set()
+        for src in iter_files(src_path, extensions=extensions, exclude=exclude):
+            # Keep the number of queued futures bounded on huge trees
+            if len(pending) >= 4 * max_workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                _collect(done)
+            pending.add(pool.submit(_task, src))
+        _collect(wait(pending).done)
+    return summary
+
+
+def _copy_images(
+    src_path: Path | str,
+    dst_path: Path | str,
+    compare: str = "mtime",
+    link: bool = False,
+    max_workers: int = 8,
+    dedup_store: Optional[Path | str] = None,
+    dedup_link: str = "hardlink",
+) -> dict:
+    "recursively sync images from src_path to dst_path, skipping the ones already up to date"
+    summary = sync_files(
+        src_path,
+        dst_path,
+        extensions=IMAGE_EXTENSIONS,
+        compare=compare,
+        link=link,
+        max_workers=max_workers,
+        store=dedup_store,
+        link_mode=dedup_link,
+    )
+    logger.info(
+        f"Images: {summary['copied']} copied, {summary['linked']} linked, "
+        f"{summary['deduplicated']} deduplicated, {summary['skipped']} already up to date "
+        f"({summary['bytes'] / 1e6:.1f} MB written)"
+    )
+    if summary["saved"]:
+        logger.info(f"Links and deduplication saved {summary['saved'] / 1e6:.1f} MB")
+    return summary
+
 
-    # Define image file extensions
-    image_extensions = [".png", ".jpg", ".jpeg", ".gif", ".bmp", ".svg"]
+def read_text(path: Path | str) -> str:
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
 
-    for src_file in src_path.rglob("*"):
-        if src_file.suffix.lower() in image_extensions:
-            # Compute relative path
-            rel_path = src_file.relative_to(src_path)
-            # Construct destination path
-            dst_file = dst_path / rel_path
 
-            # Create parent directories if they don't exist
-            dst_file.parent.mkdir(parents=True, exist_ok=True)
+_umask = None
+_umask_lock = threading.Lock()
 
-            # Copy the file
-            dst_file.write_bytes(src_file.read_bytes())
-            logging.debug(f"Copied {src_file} to {dst_file}")
+
+def _current_umask() -> int:
+    "The umask of the process, read on first use and cached"
+    global _umask
+    with _umask_lock:
+        if _umask is None:
+            try:
+                # Linux exposes the umask without changing it
+                status = Path("/proc/self/status").read_text()
+                _umask = int(re.search(r"^Umask:\s*([0-7]+)", status, re.M).group(1), 8)
+            except (OSError, AttributeError):
+                # os.umask can only be read by setting it, restore it right away
+                _umask = os.umask(0o022)
+                os.umask(_umask)
+        return _umask
+
+
+def write_text_atomic(path: Path | str, text: str, skip_unchanged: bool = False) -> bool:
+    """
+    Write to a temporary file next to `path` and rename it, readers never see a truncated file.
+
+    With `skip_unchanged`, a file that already holds exactly `text` is left untouched, so
+    its mtime does not change. Returns True if the file was written. An existing file keeps
+    its permissions, a new one gets the usual `0o666 & ~umask`.
+    """
+    path = Path(path)
+    data = text.encode("utf-8")
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        stat = None
+    if skip_unchanged and stat is not None and stat.st_size == len(data) and path.read_bytes() == data:
+        return False
+    mode = stat.st_mode & 0o7777 if stat is not None else 0o666 & ~_current_umask()
+    fd, tmp_file = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            os.fchmod(f.fileno(), mode)  # mkstemp creates the file as 0600
+            f.write(data)
+        os.replace(tmp_file, path)
+    except BaseException:
+        os.unlink(tmp_file)
+        raise
+    return True
+
+
+async def read_text_async(path: Path | str) -> str:
+    "Read a file in a worker thread so slow disks do not stall the event loop"
+    return await asyncio.to_thread(read_text, path)
+
+
+async def write_text_async(path: Path | str, text: str, skip_unchanged: bool = False) -> bool:
+    "Atomically write a file in a worker thread so slow disks do not stall the event loop"
+    return await asyncio.to_thread(write_text_atomic, path, text, skip_unchanged)
+
+
+class LoopLagMonitor:
+    """
+    Measure how late the event loop wakes up a task sleeping for `interval` seconds.
+
+    Use as `async with LoopLagMonitor() as lag:`, a high lag means some blocking code
+    is holding the loop and delaying every other coroutine.
+    """
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.max_lag = 0.0
+        self.total_lag = 0.0
+        self.samples = 0
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - start - self.interval)
+            self.max_lag = max(self.max_lag, lag)
+            self.total_lag += lag
+            self.samples += 1
+
+    @property
+    def mean_lag(self) -> float:
+        return self.total_lag / self.samples if self.samples else 0.0
+
+    async def __aenter__(self) -> "LoopLagMonitor":
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+
+class RateLimiter:
+    """
+    Space calls so that at most `rate` of them start every `period` seconds.
+
+    Use as `async with limiter:` around each call, waiting callers are released one
+    `period / rate` interval apart, so bursts never exceed the provider limits.
+    """
+
+    def __init__(self, rate: float, period: float = 60.0):
+        if rate <= 0:
+            raise ValueError(f"rate must be positive, got {rate}")
+        self.interval = period / rate
+        self._next = 0.0
+
+    async def __aenter__(self) -> "RateLimiter":
+        now = time.monotonic()
+        start = max(now, self._next)
+        self._next = start + self.interval  # reserve the slot before sleeping
+        if start > now:
+            await asyncio.sleep(start - now)
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        pass
 
 
 def count_tokens(chunk, model=MODEL):
@@ -234,41 +737,116 @@ def concat_md_chunks(chunks, sep="\n\n"):
     return sep.join(chunks)
 
 
-def get_modified_files(repo_path: Path, since_days: int = 14, extension: str = ".md"):
-    """
-    Get a list of modified files in the last `since_days` days.
-    """
+class FileChange(NamedTuple):
+    "A file changed between two commits, paths are relative to the repository root"
+    status: str  # "A"dded, "M"odified, "D"eleted or "R"enamed
+    path: Path  # current path, or the removed path for deletions
+    old_path: Optional[Path] = None  # previous path of a renamed file
+    similarity: Optional[int] = None  # % of content kept by a renamed file, 100 for a pure move
+
+    def __str__(self):
+        if self.old_path is not None:
+            return f"{self.status}\t{self.old_path}\t{self.path}"
+        return f"{self.status}\t{self.path}"
+
+
+def _open_repo(repo_path: Path | str) -> tuple[git.Repo, Path, Path]:
+    "Open the repository containing `repo_path`, returns the repo, its root and `repo_path` relative to it"
     path = Path(repo_path).resolve().absolute()
     if not path.is_dir():
         path = path.parent
+    repo = git.Repo(path, search_parent_directories=True)
+    root = Path(repo.working_tree_dir).resolve()
+    logging.info(f"Repo: {repo.git_dir}")
+    return repo, root, path.relative_to(root)
+
+
+def git_head(repo_path: Path | str) -> tuple[str, Path]:
+    "SHA of the HEAD commit of the repository containing `repo_path`, and the repository root"
+    repo, root, _ = _open_repo(repo_path)
+    return repo.git.rev_parse("HEAD").strip(), root
+
+
+def commit_before(repo: git.Repo, since_date: datetime) -> Optional[str]:
+    "Last commit of HEAD made before `since_date`, None if the history is younger than that"
+    sha = repo.git.rev_list("-1", f"--until={since_date.isoformat()}", "HEAD")
+    return sha.strip() or None
+
+
+def iter_file_changes(
+    repo_path: Path | str,
+    base: Optional[str],
+    head: str = "HEAD",
+    extension: str | tuple[str, ...] = ".md",
+    detect_renames: bool = True,
+) -> Iterator[FileChange]:
+    """
+    Yield the files that differ between the `base` and `head` commits under `repo_path`.
+
+    This is a single tree-to-tree diff, so the cost does not depend on the number of
+    commits in between and uncommitted changes are ignored. With `detect_renames`
+    moved files are reported once as "R" instead of a deletion plus an addition.
+    `base=None` diffs against the empty tree, every file is then reported as added.
+    """
+    repo, root, rel_path = _open_repo(repo_path)
+    if base is None:
+        base = repo.git.hash_object("-t", "tree", "/dev/null")
+    output = repo.git.diff(
+        "--name-status",
+        "-z",
+        "-M" if detect_renames else "--no-renames",
+        base,
+        head,
+        "--",
+        rel_path.as_posix(),
+    )
+    fields = iter(output.split("\0"))
+    for status in fields:
+        if not status:
+            continue
+        status, score = status[0], status[1:]
+        if status in "RC":
+            old_path, new_path = Path(next(fields)), Path(next(fields))
+            if not new_path.name.endswith(extension) and not old_path.name.endswith(extension):
+                continue
+            if status == "C":
+                yield FileChange("A", new_path)
+            else:
+                yield FileChange("R", new_path, old_path, int(score or 100))
+        else:
+            file_path = Path(next(fields))
+            if file_path.name.endswith(extension):
+                yield FileChange("M" if status == "T" else status, file_path)
+
+
+def iter_modified_files(
+    repo_path: Path, since_days: int = 14, extension: str = ".md", detect_renames: bool = True
+) -> Iterator[FileChange]:
+    """
+    Yield the files changed since the last commit older than `since_days` days.
+    """
+    repo, root, _ = _open_repo(repo_path)
     logging.info(
-        f"Searching for modified files in the last {since_days} days in: {path}"
+        f"Searching for modified files in the last {since_days} days in: {root}"
     )
-    # Open the repository
-    repo = git.Repo(repo_path, search_parent_directories=True)
-    repo_path = Path(repo.git_dir).parent  # this is the .git file
-
-    logging.info(f"Repo: {repo.git_dir}")
-    # Calculate the date since which to look for commits
     since_date = datetime.now() - timedelta(days=since_days)
-
-    # Get commits since the specified date
-    commits = list(repo.iter_commits(since=since_date.isoformat()))
-
-    # Use a set to store unique modified files
-    modified_files = set()
-
-    # Iterate over the commits and collect modified files
-    for commit in commits:
-        for diff in commit.diff(None, create_patch=False):
-            if diff.a_path:
-                modified_files.add(repo_path / Path(diff.a_path))
-            if diff.b_path:
-                modified_files.add(repo_path / Path(diff.b_path))
-    modified_files = list(
-        [m for m in modified_files if m.suffix == extension and m.is_relative_to(path)]
+    yield from iter_file_changes(
+        repo_path,
+        base=commit_before(repo, since_date),
+        extension=extension,
+        detect_renames=detect_renames,
     )
-    modified_files = [f.relative_to(repo_path) for f in modified_files]
+
+
+def get_modified_files(repo_path: Path, since_days: int = 14, extension: str = ".md"):
+    """
+    Get a list of modified files in the last `since_days` days.
+    """
+    modified_files = [
+        change.path
+        for change in iter_modified_files(repo_path, since_days, extension, detect_renames=False)
+        if change.status != "D"
+    ]
     logging.info(
         f"Found {len(modified_files)} modified files in the last {since_days} days in: {repo_path}"
     )
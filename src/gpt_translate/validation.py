@@ -0,0 +1,127 @@
+import re
+from collections import Counter
+from difflib import SequenceMatcher
+from typing import Iterable, NamedTuple, Optional
+
+from gpt_translate.loader import MDDocument, parse_markdown
+
+
+class StructureElement(NamedTuple):
+    event: str  # "<Tabs>", "</TabItem>", "{{< tabpane >}}", "{{% /tab %}}"...
+    name: str
+    opening: bool
+    line: int
+
+
+def structure_elements(
+    content: str,
+    document: Optional[MDDocument] = None,
+    paired: Iterable[str] = (),
+) -> list[StructureElement]:
+    """
+    Tabs/TabItem tags and paired Hugo shortcodes of a page, in document order.
+
+    A shortcode is paired when the page also closes it (`{{< /name >}}`) or its name is in
+    `paired`, e.g. the elements of the original page when checking a translation that may
+    have lost a closing tag. Standalone shortcodes like `{{< img >}}` and self-closing tags
+    are left out. Pass the `document` of `content` if it is already parsed.
+    """
+    document = document or parse_markdown(content, header=False)
+    tokens = document.find("tag", "shortcode")
+    closed = {t.groups[2] for t in tokens if t.kind == "shortcode" and t.groups[1]} | set(paired)
+    elements = []
+    for token in tokens:
+        text = content[token.start : token.end]
+        if token.kind == "tag":
+            closing, name, self_closing = token.groups
+            if self_closing:
+                continue
+            event = f"<{closing}{name}>"
+        else:
+            delimiter, closing, name = token.groups
+            if name not in closed or re.search(r"/\s*[>%]\}\}$", text):
+                continue
+            end = ">" if delimiter == "<" else "%"
+            event = f"{{{{{delimiter} {closing}{name} {end}}}}}"
+        elements.append(StructureElement(event, name, not closing, token.line))
+    return elements
+
+
+def structure_errors(elements: list[StructureElement]) -> list[str]:
+    "Unbalanced open and close elements, found with a stack in one pass"
+    errors, stack = [], []
+    for element in elements:
+        if element.opening:
+            stack.append(element)
+        elif stack and stack[-1].name == element.name:
+            stack.pop()
+        elif any(opened.name == element.name for opened in stack):
+            while stack[-1].name != element.name:
+                opened = stack.pop()
+                errors.append(f"line {opened.line}: {opened.event} is not closed before line {element.line}")
+            stack.pop()
+        else:
+            errors.append(f"line {element.line}: {element.event} closes nothing")
+    errors += [f"line {opened.line}: {opened.event} is never closed" for opened in stack]
+    return errors
+
+
+def structure_differences(original: list[StructureElement], translated: list[StructureElement]) -> list[str]:
+    "Where the sequence of elements of the translation departs from the original"
+    matcher = SequenceMatcher(None, [e.event for e in original], [e.event for e in translated], autojunk=False)
+    differences = []
+    for op, i1, i2, j1, j2 in matcher.get_opcodes():
+        if op == "equal":
+            continue
+        before = ", ".join(f"{e.event} (line {e.line})" for e in original[i1:i2]) or "nothing"
+        after = ", ".join(f"{e.event} (line {e.line})" for e in translated[j1:j2]) or "nothing"
+        differences.append(f"{before} became {after}")
+    return differences
+
+
+def chunk_problems(original: str, translated: str) -> list[str]:
+    """
+    Structural defects of a translated markdown chunk, empty if it looks sound.
+
+    Checks cheap invariants a translation must keep: links and images, code blocks,
+    Tabs and Hugo shortcodes, and that no front matter was made up.
+    """
+    original_doc = parse_markdown(original, header=False)
+    translated_doc = parse_markdown(translated, header=False)
+    problems = []
+
+    original_links = Counter(link.key for link in original_doc.links(""))
+    translated_links = Counter(link.key for link in translated_doc.links(""))
+    if missing := original_links - translated_links:
+        problems.append(f"missing links {sorted(target for _, target in missing.elements())}")
+    if extra := translated_links - original_links:
+        problems.append(f"extra links {sorted(target for _, target in extra.elements())}")
+
+    original_code = [t.groups[1] for t in original_doc.find("code")]
+    translated_code = [t.groups[1] for t in translated_doc.find("code")]
+    if original_code != translated_code:
+        problems.append(f"{len(original_code)} code blocks became {len(translated_code)}")
+
+    original_elements = structure_elements(original, original_doc)
+    translated_elements = structure_elements(
+        translated, translated_doc, paired={e.name for e in original_elements}
+    )
+    if not structure_errors(original_elements):  # a chunk can cut through a tabpane
+        problems += structure_errors(translated_elements)
+    problems += structure_differences(original_elements, translated_elements)
+
+    if translated.lstrip().startswith("---") and not original.lstrip().startswith("---"):
+        problems.append("front matter added")
+    return problems
+
+
+def header_item_problems(original: str, translated: str) -> list[str]:
+    "Defects of a translated front matter value (title, description...)"
+    if not translated.strip():
+        return ["empty translation"]
+    problems = []
+    if "\n" in translated.strip() and "\n" not in original.strip():
+        problems.append("spans several lines")
+    if re.search(r"^\s*---", translated, re.MULTILINE):
+        problems.append("contains a front matter delimiter")
+    return problems
@@ -0,0 +1,154 @@
+import time
+import asyncio
+from pathlib import Path
+from typing import AsyncIterator, Iterable, Optional
+
+from gpt_translate.cache import SqliteLRUCache
+from gpt_translate.translate import Translator, TranslationReport, _translate_file
+from gpt_translate.utils import (
+    DEFAULT_EXCLUDE,
+    MD_EXTENSIONS,
+    IgnoreRules,
+    iter_files,
+    run_workers,
+    console,
+    logger,
+)
+
+
+def snapshot(folder: Path | str, exclude: Iterable[str] | IgnoreRules = DEFAULT_EXCLUDE) -> dict[Path, tuple[int, int]]:
+    "(mtime, size) of every markdown file of `folder`"
+    return {f.path: (f.stat.st_mtime_ns, f.stat.st_size) for f in iter_files(folder, exclude=exclude)}
+
+
+def changed_files(old: dict[Path, tuple[int, int]], new: dict[Path, tuple[int, int]]) -> set[Path]:
+    "Files added or modified between two snapshots"
+    return {path for path, signature in new.items() if old.get(path) != signature}
+
+
+async def poll_changes(
+    folder: Path | str,
+    exclude: Iterable[str] = DEFAULT_EXCLUDE,
+    debounce: float = 1.0,
+    poll_interval: float = 0.5,
+) -> AsyncIterator[set[Path]]:
+    """
+    Yield the markdown files added or modified in `folder`, found by walking it every
+    `poll_interval` seconds. Changes are grouped until the folder is quiet for `debounce`
+    seconds, so a burst of saves is a single batch.
+    """
+    rules = IgnoreRules(exclude)
+    state = await asyncio.to_thread(snapshot, folder, rules)
+    pending, last_change = set(), 0.0
+    while True:
+        await asyncio.sleep(poll_interval)
+        current = await asyncio.to_thread(snapshot, folder, rules)
+        changed = changed_files(state, current)
+        state = current
+        if changed:
+            pending |= changed
+            last_change = time.monotonic()
+        elif pending and time.monotonic() - last_change >= debounce:
+            yield {path for path in pending if path in state}
+            pending = set()
+
+
+async def notify_changes(
+    folder: Path | str,
+    exclude: Iterable[str] = DEFAULT_EXCLUDE,
+    debounce: float = 1.0,
+) -> AsyncIterator[set[Path]]:
+    "Same as `poll_changes` with the file system notifications of the OS (inotify on Linux)"
+    from watchfiles import Change, awatch
+
+    folder = Path(folder)
+    root = folder.resolve()
+    rules = IgnoreRules(exclude)
+    async for changes in awatch(root, debounce=int(debounce * 1000)):
+        changed = set()
+        for change, path in changes:
+            rel_path = Path(path).relative_to(root)
+            if (
+                change != Change.deleted
+                and rel_path.suffix.lower() in MD_EXTENSIONS
+                and not rules.excluded(rel_path.as_posix())
+                and (folder / rel_path).is_file()
+            ):
+                changed.add(folder / rel_path)
+        if changed:
+            yield changed
+
+
+def watch_changes(
+    folder: Path | str,
+    exclude: Iterable[str] = DEFAULT_EXCLUDE,
+    debounce: float = 1.0,
+    poll: bool = False,
+) -> AsyncIterator[set[Path]]:
+    "Batches of changed markdown files, notified by the OS if watchfiles is installed, polled otherwise"
+    if not poll:
+        try:
+            import watchfiles  # noqa: F401
+
+            return notify_changes(folder, exclude, debounce)
+        except ImportError:
+            logger.info("watchfiles is not installed, polling for changes (`pip install watchfiles`)")
+    return poll_changes(folder, exclude, debounce)
+
+
+async def watch_folder(
+    input_folder: Path | str,
+    out_folder: Path | str,
+    translator: Translator,
+    cache: Optional[SqliteLRUCache] = None,  # translated sections, only the edited ones are translated again
+    exclude: Iterable[str] = DEFAULT_EXCLUDE,
+    debounce: float = 1.0,  # seconds without changes before a batch is translated
+    poll: bool = False,  # poll the folder even if watchfiles is installed
+    remove_comments: bool = True,
+    max_concurrent_calls: int = 7,
+    max_batches: Optional[int] = None,  # stop after this many batches, runs forever by default
+) -> None:
+    """
+    Translate the files of `input_folder` again every time they are saved.
+
+    The same warm `translator` serves every batch, and with a `cache` the sections that
+    did not change reuse their previous translation. Outputs identical to the file on
+    disk are not written.
+    """
+    input_folder, out_folder = Path(input_folder), Path(out_folder)
+
+    async def _translate_one(path: Path):
+        return await _translate_file(
+            input_file=str(path),
+            out_file=str(out_folder / path.relative_to(input_folder)),
+            replace=True,
+            language=translator.language,
+            remove_comments=remove_comments,
+            skip_unchanged=True,
+            translator=translator,
+            cache=cache,
+        )
+
+    logger.info(f"Watching {input_folder} for changes, translating them to {out_folder}")
+    batches = 0
+    async for changed in watch_changes(input_folder, exclude, debounce, poll):
+        if not changed:
+            continue
+        start = time.perf_counter()
+        report = TranslationReport()
+        await run_workers(
+            sorted(changed),
+            _translate_one,
+            sink=report.add,
+            num_workers=max_concurrent_calls,
+            description=f"Translating {len(changed)} changed files",
+        )
+        console.print(
+            f"Translated {report.translated} changed files ({report.changed} updated) "
+            f"in {time.perf_counter() - start:.2f} s"
+        )
+        for result in report.failed:
+            console.print(f"Error translating {result['input_file']}: {result['error']}", markup=False)
+        batches += 1
+        if max_batches is not None and batches >= max_batches:
+            return
@@ -0,0 +1,30 @@
+import time
+
+from gpt_translate.cache import VerdictCache, cache_key
+
+
+def test_cache_key():
+    assert cache_key("a", {"model": "gpt-4o", "temperature": 1.0}) == cache_key(
+        "a", {"temperature": 1.0, "model": "gpt-4o"}
+    )
+    assert cache_key("a", "b") != cache_key("ab", "")
+
+
+def test_verdict_cache(tmp_path):
+    "Entries survive a reopen and the least recently used ones are evicted first"
+    path = tmp_path / "cache" / "verdicts.sqlite"
+    cache = VerdictCache(path, max_size=3 * (1 + 100))
+    for key in "abc":
+        cache.put(key, key * 100)
+        time.sleep(0.01)
+    assert cache.get("a") == "a" * 100  # a is now more recent than b
+    cache.put("d", "d" * 100)
+    assert cache.get("b") is None
+    assert [cache.get(key) for key in "acd"] == ["a" * 100, "c" * 100, "d" * 100]
+    cache.close()
+
+    cache = VerdictCache(path, max_size=3 * (1 + 100))
+    assert len(cache) == 3 and cache.size == 3 * (1 + 100)
+    cache.put("a", "new")
+    assert cache.get("a") == "new" and cache.size == 2 * (1 + 100) + 4
+    cache.close()
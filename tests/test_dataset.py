@@ -0,0 +1,77 @@
+import json
+import asyncio
+
+import pytest
+
+from gpt_translate.dataset import load_dataset, load_folder_dataset, sample_rows, row_to_pages
+
+
+def test_row_to_pages():
+    "Rows with serialized pages and rows with raw documents are both accepted"
+    serialized = {
+        "original_page": json.dumps(
+            {"filename": "a.md", "content": "[b](b.md)", "header": {"title": "A"}, "links": None}
+        ),
+        "translated_page": {"filename": "a.md", "content": "[ビー](b.md)", "header": {"title": "エー"}},
+    }
+    pages = row_to_pages(serialized)
+    assert pages["original_page"].header.title == "A"
+    assert pages["translated_page"].links[0].target == "b.md"
+
+    raw = {"input_file": "docs/a.md", "original_doc": "---\ntitle: A\n---\nHello", "translated_doc": "こんにちは"}
+    pages = row_to_pages(raw)
+    assert pages["original_page"].filename == "docs/a.md"
+    assert pages["original_page"].header.title == "A"
+    assert pages["translated_page"].content == "こんにちは"
+
+    with pytest.raises(ValueError):
+        row_to_pages({"original_doc": "Hello"})
+
+
+def test_sample_rows():
+    rows = [{"i": i} for i in range(1000)]
+    assert list(sample_rows(rows, limit=3)) == rows[:3]
+    sampled = list(sample_rows(rows, sample=0.1, seed=1))
+    assert 50 < len(sampled) < 150
+    assert sampled == list(sample_rows(rows, sample=0.1, seed=1))
+    assert len(list(sample_rows(rows, sample=0.1, seed=1, limit=5))) == 5
+
+
+def test_load_dataset_jsonl(tmp_path):
+    "Rows are parsed lazily, one at a time"
+    path = tmp_path / "eval.jsonl"
+    rows = [{"original_doc": f"page {i}", "translated_doc": f"ページ {i}"} for i in range(5)]
+    path.write_text("".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows) + "not json\n")
+    dataset = load_dataset(str(path), limit=3)
+    assert next(dataset)["translated_page"].content == "ページ 0"
+    assert [row["original_page"].content for row in dataset] == ["page 1", "page 2"]
+    with pytest.raises(FileNotFoundError):
+        next(load_dataset(str(tmp_path / "missing.jsonl")))
+
+
+def collect(rows) -> list:
+    async def _collect():
+        return [row async for row in rows]
+
+    return asyncio.run(_collect())
+
+
+def test_load_folder_dataset(tmp_path):
+    "Files are paired by relative path and parsed in worker processes"
+    for folder, title in [("docs", "Guide"), ("docs_ja", "ガイド")]:
+        (tmp_path / folder / "guides").mkdir(parents=True)
+        (tmp_path / folder / "guides" / "a.md").write_text(f"---\ntitle: {title}\n---\n[b](b.md)")
+        (tmp_path / folder / "index.md").write_text("# Home")
+    (tmp_path / "docs" / "new.md").write_text("# Not translated yet")
+
+    missing = []
+    rows = collect(
+        load_folder_dataset(tmp_path / "docs", tmp_path / "docs_ja", max_workers=2, missing=missing)
+    )
+    assert [row["original_page"].filename for row in rows] == ["guides/a.md", "index.md"]
+    assert rows[0]["translated_page"].header.title == "ガイド"
+    assert rows[0]["translated_page"].links[0].target == "b.md"
+    assert missing == ["new.md"]
+
+    rows = collect(load_folder_dataset(tmp_path / "docs", tmp_path / "docs_ja", max_workers=0, limit=1))
+    assert [row["original_page"].filename for row in rows] == ["guides/a.md"]
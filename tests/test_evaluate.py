@@ -1,5 +1,21 @@
+import os
+import asyncio
+import pytest
 from dataclasses import dataclass
-from gpt_translate.evaluate import validate_tabs
+from types import SimpleNamespace
+from unittest.mock import patch, AsyncMock, MagicMock
+from gpt_translate.evaluate import (
+    validate_tabs,
+    validate_links,
+    validate_headers,
+    validate_technical_words,
+    run_evaluation,
+    judge_verdict,
+    Evaluator,
+    TermCounter,
+)
+from gpt_translate.loader import find_links, Page, MDPage as LoaderMDPage
+from gpt_translate.cache import VerdictCache, cache_key
 
 @dataclass
 class MDPage:
@@ -50,3 +66,190 @@ def test_validate_tabs_format_with_random_text():
     """
     page = MDPage(content)
     assert validate_tabs(page, model_output=None)["tabs_format_valid"] is True
+
+
+def test_validate_links():
+    original = MDPage("[a](a.md) [b](b.md) [a](a.md) ![c](c.png)")
+    original.links = find_links(original.content, "page.md")
+    translated = MDPage("[エー](a.md) [ビー](b.md) [ビー](b.md) [c](c.png)")
+    translated.links = find_links(translated.content, "page.md")
+    result = validate_links(original, translated, model_output=None)
+    assert result["links_match"] is False
+    assert result["missing_links"] == ["a.md", "c.png"]
+    assert result["extra_links"] == ["b.md", "c.png"]
+    assert result["total_links"] == 4
+
+
+class FakeJudge:
+    "Judge recording how many calls are in flight"
+
+    def __init__(self):
+        self.running = 0
+        self.max_running = 0
+        self.calls = 0
+
+    def cache_key(self, original_page, translated_page):
+        return cache_key(original_page.content, translated_page.content)
+
+    async def predict(self, original_page, translated_page):
+        self.calls += 1
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(0.01)
+        self.running -= 1
+        if "fail" in original_page.filename:
+            raise RuntimeError("judge is down")
+        return {"analysis": {"translation_rating": 8, "completeness": True, "analysis": "ok"}}
+
+
+@pytest.mark.asyncio
+async def test_run_evaluation():
+    def failing_scorer(translated_page):
+        raise KeyError("title")
+
+    rows = (
+        {
+            "original_page": Page(f"{name}.md", "[a](a.md)"),
+            "translated_page": Page(f"{name}.md", "[エー](a.md)"),
+        }
+        for name in ["one", "two", "three", "four", "fail"]
+    )
+    judge = FakeJudge()
+    report = await run_evaluation(
+        rows, judge, [validate_links, failing_scorer], max_concurrent_calls=2
+    )
+    assert judge.max_running == 2
+    assert report.evaluated == 4 and report.total == 5
+    assert report.failed == [{"filename": "fail.md", "error": "judge is down"}]
+    assert report.means == {
+        "judge.completeness": 1.0,
+        "judge.translation_rating": 8.0,
+        "validate_links.links_match": 1.0,
+        "validate_links.total_links": 1.0,
+    }
+    assert report.throughput > 0
+
+
+@pytest.mark.asyncio
+async def test_run_evaluation_with_cache(tmp_path):
+    "Cached verdicts are reused unless refreshed"
+    rows = [
+        {"original_page": Page(f"{i}.md", f"page {i}"), "translated_page": Page(f"{i}.md", f"ページ {i}")}
+        for i in range(3)
+    ]
+    cache = VerdictCache(tmp_path / "verdicts.sqlite")
+    judge = FakeJudge()
+    first = await run_evaluation(rows, judge, [], cache=cache)
+    second = await run_evaluation(rows, judge, [], cache=cache)
+    assert judge.calls == 3
+    assert (first.cached, second.cached) == (0, 3)
+    assert second.means == first.means == {"judge.completeness": 1.0, "judge.translation_rating": 8.0}
+
+    refreshed = await run_evaluation(rows, judge, [], cache=cache, refresh=True)
+    assert judge.calls == 6 and refreshed.cached == 0
+    cache.close()
+
+
+@pytest.mark.asyncio
+async def test_judge_verdict(tmp_path):
+    "The verdict used by `LLMJudge.predict` inside weave.Evaluation is cached the same way"
+    calls = []
+
+    async def call():
+        calls.append(1)
+        return {"translation_rating": 8}
+
+    cache = VerdictCache(tmp_path / "verdicts.sqlite")
+    assert await judge_verdict(call, "key", cache=cache) == ({"translation_rating": 8}, False)
+    assert await judge_verdict(call, "key", cache=cache) == ({"translation_rating": 8}, True)
+    assert await judge_verdict(call, "key", cache=cache, refresh=True) == ({"translation_rating": 8}, False)
+    assert await judge_verdict(call) == ({"translation_rating": 8}, False)
+    assert len(calls) == 3
+    cache.close()
+
+
+def test_weave_evaluate_converts_pages():
+    "weave.Evaluation gets the lazy `Page` rows as the `MDPage`s the judge and the scorers expect"
+    evaluator = Evaluator.__new__(Evaluator)
+    evaluator.config = SimpleNamespace(max_concurrent_calls=2, requests_per_minute=10, refresh=False)
+    evaluator.dataset = (
+        {"original_page": Page(f"{i}.md", f"page {i}"), "translated_page": Page(f"{i}.md", f"ページ {i}")}
+        for i in range(3)
+    )
+    evaluator.scorers, evaluator.missing = [], []
+    evaluator.judge = MagicMock()
+    with patch("gpt_translate.evaluate.weave.Evaluation", create=True) as mock_evaluation, patch.dict(os.environ):
+        mock_evaluation.return_value.evaluate = AsyncMock(return_value={"judge": {}})
+        assert evaluator.weave_evaluate() == {"judge": {}}
+        assert os.environ["WEAVE_PARALLELISM"] == "2"
+
+    rows = mock_evaluation.call_args.kwargs["dataset"]
+    assert [row["original_page"].filename for row in rows] == ["0.md", "1.md", "2.md"]
+    assert all(isinstance(row[key], LoaderMDPage) for row in rows for key in ("original_page", "translated_page"))
+    assert rows[1]["translated_page"].content == "ページ 1"
+    evaluator.judge.throttle.assert_called_once_with(10, None, False)
+    mock_evaluation.return_value.evaluate.assert_awaited_once_with(evaluator.judge)
+
+
+def test_term_counter():
+    counter = TermCounter(["W&B", "W&B Weave", "API key", "run", "APIキー"])
+    text = "Use W&B Weave and W&B. Set your API key (API keys too), run runs, APIキーを設定"
+    assert counter.count(text) == {"W&B Weave": 1, "W&B": 1, "API key": 1, "run": 1, "APIキー": 1}
+    assert TermCounter([]).count(text) == {}
+
+
+def test_validate_technical_words():
+    dictionary = {"API key": "APIキー", "Sweeps": "スイープ", "run": "run", "artifact": "アーティファクト"}
+    original = MDPage("Create an API key, then launch Sweeps. Each run logs a run. Artifacts are versioned.")
+    translated = MDPage("APIキーを作成し、スイープを起動します。各runはログを記録します。")
+    result = validate_technical_words(dictionary)(original, translated, model_output=None)
+    assert result["mismatched"] == [("run", "run")]
+    assert result["term_counts"] == {
+        "API key": {"translation": "APIキー", "original": 1, "translated": 1},
+        "Sweeps": {"translation": "スイープ", "original": 1, "translated": 1},
+        "run": {"translation": "run", "original": 2, "translated": 1},
+    }
+    assert result["tech_words_percentage"] == 3 / 4
+
+
+def test_validate_tabs_hugo_shortcodes():
+    original = MDPage("""{{< tabpane text=true >}}
+{{% tab header="Python" %}}
+{{< img src="/images/a.png" >}}
+```python
+{{< /tabpane >}}
+```
+{{% /tab %}}
+{{% tab header="CLI" %}}
+{{% /tab %}}
+{{< /tabpane >}}""")
+    translated = MDPage("""{{< tabpane text=true >}}
+{{% tab header="Python" %}}
+{{< img src="/images/a.png" >}}
+{{% tab header="CLI" %}}
+{{% /tab %}}
+{{< /tabpane >}}""")
+    assert validate_tabs(original, model_output=None)["errors"] == []
+    result = validate_tabs(translated, model_output=None, original_page=original)
+    assert result["tabs_format_valid"] is False
+    assert result["errors"] == ["line 2: {{% tab %}} is not closed before line 6"]
+    assert result["structure_match"] is False
+    assert result["differences"] == ["{{% /tab %}} (line 7) became nothing"]
+
+
+def test_validate_tabs_stray_close():
+    page = MDPage("<Tabs>\n<TabItem value='a'>\n</TabItem>\n</TabItem>\n</Tabs>\n<TabItem value='b' />")
+    assert validate_tabs(page, model_output=None)["errors"] == ["line 4: </TabItem> closes nothing"]
+
+
+def test_validate_headers():
+    original = Page.from_raw_content("a.md", "---\ntitle: Guide\nslug: /guide\n---\nimport Tabs from '@theme/Tabs';\n\n# Guide")
+    translated = Page.from_raw_content("a.md", "---\ntitle: ガイド\nslug: /guide-ja\n---\nimport Tabs from '@theme/Tabs';\n\n# ガイド")
+    result = validate_headers(original, translated, model_output=None)
+    assert result == {
+        "title_match": True,
+        "description_match": True,
+        "slug_match": False,
+        "displayed_sidebar_match": True,
+        "imports_match": True,
+    }
@@ -0,0 +1,53 @@
+from gpt_translate.links import heading_anchor, build_link_graph, changed_links
+
+
+def _write(root, files):
+    for name, content in files.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+
+
+def test_heading_anchor():
+    assert heading_anchor("Install the `wandb` SDK") == "install-the-wandb-sdk"
+    assert heading_anchor("What's new?") == "whats-new"
+    assert heading_anchor("Log a [table](./tables.md)") == "log-a-table"
+    assert heading_anchor("実験を記録する") == "実験を記録する"
+    assert heading_anchor("Quickstart {#quick}") == "quick"
+
+
+def test_link_graph(tmp_path):
+    "Relative links resolve to pages, anchors and assets of the folder"
+    _write(
+        tmp_path,
+        {
+            "index.md": "# Home\n[Guide](./guides/track.md) and [API](/ref/api/)\n",
+            "guides/track.md": (
+                "# Track\n## Log metrics\n## Log metrics\n"
+                "[metrics](#log-metrics-1) [home](../index.md) [img](./img.png)\n"
+                "[bad anchor](../ref/api/index.md#nope) [gone](./gone.md)\n"
+                "[web](https://wandb.ai) ![missing](./missing.png)\n"
+            ),
+            "guides/img.png": "png",
+            "ref/api/index.md": "# API\n[Track](../../guides/track#log-metrics)\n",
+            "ref/orphan.md": "# Nobody links here\n",
+        },
+    )
+    graph = build_link_graph(tmp_path, max_workers=2)
+    assert sorted(graph.pages) == ["guides/track.md", "index.md", "ref/api/index.md", "ref/orphan.md"]
+    assert graph.pages["guides/track.md"].anchors == {"track", "log-metrics", "log-metrics-1"}
+
+    broken = graph.broken()
+    assert [(b.link.filename, b.link.target, b.reason) for b in broken] == [
+        ("guides/track.md", "../ref/api/index.md#nope", "missing anchor in ref/api/index.md"),
+        ("guides/track.md", "./gone.md", "missing target"),
+        ("guides/track.md", "./missing.png", "missing target"),
+    ]
+    assert graph.orphans() == ["ref/orphan.md"]
+
+
+def test_changed_links(tmp_path):
+    _write(tmp_path / "docs", {"a.md": "[b](b.md) [c](c.md)", "b.md": "[a](a.md)"})
+    _write(tmp_path / "docs_ja", {"a.md": "[ビー](b.md) [シー](d.md)", "b.md": "[エー](a.md)"})
+    changed = changed_links(build_link_graph(tmp_path / "docs"), build_link_graph(tmp_path / "docs_ja"))
+    assert changed == {"a.md": {"missing": ["c.md"], "extra": ["d.md"]}}
@@ -1,8 +1,15 @@
+import json
 from gpt_translate.loader import (
     remove_markdown_comments,
     split_markdown,
     Header,
     extract_header,
+    parse_markdown,
+    find_links,
+    MDLink,
+    MDPage,
+    Page,
+    chunk_markdown,
 )
 
 
@@ -215,3 +222,134 @@ displayed_sidebar: default
     assert "クイック" in result
     # Check the full output matches what we expect
     assert result == expected_yaml
+
+
+def test_parse_markdown():
+    page = """---
+title: Tabs
+---
+import Tabs from '@theme/Tabs';
+
+# Install
+See the [guide](./guide.md) and <!-- a comment
+with a [hidden](link.md) --> the [API](../api.md#init).
+
+```python
+# not a heading
+print("[not](a-link)")
+```
+
+{{< tabpane text=true >}}
+{{% tab header="Python" %}}
+## Python
+{{% /tab %}}
+{{< /tabpane >}}
+"""
+    document = parse_markdown(page)
+    assert [t.kind for t in document.tokens] == [
+        "frontmatter",
+        "import",
+        "heading",
+        "link",
+        "comment",
+        "link",
+        "code",
+        "shortcode",
+        "shortcode",
+        "heading",
+        "shortcode",
+        "shortcode",
+    ]
+    assert document.header == "---\ntitle: Tabs\n---\nimport Tabs from '@theme/Tabs';"
+    assert document.content.startswith("# Install")
+
+    heading = document.find("heading")[0]
+    assert heading.groups == (1, "Install") and heading.line == 6
+    code = document.find("code")[0]
+    assert code.groups == ("```", "python")
+    assert page[code.start : code.end].endswith("```")
+    assert [t.groups for t in document.find("shortcode")] == [
+        ("<", "", "tabpane"),
+        ("%", "", "tab"),
+        ("%", "/", "tab"),
+        ("<", "/", "tabpane"),
+    ]
+
+    # links of the content have line numbers relative to the content
+    links = document.links("page.md", content_only=True)
+    assert [(l.target, l.line_number) for l in links] == [("./guide.md", 2), ("../api.md#init", 3)]
+    assert "hidden" not in document.without_comments()
+
+
+def test_find_links_skips_code_blocks():
+    content = """[a](a.md)
+```
+[b](b.md)
+```
+~~~
+[c](c.md)
+~~~
+text [d](d.md)"""
+    assert [l.target for l in find_links(content, "page.md")] == ["a.md", "d.md"]
+
+
+def test_split_markdown_ignores_headings_in_code():
+    content = """# Header 1
+```bash
+# a shell comment
+```
+# Header 2"""
+    assert split_markdown(content) == ["# Header 1\n```bash\n# a shell comment\n```", "# Header 2"]
+
+
+def test_find_links_kinds():
+    content = """![logo](./logo.png) and [docs](https://docs.wandb.ai)
+[![badge](https://img.shields.io/badge.svg)](https://pypi.org)
+See the [guide][guide] and the [reference][], not x[0][1].
+
+[guide]: ./guide.md
+[reference]: <https://wandb.ai/ref>
+[^1]: a footnote"""
+    links = find_links(content, "page.md")
+    assert [(l.kind, l.target, l.line_number) for l in links] == [
+        ("image", "./logo.png", 1),
+        ("inline", "https://docs.wandb.ai", 1),
+        ("inline", "https://pypi.org", 2),
+        ("image", "https://img.shields.io/badge.svg", 2),
+        ("reference", "guide", 3),
+        ("reference", "reference", 3),
+        ("definition", "./guide.md", 5),
+        ("definition", "https://wandb.ai/ref", 6),
+    ]
+    # links are compared and hashed on what a translation must keep
+    translated = find_links(content.replace("[docs]", "[ドキュメント]"), "page.md")
+    assert set(translated) == set(links)
+    assert links[0] != MDLink("logo", "./logo.png", "page.md", 1)
+
+
+def test_page_is_lazy():
+    raw = """---
+title: Quickstart
+---
+
+# Quickstart
+Read the [guide](./guide.md)."""
+    page = Page.from_raw_content("quickstart.md", raw)
+    assert page._links is None and isinstance(page._header, str)
+    assert page.header.title == "Quickstart"
+    assert [l.target for l in page.links] == ["./guide.md"]
+    assert str(page) == str(MDPage.from_raw_content("quickstart.md", raw))
+
+    # round trip through the serialized form used by the eval datasets
+    md_page = page.to_mdpage()
+    loaded = Page.from_dict(json.loads(md_page.model_dump_json()))
+    assert loaded.header.title == "Quickstart"
+    assert loaded.links == md_page.links
+    assert str(loaded) == str(md_page)
+
+
+def test_chunk_markdown():
+    content = "# A\n" + "word " * 50 + "\n# B\nshort\n# C\nshort"
+    assert chunk_markdown(content, max_tokens=10_000) == ["\n\n".join(split_markdown(content))]
+    chunks = chunk_markdown(content, max_tokens=20)
+    assert chunks == [split_markdown(content)[0], "# B\nshort\n\n# C\nshort"]
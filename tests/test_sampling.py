@@ -0,0 +1,58 @@
+import pytest
+
+from gpt_translate.sampling import (
+    size_stratum,
+    section_stratum,
+    sample_size,
+    allocate,
+    stratified_sample,
+    stratified_means,
+)
+
+
+def test_strata():
+    assert size_stratum(100) == "0-500 tokens"
+    assert size_stratum(2_000) == "2000-8000 tokens"
+    assert size_stratum(50_000) == ">8000 tokens"
+    assert section_stratum("guides/track/log.md") == "guides"
+    assert section_stratum("index.md") == "/"
+
+
+def test_sample_size():
+    assert sample_size(1_000_000) == 384  # the textbook ±5% at 95%, 385 for an infinite population
+    assert sample_size(1000) == 278  # finite population correction
+    assert sample_size(1_000_000, margin=0.1, confidence=0.9) == 68
+    assert sample_size(10) == 10
+    assert sample_size(0) == 0
+
+
+def test_allocate():
+    assert allocate({"a": 800, "b": 150, "c": 50}, 100) == {"a": 80, "b": 15, "c": 5}
+    assert allocate({"a": 990, "b": 9, "c": 1}, 10) == {"a": 10, "b": 2, "c": 1}
+
+
+def test_stratified_sample():
+    pages = [f"{section}/{i}.md" for section, n in [("guides", 3000), ("ref", 1000)] for i in range(n)]
+    sample = stratified_sample(pages, section_stratum, key=lambda p: p, seed=1)
+    assert sample.population == {"guides": 3000, "ref": 1000}
+    assert sample.size == sample_size(4000)
+    assert sum(section_stratum(p) == "ref" for p in sample.items) == round(sample.size / 4)
+    assert sample.items == stratified_sample(pages, section_stratum, key=lambda p: p, seed=1).items
+
+
+def test_stratified_means():
+    pages = [f"{section}/{i}.md" for section, n in [("guides", 300), ("ref", 100)] for i in range(n)]
+    sample = stratified_sample(pages, section_stratum, key=lambda p: p, margin=0.1)
+    # guides always pass, ref pages pass half of the time
+    rows = [
+        {"filename": p, "links_match": 1.0 if p.startswith("guides") or i % 2 else 0.0}
+        for i, p in enumerate(sample.items)
+    ]
+    mean, half_width = stratified_means(rows, sample)["links_match"]
+    assert mean == pytest.approx(0.75 + 0.25 * sum(r["links_match"] for r in rows if r["filename"].startswith("ref")) / sum(r["filename"].startswith("ref") for r in rows))
+    assert 0 < half_width < 0.1
+
+    # a census has no sampling error
+    census = stratified_sample(pages[:10], section_stratum, key=lambda p: p)
+    rows = [{"filename": p, "score": float(i)} for i, p in enumerate(census.items)]
+    assert stratified_means(rows, census)["score"] == (4.5, 0.0)
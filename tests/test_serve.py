@@ -0,0 +1,120 @@
+import json
+import asyncio
+from unittest.mock import patch, AsyncMock, MagicMock
+
+import pytest
+
+from gpt_translate.serve import TranslationService, RequestError, read_request, serve
+
+
+def _result(input_file, out_file, **kwargs):
+    return {"error": None, "changed": True, "failed_chunks": [], "input_file": input_file, "output_file": out_file}
+
+
+@pytest.mark.asyncio
+async def test_service_runs_jobs_by_priority():
+    "Jobs run lowest priority first, FIFO within a priority, with one translator per language"
+    with patch("gpt_translate.serve.Translator") as mock_translator, patch(
+        "gpt_translate.serve._translate_file", new_callable=AsyncMock, side_effect=_result
+    ) as mock_translate:
+        service = TranslationService(num_workers=1)
+        low = service.submit("low.md", "out/low.md", priority=5)
+        first = service.submit("first.md", "out/first.md", language="es")
+        second = service.submit("second.md", "out/second.md")
+        await service.start()
+        await asyncio.wait_for(low.done.wait(), timeout=5)
+        await service.stop()
+
+    order = [call.kwargs["input_file"] for call in mock_translate.call_args_list]
+    assert order == ["first.md", "second.md", "low.md"]
+    assert {job.status for job in (low, first, second)} == {"done"}
+    assert sorted(service.translators) == ["es", "ja"]
+    assert mock_translator.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_service_handle_errors():
+    service = TranslationService()
+    with pytest.raises(RequestError) as e:
+        await service.handle("POST", "/jobs", {"input_file": "intro.md"})
+    assert e.value.status == 400
+    with pytest.raises(RequestError) as e:
+        await service.handle("POST", "/jobs", {"input_file": "intro.txt", "out_file": "intro_ja.txt"})
+    assert e.value.status == 400
+    with pytest.raises(RequestError) as e:
+        await service.handle("GET", "/jobs/nope", {})
+    assert e.value.status == 404
+    with pytest.raises(RequestError) as e:
+        await service.handle("DELETE", "/health", {})
+    assert e.value.status == 405
+    with pytest.raises(RequestError) as e:
+        await service.handle("POST", "/jobs", {"input_file": "../intro.md", "out_file": "intro_ja.md"})
+    assert e.value.status == 403
+    with pytest.raises(RequestError) as e:
+        await service.handle("POST", "/jobs", {"input_file": "intro.md", "out_file": "/etc/intro_ja.md"})
+    assert e.value.status == 403
+
+
+@pytest.mark.parametrize(
+    "head, body, status",
+    [
+        (b"Content-Type: application/json\r\nContent-Length: nope", b"", 400),
+        (b"Content-Type: application/json\r\nContent-Length: -1", b"", 400),
+        (b"Content-Type: application/json\r\nContent-Length: 2", b"\xff\xfe", 400),
+        (b"Content-Type: text/plain\r\nContent-Length: 2", b"{}", 415),
+        (b"Origin: https://example.com\r\nContent-Type: application/json\r\nContent-Length: 2", b"{}", 403),
+    ],
+)
+@pytest.mark.asyncio
+async def test_read_request_errors(head, body, status):
+    reader = asyncio.StreamReader()
+    reader.feed_data(b"POST /jobs HTTP/1.1\r\n" + head + b"\r\n\r\n" + body)
+    reader.feed_eof()
+    with pytest.raises(RequestError) as e:
+        await read_request(reader)
+    assert e.value.status == status
+
+
+async def _request(socket, method, path, body=None):
+    reader, writer = await asyncio.open_unix_connection(socket)
+    payload = json.dumps(body).encode() if body is not None else b""
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nContent-Type: application/json\r\nContent-Length: {len(payload)}\r\n\r\n".encode()
+        + payload
+    )
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(body)
+
+
+@pytest.mark.asyncio
+async def test_serve_over_unix_socket(tmp_path):
+    socket = str(tmp_path / "gpt_translate.sock")
+    with patch("gpt_translate.serve.Translator", MagicMock()), patch(
+        "gpt_translate.serve._translate_file", new_callable=AsyncMock, side_effect=_result
+    ):
+        service = TranslationService(num_workers=2, input_folder=tmp_path, out_folder=tmp_path / "ja")
+        ready = asyncio.Event()
+        server = asyncio.create_task(serve(service, socket=socket, ready=ready))
+        await asyncio.wait_for(ready.wait(), timeout=5)
+
+        status, job = await _request(socket, "POST", "/jobs", {"input_file": str(tmp_path / "a.md"), "out_file": str(tmp_path / "ja/a.md"), "wait": True})
+        assert status == 200 and job["status"] == "done" and job["language"] == "ja"
+        status, queued = await _request(socket, "POST", "/jobs", {"input_file": str(tmp_path / "b.md"), "out_file": str(tmp_path / "ja/b.md")})
+        assert status == 202
+        await service.jobs[queued["id"]].done.wait()
+        status, job = await _request(socket, "GET", f"/jobs/{queued['id']}")
+        assert status == 200 and job["status"] == "done"
+        status, health = await _request(socket, "GET", "/health")
+        assert health["queued"] == 0 and health["languages"] == ["ja"]
+        status, error = await _request(socket, "GET", "/nope")
+        assert status == 404 and "error" in error
+        outside = {"input_file": str(tmp_path / "c.md"), "out_file": str(tmp_path / "c.md")}
+        status, error = await _request(socket, "POST", "/jobs", outside)
+        assert status == 403
+
+        server.cancel()
+        await asyncio.gather(server, return_exceptions=True)
+    assert not (tmp_path / "gpt_translate.sock").exists()
@@ -0,0 +1,69 @@
+import pytest
+
+from gpt_translate.translate import TranslationReport
+from gpt_translate.shard import (
+    hash_shard,
+    balance_shards,
+    select_shard,
+    manifest_path,
+    write_manifest,
+    read_manifest,
+    merge_manifests,
+)
+
+
+def _write(root, files):
+    for name, content in files.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+
+
+def test_hash_shard_is_stable():
+    assert hash_shard("guides/intro.md", 4) == hash_shard("guides/intro.md", 4)
+    assert {hash_shard(f"page-{i}.md", 4) for i in range(100)} == {0, 1, 2, 3}
+
+
+def test_balance_shards():
+    weights = {"a.md": 10, "b.md": 7, "c.md": 5, "d.md": 4, "e.md": 2}
+    assignment = balance_shards(weights, 2)
+    loads = [sum(w for k, w in weights.items() if assignment[k] == shard) for shard in range(2)]
+    assert sorted(loads) == [14, 14]
+    assert balance_shards(dict(reversed(weights.items())), 2) == assignment
+
+
+@pytest.mark.parametrize("shard_by", ["hash", "tokens"])
+def test_select_shard_partitions_files(tmp_path, shard_by):
+    "Every file lands in exactly one shard"
+    _write(tmp_path, {f"section-{i % 3}/page-{i}.md": "word " * (i + 1) for i in range(20)})
+    files = [tmp_path / f"section-{i % 3}/page-{i}.md" for i in range(20)]
+    shards = [
+        {f.path for f in select_shard(files, tmp_path, index, 3, shard_by)} for index in range(3)
+    ]
+    assert sum(len(shard) for shard in shards) == 20
+    assert set().union(*shards) == set(files)
+    with pytest.raises(ValueError):
+        select_shard(files, tmp_path, 3, 3)
+
+
+def test_merge_manifests(tmp_path):
+    for index, (translated, failed) in enumerate([(3, []), (2, [{"input_file": "b.md", "error": "boom"}])]):
+        report = TranslationReport(
+            translated=translated,
+            changed=translated - 1,
+            failed=failed,
+            duration=10.0 * (index + 1),
+            outputs=[{"input_file": f"{index}.md", "output_file": f"ja/{index}.md", "changed": True}],
+        )
+        write_manifest(manifest_path(tmp_path, index, 3), report, index, 3, "ja", sync_commit="abc123")
+
+    merged = merge_manifests(read_manifest(p) for p in sorted(tmp_path.glob(".gpt_translate_shard_*.json")))
+    assert merged["shards"] == [0, 1] and merged["missing_shards"] == [2]
+    assert merged["sync_commit"] == "abc123"
+    report = merged["report"]
+    assert (report["translated"], report["changed"], report["duration"]) == (5, 3, 20.0)
+    assert report["failed"] == [{"input_file": "b.md", "error": "boom"}]
+    assert [o["output_file"] for o in report["outputs"]] == ["ja/0.md", "ja/1.md"]
+
+    with pytest.raises(ValueError):
+        merge_manifests([read_manifest(manifest_path(tmp_path, 0, 3))] * 2)
@@ -0,0 +1,74 @@
+from pathlib import Path
+
+from gpt_translate.utils import FileChange
+from gpt_translate.sync import (
+    SYNC_STATE_FILE,
+    sync_state_path,
+    read_last_sync,
+    write_last_sync,
+    apply_changes,
+)
+
+
+def test_sync_state(tmp_path):
+    "Each language keeps its own last synchronized commit"
+    state_file = sync_state_path(tmp_path)
+    assert state_file == tmp_path / SYNC_STATE_FILE
+    assert read_last_sync(state_file, "ja") is None
+
+    write_last_sync(state_file, "ja", "abc123")
+    write_last_sync(state_file, "es", "def456")
+    write_last_sync(state_file, "ja", "fed789")
+    assert read_last_sync(state_file, "ja") == "fed789"
+    assert read_last_sync(state_file, "es") == "def456"
+
+
+def test_apply_changes(tmp_path):
+    "Deletions and renames are mirrored in the output folder"
+    repo_root = tmp_path
+    out_folder = tmp_path / "docs_ja"
+    out_folder.mkdir()
+    (out_folder / "gone.md").write_text("消えた")
+    (out_folder / "moved.md").write_text("移動")
+    (out_folder / "edited_move.md").write_text("編集")
+
+    changes = [
+        FileChange("M", Path("docs/edit.md")),
+        FileChange("D", Path("docs/gone.md")),
+        FileChange("R", Path("docs/guides/moved.md"), Path("docs/moved.md"), 100),
+        FileChange("R", Path("docs/guides/edited_move.md"), Path("docs/edited_move.md"), 80),
+        FileChange("A", Path("docs/added.md")),
+    ]
+    to_translate = list(apply_changes(changes, repo_root, tmp_path / "docs", out_folder))
+
+    assert to_translate == [
+        tmp_path / "docs" / "edit.md",
+        tmp_path / "docs" / "guides" / "edited_move.md",
+        tmp_path / "docs" / "added.md",
+    ]
+    assert not (out_folder / "gone.md").exists()
+    assert (out_folder / "guides" / "moved.md").read_text() == "移動"
+    assert (out_folder / "guides" / "edited_move.md").exists()
+    assert not (out_folder / "moved.md").exists()
+
+
+def test_apply_changes_exclude(tmp_path):
+    "Excluded files are skipped, renames across the exclude rules become additions or deletions"
+    out_folder = tmp_path / "docs_ja"
+    (out_folder / "drafts").mkdir(parents=True)
+    (out_folder / "published.md").write_text("公開")
+    (out_folder / "drafts" / "ready.md").write_text("準備")
+
+    changes = [
+        FileChange("M", Path("docs/node_modules/pkg/README.md")),
+        FileChange("A", Path("docs/guide.md")),
+        FileChange("R", Path("docs/drafts/published.md"), Path("docs/published.md"), 100),
+        FileChange("R", Path("docs/ready.md"), Path("docs/drafts/ready.md"), 100),
+    ]
+    to_translate = apply_changes(
+        changes, tmp_path, tmp_path / "docs", out_folder, exclude=["node_modules/", "drafts/"]
+    )
+
+    assert to_translate == [tmp_path / "docs" / "guide.md", tmp_path / "docs" / "ready.md"]
+    assert not (out_folder / "published.md").exists()
+    assert not (out_folder / "drafts" / "published.md").exists()
@@ -2,7 +2,7 @@ import os
 import pytest
 import asyncio
 import warnings
-from unittest.mock import patch, AsyncMock, MagicMock, mock_open, ANY
+from unittest.mock import patch, AsyncMock, MagicMock, mock_open
 from pathlib import Path
 
 import weave
@@ -14,6 +14,9 @@ from gpt_translate.translate import (
     Translator,
     _translate_file,
     _translate_files,
+    TranslationReport,
+    PreparedPage,
+    prepare_pages,
     MIN_CONTENT_LENGTH
 )
 from gpt_translate.prompts import PromptTemplate
@@ -250,7 +253,7 @@ async def test_translate_file_function():
             # Mock the translated page's string representation
             mock_translation_results["translated_page"].__str__.return_value = "Translated content"
             
-            with patch('builtins.open', mock_open()) as mock_file:
+            with patch('gpt_translate.translate.write_text_async', new_callable=AsyncMock) as mock_write:
                 with patch('pathlib.Path.exists') as mock_exists:
                     mock_exists.return_value = False
                     
@@ -270,8 +273,10 @@ async def test_translate_file_function():
                         assert result["language"] == "ja"
                         
                         mock_translator_cls.assert_called_once()
-                        mock_translator.translate_file.assert_called_once_with("test_input.md", True)
-                        mock_file.assert_called_once_with(ANY, 'w', encoding='utf-8')
+                        mock_translator.translate_file.assert_called_once_with(
+                            "test_input.md", True, cache=None, prepared=None, executor=None
+                        )
+                        mock_write.assert_awaited_once_with(Path("test_output.md"), "Translated content", False)
 
 
 @pytest.mark.asyncio
@@ -313,3 +318,219 @@ async def test_translate_files_function():
                                 mock_translate_file.assert_called_once()
                                 mock_to_dataset.assert_called_once()
                                 mock_publish.assert_called_once_with(mock_dataset)
+
+
+@pytest.mark.asyncio
+async def test_translate_files_longest_first(tmp_path):
+    """Test that longest_first starts the largest file first and keeps a slot for short ones"""
+    for name, size in [("small.md", 1), ("medium.md", 5), ("large.md", 10), ("tiny.md", 0)]:
+        (tmp_path / name).write_text("word " * (size + 2))
+
+    started = []
+
+    async def fake_translate_file(input_file, **kwargs):
+        started.append(Path(input_file).name)
+        await asyncio.sleep(0.01)
+        return {"error": None, "input_file": input_file}
+
+    with patch('gpt_translate.translate._translate_file', side_effect=fake_translate_file):
+        with patch('gpt_translate.translate.estimate_tokens', side_effect=lambda f: len(f.path.read_text())):
+            report = await _translate_files(
+                input_files=sorted(tmp_path.glob("*.md")),
+                input_folder=tmp_path,
+                out_folder=tmp_path / "out",
+                max_concurrent_calls=2,
+                schedule="longest_first",
+                short_job_slots=1,
+            )
+
+    assert report.translated == 4
+    assert set(started[:2]) == {"large.md", "tiny.md"}
+    assert report.tail <= report.duration
+
+
+@pytest.mark.asyncio
+async def test_translate_files_changed_files(tmp_path):
+    """Test that only the outputs that really changed are listed"""
+    for name in ["same.md", "new.md", "broken.md"]:
+        (tmp_path / name).write_text("# Content")
+
+    async def fake_translate_file(input_file, out_file, **kwargs):
+        assert kwargs["skip_unchanged"] is True
+        name = Path(input_file).name
+        if name == "broken.md":
+            return {"error": "boom", "input_file": input_file, "output_file": out_file}
+        return {"error": None, "changed": name == "new.md", "input_file": input_file, "output_file": out_file}
+
+    changed_files = tmp_path / "changed.txt"
+    with patch('gpt_translate.translate._translate_file', side_effect=fake_translate_file):
+        report = await _translate_files(
+            input_files=sorted(tmp_path.glob("*.md")),
+            input_folder=tmp_path,
+            out_folder=tmp_path / "out",
+            skip_unchanged=True,
+            changed_files=str(changed_files),
+        )
+
+    assert report.translated == 2
+    assert report.changed == 1
+    assert changed_files.read_text() == f"{tmp_path / 'out' / 'new.md'}\n"
+
+
+@pytest.mark.asyncio
+async def test_translate_page_retries_failing_chunks():
+    """Only the chunks failing the structural checks are translated again"""
+    page = MDPage(
+        filename="page.md",
+        content="# Intro\nSee the [guide](./guide.md).\n\n# Install\n```bash\npip install wandb\n```",
+        header=Header(title="Guide"),
+    )
+    responses = {
+        "# Intro": ["# はじめに\nガイドを参照してください。", "# はじめに\n[ガイド](./guide.md)を参照してください。"],
+        "# Install": ["# インストール\npip install wandb", "# インストール\npip install wandb"],
+        "Guide": ["ガイド"],
+    }
+
+    async def fake_translate_content(md_content, prompt, **model_args):
+        key = md_content.split("\n")[0]
+        return TranslationResult(content=responses[key].pop(0), tokens=10)
+
+    translator = Translator(
+        config_folder="./configs",
+        language="ja",
+        model_args={"model": "gpt-4o"},
+        chunk_tokens=5,
+        validation_retries=1,
+    )
+    failures = []
+    with patch('gpt_translate.translate.translate_content', side_effect=fake_translate_content) as mock_translate:
+        result = await translator.translate_page(page, failures=failures)
+
+    assert mock_translate.call_count == 5
+    assert result.content.startswith("# はじめに\n[ガイド](./guide.md)")
+    assert result.header.title == "ガイド"
+    assert failures == [{"chunk": "page.md chunk 2/2", "problems": ["1 code blocks became 0"]}]
+
+
+@pytest.mark.asyncio
+async def test_translate_page_no_retries_without_chunks():
+    """Without chunk_tokens a page failing the checks is reported, not translated again"""
+    page = MDPage(filename="page.md", content="See the [guide](./guide.md).", header=Header())
+
+    async def fake_translate_content(md_content, prompt, **model_args):
+        return TranslationResult(content="ガイドを参照してください。", tokens=10)
+
+    translator = Translator(config_folder="./configs", language="ja", model_args={"model": "gpt-4o"}, validation_retries=1)
+    failures = []
+    with patch('gpt_translate.translate.translate_content', side_effect=fake_translate_content) as mock_translate:
+        await translator.translate_page(page, failures=failures)
+
+    assert mock_translate.call_count == 1
+    assert [failure["chunk"] for failure in failures] == ["page.md chunk 1/1"]
+
+
+def test_translation_report_failed_chunks():
+    report = TranslationReport()
+    report.add({"error": None, "input_file": "a.md", "failed_chunks": [{"chunk": "a.md chunk 1/1", "problems": ["x"]}]})
+    report.add({"error": None, "input_file": "b.md"})
+    assert report.translated == 2
+    assert report.failed_chunks == [{"input_file": "a.md", "chunk": "a.md chunk 1/1", "problems": ["x"]}]
+
+
+@pytest.mark.asyncio
+async def test_translate_page_section_cache(tmp_path):
+    """With a cache, only the sections edited since the last translation are sent to the model"""
+    from gpt_translate.cache import SqliteLRUCache
+
+    async def fake_translate_content(md_content, prompt, **model_args):
+        return TranslationResult(content=md_content.replace("Section", "セクション"), tokens=10)
+
+    translator = Translator(config_folder="./configs", language="ja", model_args={"model": "gpt-4o"})
+    cache = SqliteLRUCache(tmp_path / "sections.sqlite")
+    before = MDPage(filename="page.md", content="# Section 1\nOne\n\n# Section 2\nTwo", header=Header(title="Section"))
+    after = MDPage(filename="page.md", content="# Section 1\nOne\n\n# Section 2\nTwo, edited", header=Header(title="Section"))
+    with patch('gpt_translate.translate.translate_content', side_effect=fake_translate_content) as mock_translate:
+        await translator.translate_page(before, cache=cache)
+        assert mock_translate.call_count == 2  # the whole page, split to fill the cache, and the title
+        result = await translator.translate_page(after, cache=cache)
+        assert mock_translate.call_count == 3
+    assert result.content == "# セクション 1\nOne\n\n# セクション 2\nTwo, edited"
+    assert result.header.title == "セクション"
+    cache.close()
+
+
+@pytest.mark.asyncio
+async def test_translate_page_section_cache_concurrent(tmp_path):
+    """Sections missing from a warm cache are translated concurrently"""
+    from gpt_translate.cache import SqliteLRUCache
+
+    in_flight, max_in_flight = 0, 0
+
+    async def fake_translate_content(md_content, prompt, **model_args):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return TranslationResult(content=md_content.replace("Section", "セクション"), tokens=10)
+
+    translator = Translator(config_folder="./configs", language="ja", model_args={"model": "gpt-4o"})
+    cache = SqliteLRUCache(tmp_path / "sections.sqlite")
+    sections = [f"# Section {i}\nText {i}" for i in range(4)]
+    cache.put(translator.cache_key(sections[0]), "# セクション 0\nText 0")
+    page = MDPage(filename="page.md", content="\n\n".join(sections), header=Header())
+    with patch('gpt_translate.translate.translate_content', side_effect=fake_translate_content) as mock_translate:
+        result = await translator.translate_page(page, cache=cache)
+    assert mock_translate.call_count == 3
+    assert max_in_flight == 3
+    assert result.content == "\n\n".join(f"# セクション {i}\nText {i}" for i in range(4))
+    cache.close()
+
+
+def test_translator_cache_key_language():
+    """A section cache shared by several languages never returns a translation to another language"""
+    translator = Translator(config_folder="./configs", language="ja", model_args={"model": "gpt-4o"})
+    other = translator.model_copy(update={"language": "ko"})
+    assert translator.cache_key("# Intro") == translator.cache_key("# Intro")
+    assert translator.cache_key("# Intro") != other.cache_key("# Intro")
+
+
+def test_prepare_pages(tmp_path):
+    (tmp_path / "page.md").write_text("---\ntitle: Page\n---\n# One\nText <!-- note -->\n\n# Two\nMore text")
+    (tmp_path / "empty.md").write_text("  \n")
+    page, empty = prepare_pages([str(tmp_path / "page.md"), str(tmp_path / "empty.md")], sections=True)
+    assert empty is None
+    assert page.md_page.header.title == "Page"
+    assert "note" not in page.md_page.content
+    assert page.chunks == ["# One\nText", "# Two\nMore text"]
+
+
+@pytest.mark.asyncio
+async def test_translate_files_cpu_workers(tmp_path):
+    """Pages are prepared in the CPU pool by batches and handed to the translation"""
+    for i in range(5):
+        (tmp_path / f"page-{i}.md").write_text(f"# Page {i}\nSome content to translate")
+    (tmp_path / "empty.md").write_text("")
+    prepared = {}
+
+    async def fake_translate_file(input_file, out_file, **kwargs):
+        prepared[Path(input_file).name] = kwargs["prepared"]
+        assert kwargs["executor"] is not None
+        return {"error": None, "input_file": input_file, "output_file": out_file}
+
+    with patch('gpt_translate.translate._translate_file', side_effect=fake_translate_file):
+        report = await _translate_files(
+            input_files=sorted(tmp_path.glob("*.md")),
+            input_folder=tmp_path,
+            out_folder=tmp_path / "out",
+            max_concurrent_calls=2,
+            cpu_workers=2,
+            cpu_batch_size=2,
+        )
+
+    assert report.translated == 6
+    assert prepared.pop("empty.md") is None
+    for name, page in prepared.items():
+        assert isinstance(page, PreparedPage)
+        assert page.md_page.filename == str(tmp_path / name)
+        assert page.chunks == [page.md_page.content]
@@ -1,4 +1,7 @@
 import os
+import errno
+import git
+import time
 import asyncio
 import pytest
 from unittest.mock import patch, AsyncMock, MagicMock
@@ -7,11 +10,21 @@ from pathlib import Path
 from gpt_translate.utils import (
     file_is_empty, 
     get_md_files, 
+    iter_files,
+    stat_files,
+    IgnoreRules,
+    FileChange,
+    iter_file_changes,
+    sync_files,
+    write_text_atomic,
+    LoopLagMonitor,
+    RateLimiter,
     remove_after, 
     longer_create, 
     count_tokens,
     to_weave_dataset,
     gather_with_progress,
+    run_workers,
     logger
 )
 from rich.progress import Progress
@@ -44,6 +57,222 @@ def test_get_md_files():
     assert len(file_re) == 1
 
 
+def test_iter_files(tmp_path):
+    "Check that discovery yields .md and .mdx files with their stat and skips excluded folders"
+    (tmp_path / "guides").mkdir()
+    (tmp_path / "guides" / "intro.md").write_text("# Intro")
+    (tmp_path / "guides" / "tabs.mdx").write_text("# Tabs")
+    (tmp_path / "guides" / "image.png").write_bytes(b"png")
+    (tmp_path / "node_modules" / "pkg").mkdir(parents=True)
+    (tmp_path / "node_modules" / "pkg" / "README.md").write_text("# Package")
+    (tmp_path / "build").mkdir()
+    (tmp_path / "build" / "out.md").write_text("# Build")
+
+    files = list(iter_files(tmp_path, exclude=["node_modules/", "/build"]))
+    assert [f.path.relative_to(tmp_path).as_posix() for f in files] == [
+        "guides/intro.md",
+        "guides/tabs.mdx",
+    ]
+    assert files[0].stat.st_size == len("# Intro")
+
+    # A single file is yielded as is
+    assert [f.path for f in iter_files(tmp_path / "guides" / "intro.md")] == [tmp_path / "guides" / "intro.md"]
+
+
+def test_ignore_rules():
+    "Check the gitignore-style matching"
+    rules = IgnoreRules(["*.draft.md", "/drafts/", "**/generated/*.md", "!keep.draft.md", "# comment"])
+    assert rules.ignored("notes.draft.md")
+    assert rules.ignored("guides/notes.draft.md")
+    assert not rules.ignored("guides/keep.draft.md")
+    assert rules.ignored("drafts", is_dir=True)
+    assert not rules.ignored("guides/drafts", is_dir=True)
+    assert not rules.ignored("drafts")  # dir-only pattern does not match files
+    assert rules.ignored("generated/api.md")
+    assert rules.ignored("ref/generated/api.md")
+    assert not rules.ignored("ref/generated/sub/api.md")
+
+
+def test_ignore_rules_excluded():
+    "Files are excluded by their name or by one of their folders, like in `iter_files`"
+    rules = IgnoreRules(["node_modules/", "*.draft.md"])
+    assert rules.excluded("node_modules/pkg/README.md")
+    assert rules.excluded("guides/intro.draft.md")
+    assert not rules.excluded("guides/intro.md")
+
+
+def test_stat_files():
+    "Check that plain paths are filtered by extension and existence"
+    files = list(stat_files(["tests/data/intro.md", "tests/data/missing.md", "list.txt"]))
+    assert [f.path for f in files] == [Path("tests/data/intro.md")]
+    assert files[0].stat.st_size > 0
+
+
+def _commit(repo, message):
+    repo.git.add(A=True)
+    repo.git.commit("-m", message)
+    return repo.git.rev_parse("HEAD")
+
+
+def test_iter_file_changes(tmp_path):
+    "Check the single tree-to-tree diff with and without rename detection"
+    repo = git.Repo.init(tmp_path)
+    repo.git.config("user.email", "test@example.com")
+    repo.git.config("user.name", "Test")
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "keep.md").write_text("# Keep\n")
+    (docs / "edit.md").write_text("# Edit\n")
+    (docs / "gone.md").write_text("# Gone\n")
+    (docs / "old.md").write_text("# A page that moves\n" + "with enough content to be a rename\n" * 5)
+    (tmp_path / "outside.md").write_text("# Outside\n")
+    base = _commit(repo, "first")
+
+    (docs / "edit.md").write_text("# Edited\n")
+    (docs / "gone.md").unlink()
+    (docs / "old.md").rename(docs / "new.md")
+    (docs / "added.md").write_text("# Added\n")
+    (docs / "notes.txt").write_text("not markdown")
+    (tmp_path / "outside.md").write_text("# Outside edited\n")
+    _commit(repo, "second")
+    (docs / "keep.md").write_text("# Uncommitted\n")  # working tree changes are ignored
+
+    changes = set(iter_file_changes(docs, base=base))
+    assert changes == {
+        FileChange("A", Path("docs/added.md")),
+        FileChange("M", Path("docs/edit.md")),
+        FileChange("D", Path("docs/gone.md")),
+        FileChange("R", Path("docs/new.md"), Path("docs/old.md"), 100),
+    }
+
+    changes = set(iter_file_changes(docs, base=base, detect_renames=False))
+    assert FileChange("D", Path("docs/old.md")) in changes
+    assert FileChange("A", Path("docs/new.md")) in changes
+
+    # Without a base every file is new
+    changes = set(iter_file_changes(tmp_path, base=None))
+    assert all(c.status == "A" for c in changes)
+    assert FileChange("A", Path("outside.md")) in changes
+
+
+def test_sync_files(tmp_path):
+    "Check that images are only copied when they changed"
+    src, dst = tmp_path / "docs", tmp_path / "docs_ja"
+    (src / "images").mkdir(parents=True)
+    (src / "images" / "a.png").write_bytes(b"a" * 10)
+    (src / "b.JPG").write_bytes(b"b" * 20)
+    (src / "intro.md").write_text("# Intro")
+
+    summary = sync_files(src, dst)
+    assert summary["copied"] == 2 and summary["skipped"] == 0
+    assert summary["bytes"] == 30
+    assert (dst / "images" / "a.png").read_bytes() == b"a" * 10
+    assert not (dst / "intro.md").exists()
+
+    summary = sync_files(src, dst)
+    assert summary["copied"] == 0 and summary["skipped"] == 2
+    assert summary["bytes"] == 0
+
+    (src / "images" / "a.png").write_bytes(b"c" * 12)
+    summary = sync_files(src, dst, compare="hash")
+    assert summary["copied"] == 1 and summary["skipped"] == 1
+    assert (dst / "images" / "a.png").read_bytes() == b"c" * 12
+
+    linked = tmp_path / "docs_es"
+    summary = sync_files(src, linked, link=True)
+    assert summary["linked"] == 2
+    assert summary["bytes"] == 0 and summary["saved"] == 32
+    assert (linked / "b.JPG").stat().st_ino == (src / "b.JPG").stat().st_ino
+
+
+def test_sync_files_dedup(tmp_path):
+    "Check that locales share a single copy of each image through the store"
+    src, store = tmp_path / "docs", tmp_path / "store"
+    src.mkdir()
+    (src / "a.png").write_bytes(b"a" * 10)
+    (src / "copy_of_a.png").write_bytes(b"a" * 10)
+    (src / "b.png").write_bytes(b"b" * 20)
+
+    first = sync_files(src, tmp_path / "ja", store=store, max_workers=1)
+    assert first["deduplicated"] == 3
+    assert first["saved"] == 10  # copy_of_a.png is already in the store
+    assert first["bytes"] == 30
+    assert len([p for p in store.rglob("*") if p.is_file()]) == 2
+
+    second = sync_files(src, tmp_path / "es", store=store, link_mode="symlink")
+    assert second["saved"] == 40
+    assert second["bytes"] == 0
+    assert (tmp_path / "es" / "b.png").is_symlink()
+    assert (tmp_path / "es" / "b.png").read_bytes() == b"b" * 20
+    assert (tmp_path / "ja" / "a.png").stat().st_ino == (tmp_path / "ja" / "copy_of_a.png").stat().st_ino
+
+    # Nothing to do on the next run
+    assert sync_files(src, tmp_path / "ja", store=store)["skipped"] == 3
+
+
+def test_sync_files_dedup_without_hard_links(tmp_path):
+    "Check that images are copied when they can not be hard-linked to the store"
+    src, store = tmp_path / "docs", tmp_path / "store"
+    src.mkdir()
+    (src / "a.png").write_bytes(b"a" * 10)
+    with patch("gpt_translate.utils.os.link", side_effect=OSError(errno.EXDEV, "Invalid cross-device link")):
+        summary = sync_files(src, tmp_path / "ja", store=store)
+    assert summary["copied"] == 1 and summary["deduplicated"] == 0
+    assert summary["saved"] == 0 and summary["bytes"] == 10
+    assert (tmp_path / "ja" / "a.png").read_bytes() == b"a" * 10
+
+
+def test_write_text_atomic(tmp_path):
+    "Check that the file is replaced in one go and no temporary file is left behind"
+    out_file = tmp_path / "page.md"
+    out_file.write_text("old")
+    write_text_atomic(out_file, "新しい")
+    assert out_file.read_text(encoding="utf-8") == "新しい"
+    assert [p.name for p in tmp_path.iterdir()] == ["page.md"]
+
+
+def test_write_text_atomic_skip_unchanged(tmp_path):
+    "Check that identical content leaves the file and its mtime untouched"
+    out_file = tmp_path / "page.md"
+    out_file.write_text("same", encoding="utf-8")
+    os.utime(out_file, ns=(1_000_000_000, 1_000_000_000))
+
+    assert write_text_atomic(out_file, "same", skip_unchanged=True) is False
+    assert out_file.stat().st_mtime_ns == 1_000_000_000
+
+    assert write_text_atomic(out_file, "different", skip_unchanged=True) is True
+    assert out_file.read_text(encoding="utf-8") == "different"
+    assert write_text_atomic(tmp_path / "new.md", "new", skip_unchanged=True) is True
+
+
+@pytest.mark.asyncio
+async def test_loop_lag_monitor():
+    "Check that blocking the event loop shows up as lag"
+    async with LoopLagMonitor(interval=0.01) as lag:
+        await asyncio.sleep(0.03)
+        time.sleep(0.1)  # blocking call on purpose
+        await asyncio.sleep(0.03)
+    assert lag.max_lag >= 0.05
+    assert lag.samples > 0
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter():
+    "Calls are released one interval apart"
+    limiter = RateLimiter(rate=20, period=1.0)
+    starts = []
+
+    async def _call():
+        async with limiter:
+            starts.append(time.monotonic())
+
+    await asyncio.gather(*[_call() for _ in range(5)])
+    starts.sort()
+    assert starts[-1] - starts[0] >= 4 * 0.05 - 0.01
+    with pytest.raises(ValueError):
+        RateLimiter(rate=0)
+
+
 def test_remove_after():
     "Test the remove_after function with different separators"
     text = "This is a sample text.\nIt has multiple lines.\nAnd some sentences."
@@ -399,6 +628,87 @@ async def test_gather_with_progress_custom_progress_object():
     assert all(result == "custom progress test" for result in results)
 
 
+# Tests for run_workers function
+@pytest.mark.asyncio
+async def test_run_workers_streams_results_to_sink():
+    """Test that every item is processed and handed to the sink"""
+    async def double(x):
+        await asyncio.sleep(0.01)
+        return x * 2
+
+    results = []
+    stats = await run_workers(range(10), double, sink=results.append, num_workers=3)
+
+    assert stats["processed"] == 10
+    assert sorted(results) == [x * 2 for x in range(10)]
+    assert 0 <= stats["tail"] <= stats["duration"]
+
+
+@pytest.mark.asyncio
+async def test_run_workers_async_items():
+    """Test that items can come from an async generator, e.g. rows parsed in a process pool"""
+    async def items():
+        for x in range(5):
+            await asyncio.sleep(0)
+            yield x
+
+    async def double(x):
+        return x * 2
+
+    results = []
+    stats = await run_workers(items(), double, sink=results.append, num_workers=2)
+
+    assert stats["processed"] == 5
+    assert sorted(results) == [0, 2, 4, 6, 8]
+
+
+@pytest.mark.asyncio
+async def test_run_workers_bounds_concurrency_and_queue():
+    """Test that no more than num_workers items run at once and the producer stays bounded"""
+    in_flight = 0
+    max_in_flight = 0
+    pulled = 0
+    started = 0
+
+    def items():
+        nonlocal pulled
+        for i in range(20):
+            pulled += 1
+            yield i
+
+    async def work(x):
+        nonlocal in_flight, max_in_flight, started
+        started += 1
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        # The producer is never ahead by more than the queue plus the item it is putting
+        assert pulled - started <= 2 + 1
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return x
+
+    stats = await run_workers(items(), work, num_workers=2, queue_size=2)
+
+    assert stats["processed"] == 20
+    assert max_in_flight == 2
+
+
+@pytest.mark.asyncio
+async def test_run_workers_with_failures():
+    """Test that failing items are reported to the sink as errors"""
+    async def work(x):
+        if x % 2:
+            raise Exception(f"Mock error in item {x}")
+        return {"item": x, "error": None}
+
+    results = []
+    await run_workers(range(4), work, sink=results.append, num_workers=2)
+
+    errors = sorted(r["error"] for r in results if r["error"] is not None)
+    assert errors == ["Mock error in item 1", "Mock error in item 3"]
+    assert len(results) == 4
+
+
 def test_rich_logger_configuration():
     """Test that the Rich logger is properly configured"""
     assert logger.name == "gpt_translate"
@@ -430,3 +740,18 @@ def test_logger_functionality():
         logger.exception("Test exception logging")
     
     # If we get here without exceptions, the logger is working
+
+
+def test_write_text_atomic_keeps_mode(tmp_path):
+    "Existing files keep their permissions and new files follow the umask, not mkstemp's 0600"
+    existing = tmp_path / "existing.md"
+    existing.write_text("old")
+    existing.chmod(0o644)
+    write_text_atomic(existing, "new")
+    assert existing.stat().st_mode & 0o777 == 0o644
+
+    new_file = tmp_path / "new.md"
+    write_text_atomic(new_file, "new")
+    umask = os.umask(0)
+    os.umask(umask)
+    assert new_file.stat().st_mode & 0o777 == 0o666 & ~umask
@@ -0,0 +1,48 @@
+from gpt_translate.validation import chunk_problems, header_item_problems
+
+
+def test_chunk_problems():
+    original = """## Log a table
+See [tables](./tables.md) and ![chart](./chart.png).
+```python
+wandb.log({"table": table})
+```
+{{< tabpane >}}
+{{% tab header="Python" %}}
+Text
+{{% /tab %}}
+{{< /tabpane >}}"""
+    assert chunk_problems(original, original) == []
+
+    translated = """---
+title: oops
+---
+## テーブルをログする
+[テーブル](./tables.md) と ![グラフ](./chart.png) と [余分](./extra.md)。
+{{< tabpane >}}
+{{% tab header="Python" %}}
+テキスト
+{{< /tabpane >}}"""
+    assert chunk_problems(original, translated) == [
+        "extra links ['./extra.md']",
+        "1 code blocks became 0",
+        "line 7: {{% tab %}} is not closed before line 9",
+        "{{% /tab %}} (line 9) became nothing",
+        "front matter added",
+    ]
+
+
+def test_chunk_problems_cut_through_tabs():
+    "A chunk may start inside a tabpane, only the differences with the original count"
+    original = "## Python\nText\n{{% /tab %}}\n{{< /tabpane >}}"
+    assert chunk_problems(original, "## Python\nテキスト\n{{% /tab %}}\n{{< /tabpane >}}") == []
+    assert chunk_problems(original, "## Python\nテキスト\n{{< /tabpane >}}") == ["{{% /tab %}} (line 3) became nothing"]
+
+
+def test_header_item_problems():
+    assert header_item_problems("Quickstart", "クイックスタート") == []
+    assert header_item_problems("Quickstart", "  ") == ["empty translation"]
+    assert header_item_problems("Quickstart", "クイック\nスタート\n---") == [
+        "spans several lines",
+        "contains a front matter delimiter",
+    ]
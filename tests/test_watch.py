@@ -0,0 +1,47 @@
+import asyncio
+from unittest.mock import patch, AsyncMock, MagicMock
+
+import pytest
+
+from gpt_translate.watch import poll_changes, watch_folder
+
+
+@pytest.mark.asyncio
+async def test_poll_changes_debounces(tmp_path):
+    "A burst of saves is a single batch, excluded folders and other files are ignored"
+    (tmp_path / "a.md").write_text("a")
+    changes = poll_changes(tmp_path, exclude=["node_modules/"], debounce=0.2, poll_interval=0.05)
+    batch = asyncio.ensure_future(anext(changes))
+    await asyncio.sleep(0.1)
+    (tmp_path / "a.md").write_text("a, edited")
+    await asyncio.sleep(0.07)
+    (tmp_path / "b.md").write_text("b")
+    (tmp_path / "image.png").write_text("png")
+    (tmp_path / "node_modules").mkdir()
+    (tmp_path / "node_modules" / "c.md").write_text("c")
+    assert await asyncio.wait_for(batch, timeout=5) == {tmp_path / "a.md", tmp_path / "b.md"}
+    await changes.aclose()
+
+
+@pytest.mark.asyncio
+async def test_watch_folder_translates_changed_files(tmp_path):
+    docs, out = tmp_path / "docs", tmp_path / "docs_ja"
+    (docs / "guides").mkdir(parents=True)
+    (docs / "index.md").write_text("# Home")
+    translator = MagicMock(language="ja")
+
+    async def _save_later():
+        await asyncio.sleep(0.1)
+        (docs / "guides" / "intro.md").write_text("# Intro")
+
+    with patch("gpt_translate.watch._translate_file", new_callable=AsyncMock) as mock_translate:
+        mock_translate.return_value = {"error": None, "changed": True, "input_file": "intro.md"}
+        await asyncio.gather(
+            watch_folder(docs, out, translator, poll=True, debounce=0.1, max_batches=1),
+            _save_later(),
+        )
+    mock_translate.assert_called_once()
+    kwargs = mock_translate.call_args.kwargs
+    assert kwargs["input_file"] == str(docs / "guides" / "intro.md")
+    assert kwargs["out_file"] == str(out / "guides" / "intro.md")
+    assert kwargs["translator"] is translator and kwargs["skip_unchanged"]